@@ -1,46 +1,65 @@
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify, send_file
 import os
-import mysql.connector
 from mysql.connector import Error
-from dotenv import load_dotenv
 
+import auth
+import cache_produtos
+import campos
+import consultas_lentas
+import db_pool
+import diagnostico
+import etag
+import fila
+import filtros
+import formatos
+import geracoes
+import idempotencia
+import importacao
+import indice_produtos
+import logs
+import lote
+import metricas
+import paginacao
+import regras_carrinhos
+import regras_lote
+import regras_pedidos
+import replicas
+import repositorios
+import streaming
+import vendas
+from configuracao import config
+from conexoes import POOL_ESGOTADO, connect_db, connect_db_leitura
 
-# Carrega as variáveis de ambiente do arquivo .cred (se disponível)
-load_dotenv('.cred')
 
+# -------------------------------------------------------------------------------------------------------------
 
-# Configurações para conexão com o banco de dados usando variáveis de ambiente
-config = {
-    'host': os.getenv('DB_HOST', 'localhost'),  # Obtém o host do banco de dados da variável de ambiente
-    'user': os.getenv('DB_USER'),  # Obtém o usuário do banco de dados da variável de ambiente
-    'password': os.getenv('DB_PASSWORD'),  # Obtém a senha do banco de dados da variável de ambiente
-    'database': os.getenv('DB_NAME', 'db_desafio'),  # Obtém o nome do banco de dados da variável de ambiente
-    'port': int(os.getenv('DB_PORT', 3306)),  # Obtém a porta do banco de dados da variável de ambiente
-    'ssl_ca': os.getenv('SSL_CA_PATH')  # Caminho para o certificado SSL
-}
+app = Flask(__name__)
+auth.configurar(connect_db)
+idempotencia.configurar(connect_db)
+logs.configurar(app)
+metricas.configurar(app)
+replicas.configurar(app)
+consultas_lentas.configurar()
 
 
-# Função para conectar ao banco de dados
-def connect_db():
-    """Estabelece a conexão com o banco de dados usando as configurações fornecidas."""
-    try:
-        # Tenta estabelecer a conexão com o banco de dados usando mysql-connector-python
-        conn = mysql.connector.connect(**config)
-        if conn.is_connected():
-            return conn
-    except Error as err:
-        # Em caso de erro, imprime a mensagem de erro
-        print(f"Erro: {err}")
-        return None
+@app.errorhandler(db_pool.PoolEsgotado)
+def pool_esgotado(err):
+    # Nenhuma conexão livre em DB_POOL_TIMEOUT: sobrecarga passageira, o cliente tenta de novo
+    return POOL_ESGOTADO
 
-# -------------------------------------------------------------------------------------------------------------
 
-app = Flask(__name__)
+@app.before_request
+def inicia_fila():
+    # Consumidores da outbox deste worker (iniciados uma vez por processo, depois do fork)
+    fila.iniciar(connect_db)
+    # Índice de busca de produtos deste worker (montado em segundo plano)
+    indice_produtos.produtos.iniciar(connect_db)
 
 
 # Clientes
 
 @app.route('/clientes', methods=['POST'])
+@idempotencia.idempotente
 def post_clientes():
     success = False
 
@@ -55,77 +74,104 @@ def post_clientes():
     if not all([nome, cpf, email, senha]):
         return {'erro': 'Todos os campos são obrigatórios.'}, 400
 
+    # Hash da senha no pool de hashes (503 com a fila cheia); a senha nunca é gravada em texto puro
+    try:
+        senha = auth.executa(auth.gera_hash, senha)
+    except auth.Ocupado:
+        return auth.OCUPADO
+
     conn = connect_db()
     cliente_id = None
-    if conn.is_connected():
+    if conn:
         try:
-            cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-            sql = "INSERT INTO tbl_clientes (nome, cpf, email, senha) VALUES (%s, %s, %s, %s)"  # Comando SQL para inserir um aluno
-            values = (nome, cpf, email, senha)  # Dados a serem inseridos
-
-            # Executa o comando SQL com os valores fornecidos
-            print(f"Executando SQL: {sql} com valores: {values}")
-            cursor.execute(sql, values)
+            values = (nome, cpf, email, senha)  # Dados a serem inseridos, na ordem de repositorios.clientes.gravaveis
+
+            # Registra o comando no log estruturado (assíncrono, com a senha redigida)
+            logs.sql(repositorios.clientes.sql_insere, values, repositorios.clientes.gravaveis)
+            # Executa o INSERT (prepared statement da conexão) e obtém o ID do registro recém-inserido
+            cliente_id = repositorios.clientes.insere(conn, values)
+
+            resp = {"id": cliente_id, "nome": nome, "cpf": cpf, "email": email}
+            # Resposta da Idempotency-Key gravada na mesma transação do INSERT (ver idempotencia.py)
+            reserva = g.get('idempotencia')
+            if reserva is not None:
+                reserva.conclui(conn, resp, 201)
             
             # Confirma a transação no banco de dados
             conn.commit()
-
-            # Obtém o ID do registro recém-inserido
-            cliente_id = cursor.lastrowid
+            # Invalida as ETags de tbl_clientes
+            geracoes.incrementa('tbl_clientes')
             success = True
             
+        except idempotencia.ReservaPerdida:
+            # Uma retentativa assumiu a chave e grava o cliente: esta desfaz o INSERT
+            conn.rollback()
+            return idempotencia.EM_EXECUCAO_RESP
         except Error as err:
             # Em caso de erro na inserção, imprime a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
+    else:
+        error = 'Falha na conexão com o banco de dados.'
     
     if success:
-        resp = {"id": cliente_id, "nome": nome, "cpf": cpf, "email": email, "senha": senha}
         return resp, 201
     else:
         resp = {"erro": "Erro ao inserir cliente", "message": error}
         return resp, 500
     
 
+
+@app.route('/clientes/bulk', methods=['POST'])
+def post_clientes_bulk():
+    # Array de clientes validado por inteiro e inserido em uma única transação
+    return lote.insere_requisicao(connect_db, **regras_lote.BULK_CLIENTES)
+
+
 @app.route('/clientes', methods=['GET'])
+@etag.condicional('tbl_clientes')
 def get_clientes():
     lista_cliente = []
     success = False
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_clientes"  # Comando SQL para selecionar todos os clientes
 
+    # Paginação por cursor (keyset no id): ?limit= e ?cursor=; campos da resposta: ?fields=
+    try:
+        limite, apos_id = paginacao.parametros()
+        projecao = campos.projecao(formatos.cliente)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Modo streaming (?stream=1 ou Accept: application/x-ndjson): envia a tabela inteira a partir do cursor
+    if streaming.solicitado():
+        return streaming.resposta_ndjson(
+            connect_db_leitura, repositorios.clientes.sql('todos', projecao.colunas), (apos_id,), projecao.mapeia,
+        )
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL
-            cursor.execute(sql)
-            # Recupera todos os registros da consulta
-            clientes = cursor.fetchall()
+            # Uma página a partir do cursor, com uma linha a mais para saber se existe próxima página
+            linhas = repositorios.clientes.pagina(conn, apos_id, limite, projecao.colunas)
+            clientes, proximo = paginacao.pagina(linhas, limite, chave=0)
             
-            for cliente in clientes:
-                lista_cliente.append({
-                    "ID": cliente['id'],
-                    "Nome": cliente['nome'],
-                    "Email": cliente['email'],
-                    "CPF": cliente['cpf'],
-                    "Senha": cliente['senha']
-                })
+            # Conversão das linhas no formato da resposta (fase 'mapeamento' das métricas)
+            with metricas.fase('mapeamento'):
+                for cliente in clientes:
+                    lista_cliente.append(projecao.mapeia(cliente))
             success = True
         except Error as err:
             # Em caso de erro na busca, captura a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     else:
         error = 'Falha na conexão com o banco de dados.'
 
     if success:
-        resp = {'clientes': lista_cliente}
+        resp = {'clientes': lista_cliente, 'next': proximo}
         return resp, 200
     else:
         resp = {"erro": "Erro ao buscar clientes", "message": error}
@@ -133,21 +179,24 @@ def get_clientes():
 
 
 @app.route('/clientes/<int:cliente_id>', methods=['GET'])
+@etag.condicional('tbl_clientes')
 def get_cliente_id(cliente_id):
     json_cliente = {"cliente": {}}
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_clientes WHERE id = %s"  # Comando SQL para buscar um aluno pelo ID
 
+    # Campos da resposta (?fields=)
+    try:
+        projecao = campos.projecao(formatos.cliente)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (cliente_id,))
-            # Recupera o resultado da consulta
-            cliente = cursor.fetchone()
-            # Verifica se o aluno foi encontrado e imprime seus detalhes
+            # Busca o cliente pelo ID
+            cliente = repositorios.clientes.busca(conn, cliente_id, projecao.colunas)
+            # Verifica se o cliente foi encontrado e monta a resposta
             if cliente:
-                json_cliente["cliente"] = {"ID": cliente['id'], "Nome": cliente['nome'], "CPF": cliente['cpf'], "Senha": cliente['senha'], 'Email': cliente['email']}
+                json_cliente["cliente"] = projecao.mapeia(cliente)
                 return json_cliente
             else:
                 return "Usuario não encontrado!"
@@ -156,8 +205,7 @@ def get_cliente_id(cliente_id):
             resp = {"error": f"Erro ao inserir aluno: {error}", 'message': error}  
             return resp, 500      
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
@@ -173,20 +221,19 @@ def put_cliente(cliente_id):
     if not all([nome, cpf, email, senha]):
         return {'erro': 'Todos os campos são obrigatórios.'}, 400
 
+    try:
+        senha = auth.executa(auth.gera_hash, senha)
+    except auth.Ocupado:
+        return auth.OCUPADO
+
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()
-        sql = """
-        UPDATE tbl_clientes
-        SET nome = %s, cpf = %s, email = %s, senha = %s
-        WHERE id = %s
-        """
-        values = (nome, cpf, email, senha, cliente_id)
-
         try:
-            cursor.execute(sql, values)
+            alterados = repositorios.clientes.atualiza(conn, cliente_id, (nome, cpf, email, senha))
             conn.commit()
-            if cursor.rowcount:
+            # Invalida as ETags de tbl_clientes
+            geracoes.incrementa('tbl_clientes')
+            if alterados:
                 # Retorna uma resposta de sucesso
                 return {'mensagem': 'Cliente atualizado com sucesso!'}, 200
             else:
@@ -196,7 +243,6 @@ def put_cliente(cliente_id):
             # Em caso de erro na atualização, retorna uma mensagem de erro
             return {'erro': f'Erro ao atualizar cliente: {err}'}, 500
         finally:
-            cursor.close()
             conn.close()
     else:
         return {'erro': 'Falha na conexão com o banco de dados.'}, 500
@@ -206,16 +252,15 @@ def put_cliente(cliente_id):
 def delete_cliente(cliente_id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_clientes WHERE id = %s"  # Comando SQL para deletar um aluno pelo ID
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (cliente_id,))
+            # Remove o cliente pelo ID
+            removidos = repositorios.clientes.remove(conn, cliente_id)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida as ETags de tbl_clientes
+            geracoes.incrementa('tbl_clientes')
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if removidos:
                 return {'mensagem': 'Cliente deletado com sucesso!'}, 200
             
             else:
@@ -227,12 +272,48 @@ def delete_cliente(cliente_id):
             return {'error': f'Erro ao deletar cliente: {error}'}, 500
         
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
 
+# Autenticação
+
+@app.route('/login', methods=['POST'])
+def post_login():
+    # E-mail e senha; responde com o token (Authorization: Bearer <token> nas requisições seguintes)
+    return auth.login(request.get_json(silent=True))
+
+
+@app.route('/logout', methods=['POST'])
+@auth.requer_login
+def post_logout():
+    return auth.logout(g.sessao_id)
+
+
+@app.route('/clientes/me', methods=['GET'])
+@auth.requer_login
+def get_cliente_logado():
+    # Cliente da sessão, lido do primário (a sessão acabou de ser conferida lá ou no cache)
+    try:
+        projecao = campos.projecao(formatos.cliente)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    conn = connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    try:
+        cliente = repositorios.clientes.busca(conn, g.cliente_id, projecao.colunas)
+    except Error as err:
+        return {'erro': 'Erro ao buscar cliente', 'message': str(err)}, 500
+    finally:
+        conn.close()
+    if not cliente:
+        return {'erro': 'Cliente não encontrado.'}, 404
+    return {'cliente': projecao.mapeia(cliente)}, 200
+
+
 # Fornecedores
 
 @app.route('/fornecedores', methods=['POST'])
@@ -248,32 +329,30 @@ def post_fornecedor():
 
     conn = connect_db()
     fornecedor_id = None
-    if conn.is_connected():
+    if conn:
         try:
-            cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-            sql = "INSERT INTO tbl_fornecedores (nome, cnpj, email) VALUES (%s, %s, %s)"  # Comando SQL para inserir um aluno
-            values = (nome, cnpj, email)  # Dados a serem inseridos
+            values = (nome, cnpj, email)  # Dados a serem inseridos, na ordem de repositorios.fornecedores.gravaveis
 
 
-            # Executa o comando SQL com os valores fornecidos
-            print(f"Executando SQL: {sql} com valores: {values}")
-            cursor.execute(sql, values)
+            # Registra o comando no log estruturado (assíncrono, com a senha redigida)
+            logs.sql(repositorios.fornecedores.sql_insere, values, repositorios.fornecedores.gravaveis)
+            # Executa o INSERT (prepared statement da conexão) e obtém o ID do registro recém-inserido
+            fornecedor_id = repositorios.fornecedores.insere(conn, values)
            
             # Confirma a transação no banco de dados
             conn.commit()
-
-
-            # Obtém o ID do registro recém-inserido
-            fornecedor_id = cursor.lastrowid
+            # Invalida as ETags de tbl_fornecedores
+            geracoes.incrementa('tbl_fornecedores')
             success = True
            
         except Error as err:
             # Em caso de erro na inserção, imprime a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
+    else:
+        error = 'Falha na conexão com o banco de dados.'
    
     if success:
         resp = {"id": fornecedor_id, "nome": nome, "cnpj": cnpj, "email": email}
@@ -283,43 +362,55 @@ def post_fornecedor():
         return resp, 500
 
 
+@app.route('/fornecedores/bulk', methods=['POST'])
+def post_fornecedores_bulk():
+    # Array de fornecedores validado por inteiro e inserido em uma única transação
+    return lote.insere_requisicao(connect_db, **regras_lote.BULK_FORNECEDORES)
+
+
 @app.route('/fornecedores', methods=['GET'])
+@etag.condicional('tbl_fornecedores')
 def get_fornecedores():
     lista_fornecedores = []
     success = False
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_fornecedores"  # Comando SQL para selecionar todos os clientes
-
 
+    # Paginação por cursor (keyset no id): ?limit= e ?cursor=; campos da resposta: ?fields=
+    try:
+        limite, apos_id = paginacao.parametros()
+        projecao = campos.projecao(formatos.fornecedor)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Modo streaming (?stream=1 ou Accept: application/x-ndjson): envia a tabela inteira a partir do cursor
+    if streaming.solicitado():
+        return streaming.resposta_ndjson(
+            connect_db_leitura, repositorios.fornecedores.sql('todos', projecao.colunas), (apos_id,), projecao.mapeia,
+        )
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL
-            cursor.execute(sql)
-            # Recupera todos os registros da consulta
-            fornecedores = cursor.fetchall()
+            # Uma página a partir do cursor, com uma linha a mais para saber se existe próxima página
+            linhas = repositorios.fornecedores.pagina(conn, apos_id, limite, projecao.colunas)
+            fornecedores, proximo = paginacao.pagina(linhas, limite, chave=0)
            
-            for fornecedor in fornecedores:
-                lista_fornecedores.append({
-                    "ID": fornecedor['id'],
-                    "Nome": fornecedor['nome'],
-                    "Email": fornecedor['email'],
-                    "CNPJ": fornecedor['cnpj'],
-                })
+            # Conversão das linhas no formato da resposta (fase 'mapeamento' das métricas)
+            with metricas.fase('mapeamento'):
+                for fornecedor in fornecedores:
+                    lista_fornecedores.append(projecao.mapeia(fornecedor))
             success = True
         except Error as err:
             # Em caso de erro na busca, captura a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     else:
         error = 'Falha na conexão com o banco de dados.'
 
 
     if success:
-        resp = {'fornecedores': lista_fornecedores}
+        resp = {'fornecedores': lista_fornecedores, 'next': proximo}
         return resp, 200
     else:
         resp = {"erro": "Erro ao buscar fornecedores", "message": error}
@@ -327,27 +418,24 @@ def get_fornecedores():
 
 
 @app.route('/fornecedores/<int:fornecedor_id>', methods=['GET'])
+@etag.condicional('tbl_fornecedores')
 def get_fornecedor_id(fornecedor_id):
     json_fornecedor = {"fornecedor": {}}
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_fornecedores WHERE id = %s"  # Comando SQL para buscar um aluno pelo ID
 
+    # Campos da resposta (?fields=)
+    try:
+        projecao = campos.projecao(formatos.fornecedor)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
 
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (fornecedor_id,))
-            # Recupera o resultado da consulta
-            fornecedor = cursor.fetchone()
-            # Verifica se o aluno foi encontrado e imprime seus detalhes
+            # Busca o fornecedor pelo ID
+            fornecedor = repositorios.fornecedores.busca(conn, fornecedor_id, projecao.colunas)
+            # Verifica se o fornecedor foi encontrado e monta a resposta
             if fornecedor:
-                json_fornecedor["fornecedor"] = {
-                    "ID": fornecedor['id'], 
-                    "Nome": fornecedor['nome'], 
-                    "CNPJ": fornecedor['cnpj'], 
-                    'Email': fornecedor['email']
-                    }
+                json_fornecedor["fornecedor"] = projecao.mapeia(fornecedor)
                 
                 return json_fornecedor
             else:
@@ -357,8 +445,7 @@ def get_fornecedor_id(fornecedor_id):
             resp = {"error": f"Erro ao inserir fornecedor: {error}", 'message': error}  
             return resp, 500      
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
@@ -377,19 +464,12 @@ def put_fornecedor(fornecedor_id):
 
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()
-        sql = """
-        UPDATE tbl_fornecedores
-        SET nome = %s, cnpj = %s, email = %s
-        WHERE id = %s
-        """
-        values = (nome, cnpj, email, fornecedor_id)
-
-
         try:
-            cursor.execute(sql, values)
+            alterados = repositorios.fornecedores.atualiza(conn, fornecedor_id, (nome, cnpj, email))
             conn.commit()
-            if cursor.rowcount:
+            # Invalida as ETags de tbl_fornecedores
+            geracoes.incrementa('tbl_fornecedores')
+            if alterados:
                 # Retorna uma resposta de sucesso
                 return {'mensagem': 'fornecedor atualizado com sucesso!'}, 200
             else:
@@ -399,7 +479,6 @@ def put_fornecedor(fornecedor_id):
             # Em caso de erro na atualização, retorna uma mensagem de erro
             return {'erro': f'Erro ao atualizar fornecedor: {err}'}, 500
         finally:
-            cursor.close()
             conn.close()
     else:
         return {'erro': 'Falha na conexão com o banco de dados.'}, 500
@@ -409,17 +488,15 @@ def put_fornecedor(fornecedor_id):
 def delete_fornecedor(fornecedor_id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_fornecedores WHERE id = %s"  # Comando SQL para deletar um aluno pelo ID
-
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (fornecedor_id,))
+            # Remove o fornecedor pelo ID
+            removidos = repositorios.fornecedores.remove(conn, fornecedor_id)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida as ETags de tbl_fornecedores
+            geracoes.incrementa('tbl_fornecedores')
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if removidos:
                 return {'mensagem': 'fornecedor deletado com sucesso!'}, 200
            
             else:
@@ -431,8 +508,7 @@ def delete_fornecedor(fornecedor_id):
             return {'error': f'Erro ao deletar fornecedor: {error}'}, 500
        
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
@@ -459,32 +535,31 @@ def post_produto():
 
     conn = connect_db()
     produto_id = None
-    if conn.is_connected():
+    if conn:
         try:
-            cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-            sql = "INSERT INTO tbl_produtos (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor) VALUES (%s, %s, %s, %s, %s, %s)"  # Comando SQL para inserir um aluno
-            values = (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor)  # Dados a serem inseridos
+            # Dados a serem inseridos, na ordem de repositorios.produtos.gravaveis
+            values = (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor)
 
 
-            # Executa o comando SQL com os valores fornecidos
-            print(f"Executando SQL: {sql} com valores: {values}")
-            cursor.execute(sql, values)
+            # Registra o comando no log estruturado (assíncrono, com a senha redigida)
+            logs.sql(repositorios.produtos.sql_insere, values, repositorios.produtos.gravaveis)
+            # Executa o INSERT (prepared statement da conexão) e obtém o ID do registro recém-inserido
+            produto_id = repositorios.produtos.insere(conn, values)
            
             # Confirma a transação no banco de dados
             conn.commit()
-
-
-            # Obtém o ID do registro recém-inserido
-            produto_id = cursor.lastrowid
+            # Invalida o cache de produtos em todos os workers; o índice de busca deste worker sincroniza já
+            regras_lote.produtos_alterados()
             success = True
            
         except Error as err:
             # Em caso de erro na inserção, imprime a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
+    else:
+        error = 'Falha na conexão com o banco de dados.'
    
     if success:
         resp = {"id": produto_id, "nome": nome, "qtd_em_estoque": qtd_em_estoque, "descricao": descricao, "preco": preco, "fornecedor_id": fornecedor_id, "custo_no_fornecedor": custo_no_fornecedor}
@@ -494,78 +569,140 @@ def post_produto():
         return resp, 500
 
 
+@app.route('/produtos/bulk', methods=['POST'])
+def post_produtos_bulk():
+    # Array de produtos validado por inteiro e inserido em uma única transação
+    return lote.insere_requisicao(connect_db, **regras_lote.BULK_PRODUTOS)
+
+
+@app.route('/produtos/import', methods=['POST'])
+def post_produtos_import():
+    # CSV no corpo (não multipart), lido em blocos enquanto chega e gravado em lotes; a resposta
+    # é NDJSON com o progresso de cada lote e o resumo, com o link dos rejeitos
+    if request.mimetype == 'multipart/form-data':
+        return {'erro': 'Envie o CSV direto no corpo (Content-Type: text/csv).'}, 415
+    return importacao.resposta(connect_db, request.stream, **regras_lote.IMPORTA_PRODUTOS)
+
+
+@app.route('/produtos/import/<id_>/rejeitos', methods=['GET'])
+def get_rejeitos_importacao(id_):
+    # Linhas rejeitadas de uma importação (guardadas por IMPORTACAO_RETENCAO no host que a recebeu)
+    caminho = importacao.caminho(id_)
+    if caminho is None or not os.path.exists(caminho):
+        return {'erro': 'Arquivo de rejeitos não encontrado.'}, 404
+    return send_file(caminho, mimetype='text/csv', as_attachment=True, download_name=f'rejeitos-{id_}.csv')
+
+
 @app.route('/produtos', methods=['GET'])
+@etag.condicional('tbl_produtos')
 def get_produtos():
     lista_produtos = []
     success = False
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_produtos"  # Comando SQL para selecionar todos os clientes
-
 
+    # Filtros (?preco_min=, ?preco_max=, ?fornecedor_id=, ?sort=preco|-preco|id|-id) e paginação por cursor
+    try:
+        projecao = campos.projecao(formatos.produto)  # Campos da resposta (?fields=) e colunas do SELECT
+        consulta = filtros.monta_consulta(
+            'tbl_produtos', paginar=not streaming.solicitado(), colunas=projecao.colunas,
+        )
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Modo streaming (?stream=1 ou Accept: application/x-ndjson): envia todos os registros filtrados
+    if streaming.solicitado():
+        return streaming.resposta_ndjson(connect_db_leitura, consulta.sql, consulta.valores, projecao.mapeia)
+
+    # Página já em cache neste worker e ainda válida (nenhuma escrita em produtos desde então)
+    chave_cache = ('lista', consulta.sql, tuple(consulta.valores))
+    em_cache = cache_produtos.produtos.obter(chave_cache)
+    if em_cache is not None:
+        return em_cache, 200
+    geracao = cache_produtos.produtos.geracao()
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL
-            cursor.execute(sql)
-            # Recupera todos os registros da consulta
-            produtos = cursor.fetchall()
+            # Executa o SELECT montado pelos filtros (uma linha a mais para saber se existe próxima página);
+            # cada combinação de filtros vira um prepared statement reaproveitado pela conexão
+            produtos, proximo = consulta.pagina(repositorios.produtos.consulta(conn, consulta.sql, consulta.valores))
            
-            for produto in produtos:
-                lista_produtos.append({
-                    "ID": produto['id'],
-                    "Nome": produto['nome'],
-                    "Descricao": produto['descricao'],
-                    "Preco": produto['preco'],
-                    "Qtd_em_estoque": produto['qtd_em_estoque'],
-                    "Fornecedor_ID": produto['fornecedor_id'],
-                    "Custo_no_Fornecedor": produto['custo_no_fornecedor']
-                })
+            # Conversão das linhas no formato da resposta (fase 'mapeamento' das métricas)
+            with metricas.fase('mapeamento'):
+                for produto in produtos:
+                    lista_produtos.append(projecao.mapeia(produto))
 
             success = True
         except Error as err:
             # Em caso de erro na busca, captura a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     else:
         error = 'Falha na conexão com o banco de dados.'
 
 
     if success:
-        resp = {'produtos': lista_produtos}
+        resp = {'produtos': lista_produtos, 'next': proximo}
+        cache_produtos.produtos.guardar(chave_cache, resp, geracao)
         return resp, 200
     else:
         resp = {"erro": "Erro ao buscar produtos", "message": error}
         return resp, 500
 
 
+@app.route('/produtos/busca', methods=['GET'])
+def get_produtos_busca():
+    # ?q=: produtos com todos os termos (sem acentos), por relevância, do índice em memória do worker
+    try:
+        texto, limite = indice_produtos.parametros('q')
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    if not indice_produtos.produtos.pronto:
+        return indice_produtos.EM_CONSTRUCAO
+    return indice_produtos.resposta_busca(texto, limite), 200
+
+
+@app.route('/produtos/autocomplete', methods=['GET'])
+def get_produtos_autocomplete():
+    # ?prefix=: termos que completam a última palavra digitada e produtos com eles no nome
+    try:
+        texto, limite = indice_produtos.parametros('prefix')
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    if not indice_produtos.produtos.pronto:
+        return indice_produtos.EM_CONSTRUCAO
+    return indice_produtos.resposta_autocomplete(texto, limite), 200
+
+
 @app.route('/produtos/<int:produto_id>', methods=['GET'])
+@etag.condicional('tbl_produtos')
 def get_produto_id(produto_id):
     json_produto = {"produto": {}}
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_produtos WHERE id = %s"  # Comando SQL para buscar um aluno pelo ID
-
 
+    # Campos da resposta (?fields=); o cache guarda o produto completo e a projeção só recorta a resposta
+    try:
+        projecao = campos.projecao(formatos.produto)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Leitura do cache de produtos (invalidado por POST/PUT/DELETE em qualquer worker)
+    em_cache = cache_produtos.produtos.obter(('produto', produto_id))
+    if em_cache is not None:
+        json_produto["produto"] = projecao.filtra(em_cache)
+        return json_produto
+    geracao = cache_produtos.produtos.geracao()
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (produto_id,))
-            # Recupera o resultado da consulta
-            produto = cursor.fetchone()
-            # Verifica se o aluno foi encontrado e imprime seus detalhes
+            # Busca o produto pelo ID
+            produto = repositorios.produtos.busca(conn, produto_id)
+            # Verifica se o produto foi encontrado e monta a resposta
             if produto:
-                json_produto["produto"] = {
-                    "ID": produto['id'],
-                    "Nome": produto['nome'],
-                    "Descricao": produto['descricao'],
-                    "Preco": produto['preco'],
-                    "Qtd_em_estoque": produto['qtd_em_estoque'],
-                    "Fornecedor_ID": produto['fornecedor_id'],
-                    "Custo_no_Fornecedor": produto['custo_no_fornecedor']
-                    }
+                completo = formatos.produto(produto)
+                cache_produtos.produtos.guardar(('produto', produto_id), completo, geracao)
+                json_produto["produto"] = projecao.filtra(completo)
                
                 return json_produto
 
@@ -577,8 +714,7 @@ def get_produto_id(produto_id):
             resp = {"error": f"Erro ao inserir produto: {error}", 'message': error}  
             return resp, 500      
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
@@ -602,19 +738,15 @@ def put_produto(produto_id):
 
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()
-        sql = """
-        UPDATE tbl_produtos
-        SET nome = %s, descricao = %s, qtd_em_estoque = %s, fornecedor_id = %s, preco = %s, custo_no_fornecedor = %s
-        WHERE id = %s
-        """
-        values = (nome, descricao, qtd_em_estoque, fornecedor_id, preco, custo_no_fornecedor, produto_id)
+        # Na ordem de repositorios.produtos.gravaveis
+        values = (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor)
 
 
         try:
-            cursor.execute(sql, values)
+            alterados = repositorios.produtos.atualiza(conn, produto_id, values)
             conn.commit()
-            if cursor.rowcount:
+            regras_lote.produtos_alterados()
+            if alterados:
                 # Retorna uma resposta de sucesso
                 return {'mensagem': 'produto atualizado com sucesso!'}, 200
             else:
@@ -624,7 +756,6 @@ def put_produto(produto_id):
             # Em caso de erro na atualização, retorna uma mensagem de erro
             return {'erro': f'Erro ao atualizar produto: {err}'}, 500
         finally:
-            cursor.close()
             conn.close()
     else:
         return {'erro': 'Falha na conexão com o banco de dados.'}, 500
@@ -633,17 +764,14 @@ def put_produto(produto_id):
 def delete_produto(produto_id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_produtos WHERE id = %s"  # Comando SQL para deletar um aluno pelo ID
-
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (produto_id,))
+            # Remove o produto pelo ID
+            removidos = repositorios.produtos.remove(conn, produto_id)
             # Confirma a transação no banco de dados
             conn.commit()
+            regras_lote.produtos_alterados()
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if removidos:
                 return {'mensagem': 'produto deletado com sucesso!'}, 200
            
             else:
@@ -655,8 +783,7 @@ def delete_produto(produto_id):
             return {'error': f'Erro ao deletar produto: {error}'}, 500
        
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
@@ -664,87 +791,59 @@ def delete_produto(produto_id):
 
 @app.route('/carrinhos', methods=['POST'])
 def post_carrinho():
-    success = False
-
-    # entrada de dados recebida via requisição HTTP POST (json)
-    entrada_dados = request.json
-    produto_id = entrada_dados.get('produto_id')
-    quantidade = entrada_dados.get('quantidade')
-
-
-    conn = connect_db()
-    carrinho_id = None
-    if conn.is_connected():
-        try:
-            cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-            sql = "INSERT INTO tbl_carrinho (produto_id, quantidade) VALUES (%s, %s)"  # Comando SQL para inserir um aluno
-            values = (produto_id, quantidade)  # Dados a serem inseridos
+    # Com "itens": [{"produto_id", "quantidade"}, ...] cria o carrinho com todos os itens em uma transação
+    return regras_carrinhos.cria(connect_db, request.json)
 
 
-            # Executa o comando SQL com os valores fornecidos
-            print(f"Executando SQL: {sql} com valores: {values}")
-            cursor.execute(sql, values)
-           
-            # Confirma a transação no banco de dados
-            conn.commit()
-
-
-            # Obtém o ID do registro recém-inserido
-            carrinho_id = cursor.lastrowid
-            success = True
-           
-        except Error as err:
-            # Em caso de erro na inserção, imprime a mensagem de erro
-            error = str(err)
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
-   
-    if success:
-        resp = {"id": carrinho_id, "produto_id": produto_id, "quantidade": quantidade}
-        return resp, 201
-    else:
-        resp = {"erro": "Erro ao inserir carrinho", "message": error}
-        return resp, 500
+@app.route('/carrinhos/<int:carrinho_id>/itens', methods=['PUT'])
+def put_carrinho_itens(carrinho_id):
+    # Inclui ou altera vários itens de uma vez; quantidade 0 remove o item
+    return regras_carrinhos.atualiza_itens(connect_db, carrinho_id, request.get_json(silent=True))
 
 
 @app.route('/carrinhos', methods=['GET'])
+@etag.condicional('tbl_carrinho')
 def get_carrinhos():
     lista_carrinhos = []
     success = False
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_carrinho"  # Comando SQL para selecionar todos os clientes
-
 
+    # Paginação por cursor (keyset no id): ?limit= e ?cursor=; campos da resposta: ?fields=
+    try:
+        limite, apos_id = paginacao.parametros()
+        projecao = campos.projecao(formatos.carrinho)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Modo streaming (?stream=1 ou Accept: application/x-ndjson): envia a tabela inteira a partir do cursor
+    if streaming.solicitado():
+        return streaming.resposta_ndjson(
+            connect_db_leitura, repositorios.carrinhos.sql('todos', projecao.colunas), (apos_id,), projecao.mapeia,
+        )
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL
-            cursor.execute(sql)
-            # Recupera todos os registros da consulta
-            carrinhos = cursor.fetchall()
+            # Uma página a partir do cursor, com uma linha a mais para saber se existe próxima página
+            linhas = repositorios.carrinhos.pagina(conn, apos_id, limite, projecao.colunas)
+            carrinhos, proximo = paginacao.pagina(linhas, limite, chave=0)
            
-            for carrinho in carrinhos:
-                lista_carrinhos.append({
-                    "ID": carrinho['id'],
-                    "Produto_ID": carrinho['produto_id'],
-                    "Quantidade": carrinho['quantidade']
-                })
+            # Conversão das linhas no formato da resposta (fase 'mapeamento' das métricas)
+            with metricas.fase('mapeamento'):
+                for carrinho in carrinhos:
+                    lista_carrinhos.append(projecao.mapeia(carrinho))
             success = True
         except Error as err:
             # Em caso de erro na busca, captura a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     else:
         error = 'Falha na conexão com o banco de dados.'
 
 
     if success:
-        resp = {'carrinhos': lista_carrinhos}
+        resp = {'carrinhos': lista_carrinhos, 'next': proximo}
         return resp, 200
     else:
         resp = {"erro": "Erro ao buscar carrinhos", "message": error}
@@ -752,26 +851,26 @@ def get_carrinhos():
 
 
 @app.route('/carrinhos/<int:carrinho_id>', methods=['GET'])
+@etag.condicional('tbl_carrinho', 'tbl_produtos')
 def get_carrinho_id(carrinho_id):
     json_carrinho = {"carrinho": {}}
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_carrinho WHERE id = %s"  # Comando SQL para buscar um aluno pelo ID
 
+    # Campos do cabeçalho (?fields=); os itens e o total vêm sempre
+    try:
+        projecao = campos.projecao(formatos.carrinho_detalhe)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
 
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (carrinho_id,))
-            # Recupera o resultado da consulta
-            carrinho = cursor.fetchone()
-            # Verifica se o aluno foi encontrado e imprime seus detalhes
-            if carrinho:
-                json_carrinho["carrinho"] = {
-                    "ID": carrinho['id'],
-                    "Produto_id": carrinho['produto_id'],
-                    "Quantidade": carrinho['quantidade']
-                    }
+            # Cabeçalho, itens e preços em uma única consulta
+            linhas = repositorios.carrinhos.detalhe(conn, carrinho_id)
+            # Verifica se o carrinho foi encontrado e monta a resposta
+            if linhas:
+                with metricas.fase('mapeamento'):
+                    cabecalho = projecao.filtra(formatos.carrinho_detalhe(linhas[0]))
+                    json_carrinho["carrinho"] = regras_carrinhos.detalhe(linhas, cabecalho)
                
                 return json_carrinho
 
@@ -783,68 +882,29 @@ def get_carrinho_id(carrinho_id):
             resp = {"error": f"Erro ao inserir carrinho: {error}", 'message': error}  
             return resp, 500      
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
 @app.route('/carrinhos/<int:carrinho_id>', methods=['PUT'])
 def put_carrinho(carrinho_id):
-   
-    produto_id = request.json.get('produto_id')
-    quantidade = request.json.get('quantidade')
-
-
-    # Validação básica dos dados
-    if not all([produto_id, quantidade]):
-        return {'erro': 'Todos os campos são obrigatórios.'}, 400
-
-
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor()
-        sql = """
-        UPDATE tbl_carrinho
-        SET produto_id = %s, quantidade = %s
-        WHERE id = %s
-        """
-        values = (produto_id, quantidade, carrinho_id)
-
-
-        try:
-            cursor.execute(sql, values)
-            conn.commit()
-            if cursor.rowcount:
-                # Retorna uma resposta de sucesso
-                return {'mensagem': 'carrinho atualizado com sucesso!'}, 200
-            else:
-                # Cliente não encontrado
-                return {'erro': 'carrinho não encontrado.'}, 404
-        except Error as err:
-            # Em caso de erro na atualização, retorna uma mensagem de erro
-            return {'erro': f'Erro ao atualizar carrinho: {err}'}, 500
-        finally:
-            cursor.close()
-            conn.close()
-    else:
-        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    # API antiga (produto_id, quantidade): o carrinho passa a ter só esse item
+    return regras_carrinhos.atualiza(connect_db, carrinho_id, request.json)
 
 
 @app.route('/carrinhos/<int:carrinho_id>', methods=['DELETE'])
 def delete_carrinho(carrinho_id):
     conn = connect_db()  # Conecta ao banco de dados
     if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_carrinho WHERE id = %s"  # Comando SQL para deletar um aluno pelo ID
-
-
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (carrinho_id,))
+            # Remove o carrinho pelo ID
+            removidos = repositorios.carrinhos.remove(conn, carrinho_id)
             # Confirma a transação no banco de dados
             conn.commit()
+            # Invalida as ETags de tbl_carrinho
+            geracoes.incrementa('tbl_carrinho')
             # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
+            if removidos:
                 return {'mensagem': 'carrinho deletado com sucesso!'}, 200
            
             else:
@@ -856,27 +916,26 @@ def delete_carrinho(carrinho_id):
             return {'error': f'Erro ao deletar carrinho: {error}'}, 500
        
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
 @app.route('/carrinhos/cliente/<int:cliente_id>', methods=['GET'])
+@etag.condicional('tbl_carrinho', 'tbl_pedidos')
 def lista_carrinhos_por_cliente(cliente_id):
-    conn = connect_db()
+    # Campos da resposta (?fields=)
+    try:
+        projecao = campos.projecao(formatos.carrinho_colunas)
+    except paginacao.ParametroInvalido as err:
+        return jsonify({'error': str(err)}), 400
+
+    conn = connect_db_leitura()
     if not conn:
         return ({'error': 'Erro ao conectar ao banco de dados'}), 500
 
     try:
-        cursor = conn.cursor(dictionary=True)
-        sql = """
-        SELECT tbl_carrinho.id, tbl_carrinho.produto_id, tbl_carrinho.quantidade
-        FROM tbl_carrinho
-        INNER JOIN tbl_pedidos ON tbl_carrinho.id = tbl_pedidos.carrinho_id
-        WHERE tbl_pedidos.cliente_id = %s
-        """
-        cursor.execute(sql, (cliente_id,))
-        carrinhos = cursor.fetchall()
+        linhas = repositorios.carrinhos.por_cliente(conn, cliente_id, projecao.colunas)
+        carrinhos = [projecao.mapeia(linha) for linha in linhas]
 
         if carrinhos:
             return jsonify(carrinhos), 200
@@ -887,130 +946,99 @@ def lista_carrinhos_por_cliente(cliente_id):
         return jsonify({'error': f"Erro ao listar carrinhos: {err}"}), 400
 
     finally:
-        cursor.close()
         conn.close()
 
 # Pedidos
 
 @app.route('/pedidos', methods=['POST'])
+@idempotencia.idempotente
 def post_pedido():
-    success = False
-
-
-    # entrada de dados recebida via requisição HTTP POST (json)
-    entrada_dados = request.json
-    cliente_id = entrada_dados.get('cliente_id')
-    carrinho_id = entrada_dados.get('carrinho_id')
-    data_hora = entrada_dados.get('data_hora')
-    status = entrada_dados.get('status')
-
+    # Pedido, reservas de estoque e outbox em uma transação (regras compartilhadas com o app assíncrono)
+    return regras_pedidos.cria(connect_db, request.json, g.get('idempotencia'))
 
 
-
-    conn = connect_db()
-    pedido_id = None
-    if conn.is_connected():
-        try:
-            cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-            sql = "INSERT INTO tbl_pedidos (cliente_id, data_hora, carrinho_id, status) VALUES (%s, %s, %s, %s)"  # Comando SQL para inserir um aluno
-            values = (cliente_id, data_hora, carrinho_id, status)  # Dados a serem inseridos
-
-
-            # Executa o coma    ndo SQL com os valores fornecidos
-            print(f"Executando SQL: {sql} com valores: {values}")
-            cursor.execute(sql, values)
-           
-            # Confirma a transação no banco de dados
-            conn.commit()
-
-
-            # Obtém o ID do registro recém-inserido
-            pedido_id = cursor.lastrowid
-            success = True
-           
-        except Error as err:
-            # Em caso de erro na inserção, imprime a mensagem de erro
-            error = str(err)
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
-   
-    if success:
-        resp = {"id": pedido_id, "cliente_id": cliente_id, "data_hora": data_hora, "carrinho_id": carrinho_id, "status": status}
-        return resp, 201
-    else:
-        resp = {"erro": "Erro ao inserir pedido", "message": error}
-        return resp, 500
-   
-
 @app.route('/pedidos', methods=['GET'])
+@etag.condicional('tbl_pedidos')
 def get_pedidos():
     lista_pedidos = []
     success = False
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn.is_connected():
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_pedidos"  # Comando SQL para selecionar todos os clientes
-
 
+    # Filtros (?status=, ?cliente_id=, ?data_de=, ?data_ate=, ?sort=data_hora|-data_hora|id|-id) e paginação por cursor
+    try:
+        projecao = campos.projecao(formatos.pedido)  # Campos da resposta (?fields=) e colunas do SELECT
+        consulta = filtros.monta_consulta(
+            'tbl_pedidos', paginar=not streaming.solicitado(), colunas=projecao.colunas,
+        )
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    # Modo streaming (?stream=1 ou Accept: application/x-ndjson): envia todos os registros filtrados
+    if streaming.solicitado():
+        return streaming.resposta_ndjson(connect_db_leitura, consulta.sql, consulta.valores, projecao.mapeia)
+
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL
-            cursor.execute(sql)
-            # Recupera todos os registros da consulta
-            pedidos = cursor.fetchall()
+            # Executa o SELECT montado pelos filtros (uma linha a mais para saber se existe próxima página);
+            # cada combinação de filtros vira um prepared statement reaproveitado pela conexão
+            pedidos, proximo = consulta.pagina(repositorios.pedidos.consulta(conn, consulta.sql, consulta.valores))
            
-            for pedido in pedidos:
-                lista_pedidos.append({
-                    "ID": pedido['id'],
-                    "Cliente_ID": pedido['cliente_id'],
-                    "carrinho_id": pedido['carrinho_id'],
-                    "data_hora": pedido['data_hora'],
-                    "status": pedido['status']
-                })
+            # Conversão das linhas no formato da resposta (fase 'mapeamento' das métricas)
+            with metricas.fase('mapeamento'):
+                for pedido in pedidos:
+                    lista_pedidos.append(projecao.mapeia(pedido))
             success = True
         except Error as err:
             # Em caso de erro na busca, captura a mensagem de erro
             error = str(err)
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
     else:
         error = 'Falha na conexão com o banco de dados.'
 
 
     if success:
-        resp = {'pedidos': lista_pedidos}
+        resp = {'pedidos': lista_pedidos, 'next': proximo}
         return resp, 200
     else:
         resp = {"erro": "Erro ao buscar pedidos", "message": error}
         return resp, 500
 
 
+@app.route('/pedidos/export.csv', methods=['GET'])
+def get_pedidos_export():
+    # Histórico de pedidos em CSV: os filtros de GET /pedidos (sem paginação) e ?fields=, com as linhas
+    # lidas de um cursor não bufferizado enquanto a resposta é enviada
+    try:
+        projecao = campos.projecao(formatos.pedido_colunas)
+        consulta = filtros.monta_consulta('tbl_pedidos', paginar=False, colunas=projecao.colunas)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    return streaming.resposta_csv(
+        connect_db_leitura, consulta.sql, consulta.valores, projecao.mapeia, projecao.chaves, 'pedidos.csv',
+    )
+
+
 @app.route('/pedidos/<int:pedido_id>', methods=['GET'])
+@etag.condicional('tbl_pedidos')
 def get_pedido_id(pedido_id):
     json_pedido = {"pedido": {}}
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor(dictionary=True)  # Cria um cursor para executar comandos SQL
-        sql = "SELECT * FROM tbl_pedidos WHERE id = %s"  # Comando SQL para buscar um aluno pelo ID
 
+    # Campos da resposta (?fields=)
+    try:
+        projecao = campos.projecao(formatos.pedido)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
 
+    conn = connect_db_leitura()  # Conecta ao banco de dados
+    if conn:
         try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (pedido_id,))
-            # Recupera o resultado da consulta
-            pedido = cursor.fetchone()
-            # Verifica se o aluno foi encontrado e imprime seus detalhes
+            # Busca o pedido pelo ID
+            pedido = repositorios.pedidos.busca(conn, pedido_id, projecao.colunas)
+            # Verifica se o pedido foi encontrado e monta a resposta
             if pedido:
-                json_pedido["pedido"] = {
-                    "ID": pedido['id'],
-                    "Cliente_ID": pedido['cliente_id'],
-                    "carrinho_id": pedido['carrinho_id'],
-                    "data_hora": pedido['data_hora'],
-                    "status": pedido['status']
-                    }
+                json_pedido["pedido"] = projecao.mapeia(pedido)
                
                 return json_pedido
 
@@ -1022,98 +1050,37 @@ def get_pedido_id(pedido_id):
             resp = {"error": f"Erro ao inserir pedido: {error}", 'message': error}  
             return resp, 500      
         finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
+            # Devolve a conexão ao pool
             conn.close()
 
 
 @app.route('/pedidos/<int:pedido_id>', methods=['PUT'])
 def put_pedido(pedido_id):
-   
-    cliente_id = request.json.get('cliente_id')
-    carrinho_id = request.json.get('carrinho_id')
-    data_hora = request.json.get('data_hora')
-    status = request.json.get('status')
-
-
-    # Validação básica dos dados
-    if not all([cliente_id, carrinho_id]):
-        return {'erro': 'ID do cliente e do carrinho sao obrigatorios'}, 400
-
-
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor()
-        sql = """
-        UPDATE tbl_pedidos
-        SET cliente_id = %s, carrinho_id = %s, data_hora = %s, status = %s
-        WHERE id = %s
-        """
-        values = (cliente_id, carrinho_id, data_hora, status, pedido_id)
-
-
-        try:
-            cursor.execute(sql, values)
-            conn.commit()
-            if cursor.rowcount:
-                # Retorna uma resposta de sucesso
-                return {'mensagem': 'pedido atualizado com sucesso!'}, 200
-            else:
-                # Cliente não encontrado
-                return {'erro': 'pedido não encontrado.'}, 404
-        except Error as err:
-            # Em caso de erro na atualização, retorna uma mensagem de erro
-            return {'erro': f'Erro ao atualizar pedido: {err}'}, 500
-        finally:
-            cursor.close()
-            conn.close()
-    else:
-        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    return regras_pedidos.atualiza(connect_db, pedido_id, request.json)
 
 
 
 @app.route('/pedidos/<int:pedido_id>', methods=['DELETE'])
 def delete_pedido(pedido_id):
-    conn = connect_db()  # Conecta ao banco de dados
-    if conn:
-        cursor = conn.cursor()  # Cria um cursor para executar comandos SQL
-        sql = "DELETE FROM tbl_pedidos WHERE id = %s"  # Comando SQL para deletar um aluno pelo ID
-
-
-        try:
-            # Executa o comando SQL com o ID fornecido
-            cursor.execute(sql, (pedido_id,))
-            # Confirma a transação no banco de dados
-            conn.commit()
-            # Verifica se alguma linha foi afetada (deletada)
-            if cursor.rowcount:
-                return {'mensagem': 'pedido deletado com sucesso!'}, 200
-           
-            else:
-                return {'error': 'pedido não encontrado.'}, 404
-           
-        except Error as err:
-            # Em caso de erro na deleção, imprime a mensagem de erro
-            error = str(err)
-            return {'error': f'Erro ao deletar pedido: {error}'}, 500
-       
-        finally:
-            # Fecha o cursor e a conexão para liberar recursos
-            cursor.close()
-            conn.close()
+    return regras_pedidos.remove(connect_db, pedido_id)
 
 
 @app.route('/pedidos/cliente/<int:cliente_id>', methods=['GET'])
+@etag.condicional('tbl_pedidos')
 def busca_pedidos_por_cliente(cliente_id):
-    conn = connect_db()
+    # Campos da resposta (?fields=)
+    try:
+        projecao = campos.projecao(formatos.pedido_colunas)
+    except paginacao.ParametroInvalido as err:
+        return jsonify({'error': str(err)}), 400
+
+    conn = connect_db_leitura()
     if not conn:
         return jsonify({'error': 'Erro ao conectar ao banco de dados'}), 500
 
     try:
-        cursor = conn.cursor(dictionary=True)
-        sql = "SELECT * FROM tbl_pedido WHERE cliente_id = %s"
-        cursor.execute(sql, (cliente_id,))
-        pedidos = cursor.fetchall()
+        linhas = repositorios.pedidos.por_cliente(conn, cliente_id, projecao.colunas)
+        pedidos = [projecao.mapeia(linha) for linha in linhas]
 
         if pedidos:
             return jsonify(pedidos), 200
@@ -1124,10 +1091,62 @@ def busca_pedidos_por_cliente(cliente_id):
         return jsonify({'error': f"Erro ao buscar pedidos: {err}"}), 400
 
     finally:
-        cursor.close()
         conn.close()
 
 
+# Relatórios
+
+@app.route('/relatorios/vendas', methods=['GET'])
+@etag.condicional('tbl_pedidos')
+def get_relatorio_vendas():
+    # Receita, custo e margem por fornecedor, produto ou dia, lidos das vendas consolidadas
+    try:
+        params = vendas.parametros()
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    conn = connect_db_leitura()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    try:
+        return vendas.relatorio(conn, params), 200
+    except Error as err:
+        return {'erro': 'Erro ao gerar relatório', 'message': str(err)}, 500
+    finally:
+        conn.close()
+
+
+# Diagnóstico
+
+@app.route('/debug/pool', methods=['GET'])
+@diagnostico.protegida
+def get_estatisticas_pool():
+    # Estatísticas do pool de conexões deste worker (e das réplicas de leitura, se configuradas)
+    resp = {'pool': db_pool.obter_pool(config).estatisticas()}
+    roteador = replicas.obter_roteador(config)
+    if roteador is not None:
+        resp['replicas'] = roteador.estatisticas()
+    return resp, 200
+
+
+@app.route('/debug/slow-queries', methods=['GET'])
+@diagnostico.protegida
+def get_consultas_lentas():
+    # Comandos acima de SLOW_QUERY_MS neste worker, agregados por SQL normalizado
+    ordem = request.args.get('ordem', 'total_ms')
+    if ordem not in ('total_ms', 'max_ms', 'execucoes'):
+        return {'erro': 'ordem deve ser total_ms, max_ms ou execucoes.'}, 400
+    try:
+        quantidade = int(request.args.get('top', 20))
+    except ValueError:
+        return {'erro': 'top deve ser um número inteiro.'}, 400
+    return {
+        'pid': os.getpid(),
+        'limite_ms': consultas_lentas.LIMITE_MS,
+        'consultas': consultas_lentas.piores(quantidade, ordem),
+    }, 200
+
+
 if __name__ == '__main__':
     app.run(debug=True)
 
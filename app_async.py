@@ -0,0 +1,981 @@
+"""Modo assíncrono da API: as mesmas rotas e respostas de app.py, servidas sobre asyncio.
+
+Quart (a API do Flask sobre ASGI) com aiomysql: uma requisição esperando o MySQL
+ocupa só uma corrotina, então um worker mantém centenas de requisições em voo
+sobre um pool assíncrono de ASYNC_DB_POOL_MAX conexões (ASYNC_DB_POOL_MIN abertas
+desde o início).
+
+As leituras e as escritas de um único comando rodam no pool assíncrono. As escritas
+de pedidos (pedido, reservas de estoque e outbox na mesma transação), as de
+carrinhos (carrinho e itens) e os bulk inserts reaproveitam as regras síncronas
+(regras_pedidos, regras_carrinhos, lote) em uma thread, com o pool de conexões de
+conexoes.py. Os formatos das respostas (formatos) e as regras dos bulks (regras_lote)
+são os mesmos de app.py.
+
+Os comandos do pool assíncrono são medidos como os de cursores.CursorMedido: tempo
+na fase 'consulta' das métricas e, acima de SLOW_QUERY_MS, registro em
+consultas_lentas (GET /debug/slow-queries). Nas exportações em streaming conta só o
+execute(), sem EXPLAIN, porque a conexão ainda está lendo as linhas.
+
+O modo é escolhido no deploy: API_MODO=async gunicorn (ver gunicorn.conf.py).
+"""
+import asyncio
+import contextlib
+import functools
+import os
+import ssl
+import tempfile
+import time
+import uuid
+
+import aiomysql
+from mysql.connector import Error
+from pymysql.err import MySQLError
+from quart import Quart, Response, abort, g, has_request_context, jsonify, make_response, request, send_file
+from quart.json.provider import DefaultJSONProvider
+
+import auth
+import cache_produtos
+import campos
+import consultas_lentas
+import db_pool
+import diagnostico
+import etag
+import fila
+import filtros
+import formatos
+import geracoes
+import idempotencia
+import importacao
+import indice_produtos
+import logs
+import lote
+import metricas
+import paginacao
+import regras_carrinhos
+import regras_lote
+import regras_pedidos
+import repositorios
+import streaming
+import vendas
+from conexoes import POOL_ESGOTADO, connect_db
+from configuracao import config
+
+
+# Somado ao pool síncrono de conexoes.py (regras em threads, fila, índice), por worker:
+# o orçamento total de conexões com o MySQL está em gunicorn.conf.py
+POOL_MIN = int(os.getenv('ASYNC_DB_POOL_MIN', 2))
+POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', 20))
+
+
+def _acumula(fase, segundos):
+    """metricas.acumula para a requisição atual do Quart."""
+    if not has_request_context():
+        return
+    fases = g.get('_fases')
+    if fases is not None:
+        fases[fase] = fases.get(fase, 0.0) + segundos
+
+
+class ProvedorJSONMedido(metricas.CodificacaoMedida, DefaultJSONProvider):
+    """metricas.ProvedorJSONMedido para o Quart: mesmo codificador, tempo na fase 'json'."""
+
+    acumula = staticmethod(_acumula)
+
+
+app = Quart(__name__)
+app.json = ProvedorJSONMedido(app)
+# Sem limite de corpo, como no Flask (o Quart limita a 16 MB): POST /produtos/import recebe arquivos de GBs
+app.config['MAX_CONTENT_LENGTH'] = None
+# Comandos lentos das regras síncronas executadas em threads (cursores.CursorMedido)
+consultas_lentas.configurar()
+
+# Pool assíncrono do worker, criado quando o servidor começa a atender (já no loop de eventos)
+_pool = None
+
+
+@app.before_serving
+async def inicia():
+    global _pool
+    contexto_ssl = ssl.create_default_context(cafile=config['ssl_ca']) if config['ssl_ca'] else None
+    # autocommit: uma leitura não deixa transação aberta, e o aiomysql fecharia a conexão ao devolvê-la
+    _pool = await aiomysql.create_pool(
+        minsize=POOL_MIN, maxsize=POOL_MAX, pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        host=config['host'], port=config['port'], user=config['user'], password=config['password'] or '',
+        db=config['database'], ssl=contexto_ssl, autocommit=True,
+    )
+    # Consumidores da outbox deste worker
+    fila.iniciar(connect_db)
+    # Índice de busca de produtos deste worker (montado em segundo plano)
+    indice_produtos.produtos.iniciar(connect_db)
+
+
+@app.after_serving
+async def encerra():
+    _pool.close()
+    await _pool.wait_closed()
+
+
+@app.errorhandler(db_pool.PoolEsgotado)
+async def pool_esgotado(err):
+    # Regras síncronas (em threads) sem conexão livre no pool de conexoes.py: 503, como no app.py
+    return POOL_ESGOTADO
+
+
+# Request id e métricas (os mesmos de logs.configurar e metricas.configurar)
+
+@app.before_request
+async def inicia_requisicao():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g._inicio = time.perf_counter()
+    g._fases = {}
+
+
+@app.after_request
+async def finaliza_requisicao(resp):
+    resp.headers['X-Request-ID'] = g.request_id
+    g._status = resp.status_code
+    return resp
+
+
+@app.teardown_request
+async def registra_medicao(exc):
+    inicio = g.get('_inicio')
+    if inicio is None:
+        return
+    status = 500 if exc is not None else g.get('_status', 500)
+    metricas.registra(
+        metricas.rota(request.url_rule), request.method, status, time.perf_counter() - inicio, g.get('_fases', {}),
+    )
+
+
+@contextlib.contextmanager
+def _fase(nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _acumula(nome, time.perf_counter() - inicio)
+
+
+@contextlib.asynccontextmanager
+async def _conexao():
+    """Conexão do pool assíncrono, devolvida ao sair do bloco."""
+    inicio = time.perf_counter()
+    async with _pool.acquire() as conn:
+        _acumula('conexao', time.perf_counter() - inicio)
+        yield conn
+
+
+async def _explain(conn, sql, valores):
+    """consultas_lentas._explain pelo aiomysql; None se não for possível."""
+    if not consultas_lentas.explicavel(sql):
+        return None
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute('EXPLAIN ' + sql, valores)
+            return consultas_lentas.plano(await cursor.fetchall())
+    except MySQLError:
+        return None
+
+
+async def _comando(conn, cursor, sql, valores, leitura=False):
+    """cursor.execute() (e fetchall() se leitura) medido como em cursores.CursorMedido.
+
+    O cursor do aiomysql lê o resultado inteiro no execute(), então a conexão já está
+    livre para o EXPLAIN de um comando lento.
+    """
+    inicio = time.perf_counter()
+    with _fase('consulta'):
+        await cursor.execute(sql, valores)
+        linhas = await cursor.fetchall() if leitura else None
+    duracao = time.perf_counter() - inicio
+    if consultas_lentas.lenta(duracao):
+        explain = await _explain(conn, sql, valores) if consultas_lentas.sem_plano(sql) else None
+        consultas_lentas.registra(sql, valores, duracao, cursor.rowcount, explain)
+    return linhas
+
+
+async def _consulta(sql, valores=()):
+    """Linhas (tuplas) de um SELECT, na ordem das colunas pedidas."""
+    async with _conexao() as conn:
+        async with conn.cursor() as cursor:
+            return await _comando(conn, cursor, sql, tuple(valores), leitura=True)
+
+
+async def _executa(sql, valores=()):
+    """Executa um INSERT/UPDATE/DELETE (autocommit); retorna (linhas afetadas, id inserido)."""
+    async with _conexao() as conn:
+        async with conn.cursor() as cursor:
+            await _comando(conn, cursor, sql, tuple(valores))
+            return cursor.rowcount, cursor.lastrowid
+
+
+async def _json():
+    """Corpo JSON da requisição, como request.json do Flask (415 se não for JSON)."""
+    if not request.is_json:
+        abort(415)
+    return await request.get_json()
+
+
+def _condicional(*tabelas):
+    """etag.condicional para rotas assíncronas: 304 sem executar a rota se If-None-Match bater."""
+    def decorador(view):
+        @functools.wraps(view)
+        async def envolvida(*args, **kwargs):
+            if streaming.solicitado(request):
+                return await view(*args, **kwargs)
+
+            tag = etag.calcula(tabelas, request)
+            if request.if_none_match.contains(tag):
+                resp = await make_response('', 304)
+                resp.set_etag(tag)
+                return resp
+
+            return etag.marca(await make_response(await view(*args, **kwargs)), tag)
+        return envolvida
+    return decorador
+
+
+async def _ndjson(sql, valores, mapeia):
+    """streaming.resposta_ndjson com cursor não bufferizado do aiomysql (SSCursor)."""
+    codifica = app.json.codifica
+    return await _exporta(
+        sql, valores, lambda linhas: b''.join([codifica(mapeia(linha)) + b'\n' for linha in linhas]),
+        streaming.MIMETYPE_NDJSON,
+    )
+
+
+async def _csv(sql, valores, mapeia, chaves, nome_arquivo):
+    """streaming.resposta_csv com cursor não bufferizado do aiomysql."""
+    inicio, codifica = streaming.codificador_csv(chaves, mapeia)
+    return await _exporta(
+        sql, valores, codifica, streaming.MIMETYPE_CSV, inicio,
+        {'Content-Disposition': f'attachment; filename="{nome_arquivo}"'},
+    )
+
+
+async def _exporta(sql, valores, codifica, mimetype, inicio=b'', cabecalhos=None):
+    try:
+        conn = await _pool.acquire()
+    except MySQLError:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    cursor = await conn.cursor(aiomysql.SSCursor)
+    inicio_consulta = time.perf_counter()
+    try:
+        with _fase('consulta'):
+            await cursor.execute(sql, tuple(valores))
+    except MySQLError as err:
+        conn.close()
+        _pool.release(conn)
+        return {'erro': 'Erro ao exportar registros', 'message': str(err)}, 500
+    # Só o execute(): as linhas ainda vão ser lidas, e a conexão não admite o EXPLAIN agora
+    duracao = time.perf_counter() - inicio_consulta
+    if consultas_lentas.lenta(duracao):
+        consultas_lentas.registra(sql, tuple(valores), duracao, None)
+
+    async def gera():
+        completo = False
+        try:
+            if inicio:
+                yield inicio
+            while True:
+                linhas = await cursor.fetchmany(streaming.TAMANHO_LOTE)
+                if not linhas:
+                    break
+                yield codifica(linhas)
+            completo = True
+        finally:
+            if completo:
+                await cursor.close()
+            else:
+                # Cliente desconectou com linhas pendentes: descarta a conexão em vez de ler o resto
+                conn.close()
+            _pool.release(conn)
+
+    return Response(gera(), mimetype=mimetype, headers=cabecalhos)
+
+
+async def _lista(repositorio, chave, formato):
+    """GET /<recurso>: página por cursor (keyset no id) ou a tabela inteira em NDJSON."""
+    try:
+        limite, apos_id = paginacao.parametros(request.args)
+        projecao = campos.projecao(formato, request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    if streaming.solicitado(request):
+        return await _ndjson(repositorio.sql('todos', projecao.colunas), (apos_id,), projecao.mapeia)
+
+    try:
+        linhas = await _consulta(repositorio.sql('pagina', projecao.colunas), (apos_id, limite + 1))
+    except MySQLError as err:
+        return {'erro': f'Erro ao buscar {chave}', 'message': str(err)}, 500
+    registros, proximo = paginacao.pagina(linhas, limite, chave=0)
+    with _fase('mapeamento'):
+        lista = [projecao.mapeia(linha) for linha in registros]
+    return {chave: lista, 'next': proximo}, 200
+
+
+async def _detalhe(repositorio, id_, chave, formato):
+    """GET /<recurso>/<id>, com as mesmas mensagens de app.py."""
+    try:
+        projecao = campos.projecao(formato, request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    try:
+        linhas = await _consulta(repositorio.sql('busca', projecao.colunas), (id_,))
+    except MySQLError as err:
+        error = str(err)
+        nome = 'aluno' if chave == 'cliente' else chave
+        return {'error': f'Erro ao inserir {nome}: {error}', 'message': error}, 500
+    if not linhas:
+        return 'Usuario não encontrado!' if chave == 'cliente' else f'{chave} não encontrado!'
+    return {chave: projecao.mapeia(linhas[0])}
+
+
+async def _atualiza(repositorio, id_, valores, nome, apos_commit):
+    try:
+        alterados, _ = await _executa(repositorio.sql_atualiza, tuple(valores) + (id_,))
+    except MySQLError as err:
+        return {'erro': f'Erro ao atualizar {nome.lower()}: {err}'}, 500
+    apos_commit()
+    if alterados:
+        return {'mensagem': f'{nome} atualizado com sucesso!'}, 200
+    return {'erro': f'{nome} não encontrado.'}, 404
+
+
+async def _remove(repositorio, id_, nome, apos_commit):
+    try:
+        removidos, _ = await _executa(repositorio.sql_remove, (id_,))
+    except MySQLError as err:
+        return {'error': f'Erro ao deletar {nome.lower()}: {err}'}, 500
+    apos_commit()
+    if removidos:
+        return {'mensagem': f'{nome} deletado com sucesso!'}, 200
+    return {'error': f'{nome} não encontrado.'}, 404
+
+
+async def _bulk(regras):
+    # Validação do array e INSERT multi-linha em uma transação, com a lógica síncrona de lote.py
+    itens = await request.get_json(silent=True)
+    return await asyncio.to_thread(lote.insere_itens, connect_db, itens, **regras)
+
+
+async def _hash(senha):
+    """auth.gera_hash no pool de hashes, sem bloquear o loop de eventos (auth.Ocupado com a fila cheia)."""
+    return await asyncio.wrap_future(auth.submete(auth.gera_hash, senha))
+
+
+def _requer_login(view):
+    """auth.requer_login para rotas assíncronas: só sessões fora do cache vão ao banco (em uma thread)."""
+    @functools.wraps(view)
+    async def autenticada(*args, **kwargs):
+        sid = auth.le_token(auth.token_do_cabecalho(request.headers.get('Authorization')))
+        sessao = sid and (auth.em_cache(sid) or await asyncio.to_thread(auth.consulta_sessao, sid))
+        if not sessao:
+            return auth.NAO_AUTENTICADO
+        g.cliente_id, g.sessao_id = sessao
+        return await view(*args, **kwargs)
+    return autenticada
+
+
+def _idempotente(view):
+    """idempotencia.idempotente para rotas assíncronas: sessão, reserva e leituras da chave em uma thread."""
+    @functools.wraps(view)
+    async def envolvida(*args, **kwargs):
+        chave = request.headers.get(idempotencia.CABECALHO)
+        if chave is None:
+            return await view(*args, **kwargs)
+        if not idempotencia.chave_valida(chave):
+            return idempotencia.CHAVE_INVALIDA
+
+        rota = f'{request.method} {request.path}'
+        marca = idempotencia.impressao(rota, await request.get_json(silent=True), await request.get_data())
+        try:
+            sid = auth.le_token(auth.token_do_cabecalho(request.headers.get('Authorization')))
+            sessao = sid and (auth.em_cache(sid) or await asyncio.to_thread(auth.consulta_sessao, sid))
+            escopo = idempotencia.escopo_de(rota, sessao, marca)
+            estado, registro = await asyncio.to_thread(idempotencia.reservar, escopo, chave, marca)
+            # A espera das retentativas não ocupa thread: só cada leitura da chave vai para uma
+            for pausa in idempotencia.pausas():
+                if estado != idempotencia.EM_EXECUCAO:
+                    break
+                await asyncio.sleep(pausa)
+                estado, registro = await asyncio.to_thread(idempotencia.situacao, escopo, chave, marca)
+        except db_pool.PoolEsgotado:
+            raise  # 503 pelo handler do app
+        except Error:
+            return idempotencia.FALHA_CONEXAO
+        if estado != idempotencia.NOVA:
+            return idempotencia.responde(estado, registro)
+
+        # A rota conclui a chave na transação da sua escrita (ver idempotencia.py)
+        g.idempotencia = registro
+        try:
+            resp = await make_response(await view(*args, **kwargs))
+        except BaseException:
+            await asyncio.to_thread(registro.guarda, 500, None, None)
+            raise
+        corpo = await resp.get_data()
+        await asyncio.to_thread(registro.guarda, resp.status_code, resp.content_type, corpo)
+        return resp
+    return envolvida
+
+
+def _diagnostico(view):
+    """diagnostico.protegida para rotas assíncronas."""
+    @functools.wraps(view)
+    async def envolvida(*args, **kwargs):
+        erro = diagnostico.recusa(request.headers.get(diagnostico.CABECALHO))
+        if erro is not None:
+            return erro
+        return await view(*args, **kwargs)
+    return envolvida
+
+
+# Clientes
+
+@app.route('/clientes', methods=['POST'])
+@_idempotente
+async def post_clientes():
+    entrada_dados = await _json()
+    nome = entrada_dados.get('nome')
+    email = entrada_dados.get('email')
+    cpf = entrada_dados.get('cpf')
+    senha = entrada_dados.get('senha')
+
+    if not all([nome, cpf, email, senha]):
+        return {'erro': 'Todos os campos são obrigatórios.'}, 400
+
+    try:
+        senha = await _hash(senha)
+    except auth.Ocupado:
+        return auth.OCUPADO
+
+    values = (nome, cpf, email, senha)
+    logs.sql(repositorios.clientes.sql_insere, values, repositorios.clientes.gravaveis)
+    reserva = g.get('idempotencia')
+    try:
+        async with _conexao() as conn:
+            # INSERT e resposta da Idempotency-Key na mesma transação (ver idempotencia.py)
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    await _comando(conn, cursor, repositorios.clientes.sql_insere, values)
+                    resp = {'id': cursor.lastrowid, 'nome': nome, 'cpf': cpf, 'email': email}
+                    if reserva is not None:
+                        await _comando(conn, cursor, *reserva.comando(resp, 201))
+                        reserva.confere(cursor.rowcount)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+    except idempotencia.ReservaPerdida:
+        # Uma retentativa assumiu a chave e grava o cliente: o INSERT desta foi desfeito
+        return idempotencia.EM_EXECUCAO_RESP
+    except MySQLError as err:
+        return {'erro': 'Erro ao inserir cliente', 'message': str(err)}, 500
+    geracoes.incrementa('tbl_clientes')
+    return resp, 201
+
+
+@app.route('/clientes/bulk', methods=['POST'])
+async def post_clientes_bulk():
+    return await _bulk(regras_lote.BULK_CLIENTES)
+
+
+@app.route('/clientes', methods=['GET'])
+@_condicional('tbl_clientes')
+async def get_clientes():
+    return await _lista(repositorios.clientes, 'clientes', formatos.cliente)
+
+
+@app.route('/clientes/<int:cliente_id>', methods=['GET'])
+@_condicional('tbl_clientes')
+async def get_cliente_id(cliente_id):
+    return await _detalhe(repositorios.clientes, cliente_id, 'cliente', formatos.cliente)
+
+
+@app.route('/clientes/<int:cliente_id>', methods=['PUT'])
+async def put_cliente(cliente_id):
+    entrada_dados = await _json()
+    values = tuple(entrada_dados.get(coluna) for coluna in repositorios.clientes.gravaveis)
+    if not all(values):
+        return {'erro': 'Todos os campos são obrigatórios.'}, 400
+    try:
+        values = values[:-1] + (await _hash(values[-1]),)
+    except auth.Ocupado:
+        return auth.OCUPADO
+    return await _atualiza(
+        repositorios.clientes, cliente_id, values, 'Cliente', functools.partial(geracoes.incrementa, 'tbl_clientes'),
+    )
+
+
+@app.route('/clientes/<int:cliente_id>', methods=['DELETE'])
+async def delete_cliente(cliente_id):
+    return await _remove(
+        repositorios.clientes, cliente_id, 'Cliente', functools.partial(geracoes.incrementa, 'tbl_clientes'),
+    )
+
+
+# Autenticação
+
+@app.route('/login', methods=['POST'])
+async def post_login():
+    # Consulta, hash (no pool de hashes) e sessão com as regras síncronas de auth.py, em uma thread
+    entrada_dados = await request.get_json(silent=True)
+    return await asyncio.to_thread(auth.login, entrada_dados)
+
+
+@app.route('/logout', methods=['POST'])
+@_requer_login
+async def post_logout():
+    return await asyncio.to_thread(auth.logout, g.sessao_id)
+
+
+@app.route('/clientes/me', methods=['GET'])
+@_requer_login
+async def get_cliente_logado():
+    try:
+        projecao = campos.projecao(formatos.cliente, request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    try:
+        linhas = await _consulta(repositorios.clientes.sql('busca', projecao.colunas), (g.cliente_id,))
+    except MySQLError as err:
+        return {'erro': 'Erro ao buscar cliente', 'message': str(err)}, 500
+    if not linhas:
+        return {'erro': 'Cliente não encontrado.'}, 404
+    return {'cliente': projecao.mapeia(linhas[0])}, 200
+
+
+# Fornecedores
+
+@app.route('/fornecedores', methods=['POST'])
+async def post_fornecedor():
+    entrada_dados = await _json()
+    nome = entrada_dados.get('nome')
+    email = entrada_dados.get('email')
+    cnpj = entrada_dados.get('cnpj')
+
+    values = (nome, cnpj, email)
+    logs.sql(repositorios.fornecedores.sql_insere, values, repositorios.fornecedores.gravaveis)
+    try:
+        _, fornecedor_id = await _executa(repositorios.fornecedores.sql_insere, values)
+    except MySQLError as err:
+        return {'erro': 'Erro ao inserir fornecedore', 'message': str(err)}, 500
+    geracoes.incrementa('tbl_fornecedores')
+    return {'id': fornecedor_id, 'nome': nome, 'cnpj': cnpj, 'email': email}, 201
+
+
+@app.route('/fornecedores/bulk', methods=['POST'])
+async def post_fornecedores_bulk():
+    return await _bulk(regras_lote.BULK_FORNECEDORES)
+
+
+@app.route('/fornecedores', methods=['GET'])
+@_condicional('tbl_fornecedores')
+async def get_fornecedores():
+    return await _lista(repositorios.fornecedores, 'fornecedores', formatos.fornecedor)
+
+
+@app.route('/fornecedores/<int:fornecedor_id>', methods=['GET'])
+@_condicional('tbl_fornecedores')
+async def get_fornecedor_id(fornecedor_id):
+    return await _detalhe(repositorios.fornecedores, fornecedor_id, 'fornecedor', formatos.fornecedor)
+
+
+@app.route('/fornecedores/<int:fornecedor_id>', methods=['PUT'])
+async def put_fornecedor(fornecedor_id):
+    entrada_dados = await _json()
+    values = tuple(entrada_dados.get(coluna) for coluna in repositorios.fornecedores.gravaveis)
+    if not all(values):
+        return {'erro': 'Todos os campos são obrigatórios.'}, 400
+    return await _atualiza(
+        repositorios.fornecedores, fornecedor_id, values, 'fornecedor',
+        functools.partial(geracoes.incrementa, 'tbl_fornecedores'),
+    )
+
+
+@app.route('/fornecedores/<int:fornecedor_id>', methods=['DELETE'])
+async def delete_fornecedor(fornecedor_id):
+    return await _remove(
+        repositorios.fornecedores, fornecedor_id, 'fornecedor',
+        functools.partial(geracoes.incrementa, 'tbl_fornecedores'),
+    )
+
+
+# Produtos
+
+@app.route('/produtos', methods=['POST'])
+async def post_produto():
+    entrada_dados = await _json()
+    nome = entrada_dados.get('nome')
+    descricao = entrada_dados.get('descricao')
+    qtd_em_estoque = entrada_dados.get('qtd_em_estoque')
+    preco = entrada_dados.get('preco')
+    fornecedor_id = entrada_dados.get('fornecedor_id')
+    custo_no_fornecedor = entrada_dados.get('custo_no_fornecedor')
+
+    values = (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor)
+    logs.sql(repositorios.produtos.sql_insere, values, repositorios.produtos.gravaveis)
+    try:
+        _, produto_id = await _executa(repositorios.produtos.sql_insere, values)
+    except MySQLError as err:
+        return {'erro': 'Erro ao inserir produto', 'message': str(err)}, 500
+    regras_lote.produtos_alterados()
+    return {
+        'id': produto_id, 'nome': nome, 'qtd_em_estoque': qtd_em_estoque, 'descricao': descricao,
+        'preco': preco, 'fornecedor_id': fornecedor_id, 'custo_no_fornecedor': custo_no_fornecedor,
+    }, 201
+
+
+@app.route('/produtos/bulk', methods=['POST'])
+async def post_produtos_bulk():
+    return await _bulk(regras_lote.BULK_PRODUTOS)
+
+
+@app.route('/produtos/import', methods=['POST'])
+async def post_produtos_import():
+    # O corpo vai para um arquivo temporário à medida que chega (a memória não cresce com o arquivo);
+    # a importação síncrona (importacao.py) roda em uma thread, um lote por vez, e cada etapa é enviada em NDJSON
+    if request.mimetype == 'multipart/form-data':
+        return {'erro': 'Envie o CSV direto no corpo (Content-Type: text/csv).'}, 415
+    arquivo = tempfile.TemporaryFile()
+    try:
+        async for bloco in request.body:
+            arquivo.write(bloco)
+        arquivo.seek(0)
+        leitor, erro = await asyncio.to_thread(
+            importacao.abre, arquivo, regras_lote.IMPORTA_PRODUTOS['colunas'], regras_lote.IMPORTA_PRODUTOS['obrigatorios'],
+        )
+    except BaseException:
+        arquivo.close()
+        raise
+    if erro:
+        arquivo.close()
+        return erro
+
+    etapas = importacao.progresso(connect_db, leitor, **regras_lote.IMPORTA_PRODUTOS)
+    codifica = app.json.codifica
+
+    async def gera():
+        try:
+            while True:
+                etapa = await asyncio.to_thread(next, etapas, None)
+                if etapa is None:
+                    break
+                yield codifica(etapa) + b'\n'
+        finally:
+            await asyncio.to_thread(etapas.close)
+            arquivo.close()
+
+    return Response(gera(), mimetype=streaming.MIMETYPE_NDJSON)
+
+
+@app.route('/produtos/import/<id_>/rejeitos', methods=['GET'])
+async def get_rejeitos_importacao(id_):
+    caminho = importacao.caminho(id_)
+    if caminho is None or not os.path.exists(caminho):
+        return {'erro': 'Arquivo de rejeitos não encontrado.'}, 404
+    return await send_file(caminho, mimetype='text/csv', as_attachment=True, attachment_filename=f'rejeitos-{id_}.csv')
+
+
+@app.route('/produtos', methods=['GET'])
+@_condicional('tbl_produtos')
+async def get_produtos():
+    solicitado = streaming.solicitado(request)
+    try:
+        projecao = campos.projecao(formatos.produto, request.args)
+        consulta = filtros.monta_consulta(
+            'tbl_produtos', paginar=not solicitado, colunas=projecao.colunas, args=request.args,
+        )
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    if solicitado:
+        return await _ndjson(consulta.sql, consulta.valores, projecao.mapeia)
+
+    chave_cache = ('lista', consulta.sql, tuple(consulta.valores))
+    em_cache = cache_produtos.produtos.obter(chave_cache)
+    if em_cache is not None:
+        return em_cache, 200
+    geracao = cache_produtos.produtos.geracao()
+
+    try:
+        produtos, proximo = consulta.pagina(await _consulta(consulta.sql, consulta.valores))
+    except MySQLError as err:
+        return {'erro': 'Erro ao buscar produtos', 'message': str(err)}, 500
+    with _fase('mapeamento'):
+        lista_produtos = [projecao.mapeia(produto) for produto in produtos]
+
+    resp = {'produtos': lista_produtos, 'next': proximo}
+    cache_produtos.produtos.guardar(chave_cache, resp, geracao)
+    return resp, 200
+
+
+@app.route('/produtos/busca', methods=['GET'])
+async def get_produtos_busca():
+    # Índice em memória do worker: a busca não vai ao banco nem cede o loop de eventos
+    try:
+        texto, limite = indice_produtos.parametros('q', request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    if not indice_produtos.produtos.pronto:
+        return indice_produtos.EM_CONSTRUCAO
+    return indice_produtos.resposta_busca(texto, limite), 200
+
+
+@app.route('/produtos/autocomplete', methods=['GET'])
+async def get_produtos_autocomplete():
+    try:
+        texto, limite = indice_produtos.parametros('prefix', request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    if not indice_produtos.produtos.pronto:
+        return indice_produtos.EM_CONSTRUCAO
+    return indice_produtos.resposta_autocomplete(texto, limite), 200
+
+
+@app.route('/produtos/<int:produto_id>', methods=['GET'])
+@_condicional('tbl_produtos')
+async def get_produto_id(produto_id):
+    # O cache guarda o produto completo; ?fields= só recorta a resposta
+    try:
+        projecao = campos.projecao(formatos.produto, request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    em_cache = cache_produtos.produtos.obter(('produto', produto_id))
+    if em_cache is not None:
+        return {'produto': projecao.filtra(em_cache)}
+    geracao = cache_produtos.produtos.geracao()
+
+    try:
+        linhas = await _consulta(repositorios.produtos.sql_busca, (produto_id,))
+    except MySQLError as err:
+        return {'error': f'Erro ao inserir produto: {err}', 'message': str(err)}, 500
+    if not linhas:
+        return 'produto não encontrado!'
+    completo = formatos.produto(linhas[0])
+    cache_produtos.produtos.guardar(('produto', produto_id), completo, geracao)
+    return {'produto': projecao.filtra(completo)}
+
+
+@app.route('/produtos/<int:produto_id>', methods=['PUT'])
+async def put_produto(produto_id):
+    entrada_dados = await _json()
+    values = tuple(entrada_dados.get(coluna) for coluna in repositorios.produtos.gravaveis)
+    if not all(values):
+        return {'erro': 'Todos os campos são obrigatórios.'}, 400
+    return await _atualiza(repositorios.produtos, produto_id, values, 'produto', regras_lote.produtos_alterados)
+
+
+@app.route('/produtos/<int:produto_id>', methods=['DELETE'])
+async def delete_produto(produto_id):
+    return await _remove(repositorios.produtos, produto_id, 'produto', regras_lote.produtos_alterados)
+
+
+# Carrinho
+
+@app.route('/carrinhos', methods=['POST'])
+async def post_carrinho():
+    # Carrinho e itens na mesma transação, com as regras de regras_carrinhos
+    entrada_dados = await _json()
+    return await asyncio.to_thread(regras_carrinhos.cria, connect_db, entrada_dados)
+
+
+@app.route('/carrinhos/<int:carrinho_id>/itens', methods=['PUT'])
+async def put_carrinho_itens(carrinho_id):
+    itens = await request.get_json(silent=True)
+    return await asyncio.to_thread(regras_carrinhos.atualiza_itens, connect_db, carrinho_id, itens)
+
+
+@app.route('/carrinhos', methods=['GET'])
+@_condicional('tbl_carrinho')
+async def get_carrinhos():
+    return await _lista(repositorios.carrinhos, 'carrinhos', formatos.carrinho)
+
+
+@app.route('/carrinhos/<int:carrinho_id>', methods=['GET'])
+@_condicional('tbl_carrinho', 'tbl_produtos')
+async def get_carrinho_id(carrinho_id):
+    try:
+        projecao = campos.projecao(formatos.carrinho_detalhe, request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    try:
+        linhas = await _consulta(repositorios.carrinhos.sql_detalhe, (carrinho_id,))
+    except MySQLError as err:
+        error = str(err)
+        return {'error': f'Erro ao inserir carrinho: {error}', 'message': error}, 500
+    if not linhas:
+        return 'carrinho não encontrado!'
+    with _fase('mapeamento'):
+        cabecalho = projecao.filtra(formatos.carrinho_detalhe(linhas[0]))
+        return {'carrinho': regras_carrinhos.detalhe(linhas, cabecalho)}
+
+
+@app.route('/carrinhos/<int:carrinho_id>', methods=['PUT'])
+async def put_carrinho(carrinho_id):
+    entrada_dados = await _json()
+    return await asyncio.to_thread(regras_carrinhos.atualiza, connect_db, carrinho_id, entrada_dados)
+
+
+@app.route('/carrinhos/<int:carrinho_id>', methods=['DELETE'])
+async def delete_carrinho(carrinho_id):
+    return await _remove(
+        repositorios.carrinhos, carrinho_id, 'carrinho', functools.partial(geracoes.incrementa, 'tbl_carrinho'),
+    )
+
+
+@app.route('/carrinhos/cliente/<int:cliente_id>', methods=['GET'])
+@_condicional('tbl_carrinho', 'tbl_pedidos')
+async def lista_carrinhos_por_cliente(cliente_id):
+    try:
+        projecao = campos.projecao(formatos.carrinho_colunas, request.args)
+    except paginacao.ParametroInvalido as err:
+        return jsonify({'error': str(err)}), 400
+    try:
+        linhas = await _consulta(repositorios.carrinhos.sql('por_cliente', projecao.colunas), (cliente_id,))
+    except MySQLError as err:
+        return jsonify({'error': f'Erro ao listar carrinhos: {err}'}), 400
+    carrinhos = [projecao.mapeia(linha) for linha in linhas]
+    if carrinhos:
+        return jsonify(carrinhos), 200
+    return jsonify({'message': 'Nenhum carrinho encontrado para este cliente'}), 404
+
+
+# Pedidos: pedido, reservas de estoque e outbox em uma transação, com as regras síncronas em uma thread
+
+@app.route('/pedidos', methods=['POST'])
+@_idempotente
+async def post_pedido():
+    entrada_dados = await _json()
+    return await asyncio.to_thread(regras_pedidos.cria, connect_db, entrada_dados, g.get('idempotencia'))
+
+
+@app.route('/pedidos', methods=['GET'])
+@_condicional('tbl_pedidos')
+async def get_pedidos():
+    solicitado = streaming.solicitado(request)
+    try:
+        projecao = campos.projecao(formatos.pedido, request.args)
+        consulta = filtros.monta_consulta(
+            'tbl_pedidos', paginar=not solicitado, colunas=projecao.colunas, args=request.args,
+        )
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+
+    if solicitado:
+        return await _ndjson(consulta.sql, consulta.valores, projecao.mapeia)
+
+    try:
+        pedidos, proximo = consulta.pagina(await _consulta(consulta.sql, consulta.valores))
+    except MySQLError as err:
+        return {'erro': 'Erro ao buscar pedidos', 'message': str(err)}, 500
+    with _fase('mapeamento'):
+        lista_pedidos = [projecao.mapeia(pedido) for pedido in pedidos]
+    return {'pedidos': lista_pedidos, 'next': proximo}, 200
+
+
+@app.route('/pedidos/export.csv', methods=['GET'])
+async def get_pedidos_export():
+    try:
+        projecao = campos.projecao(formatos.pedido_colunas, request.args)
+        consulta = filtros.monta_consulta('tbl_pedidos', paginar=False, colunas=projecao.colunas, args=request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    return await _csv(consulta.sql, consulta.valores, projecao.mapeia, projecao.chaves, 'pedidos.csv')
+
+
+@app.route('/pedidos/<int:pedido_id>', methods=['GET'])
+@_condicional('tbl_pedidos')
+async def get_pedido_id(pedido_id):
+    return await _detalhe(repositorios.pedidos, pedido_id, 'pedido', formatos.pedido)
+
+
+@app.route('/pedidos/<int:pedido_id>', methods=['PUT'])
+async def put_pedido(pedido_id):
+    entrada_dados = await _json()
+    return await asyncio.to_thread(regras_pedidos.atualiza, connect_db, pedido_id, entrada_dados)
+
+
+@app.route('/pedidos/<int:pedido_id>', methods=['DELETE'])
+async def delete_pedido(pedido_id):
+    return await asyncio.to_thread(regras_pedidos.remove, connect_db, pedido_id)
+
+
+@app.route('/pedidos/cliente/<int:cliente_id>', methods=['GET'])
+@_condicional('tbl_pedidos')
+async def busca_pedidos_por_cliente(cliente_id):
+    try:
+        projecao = campos.projecao(formatos.pedido_colunas, request.args)
+    except paginacao.ParametroInvalido as err:
+        return jsonify({'error': str(err)}), 400
+    try:
+        linhas = await _consulta(repositorios.pedidos.sql('por_cliente', projecao.colunas), (cliente_id,))
+    except MySQLError as err:
+        return jsonify({'error': f'Erro ao buscar pedidos: {err}'}), 400
+    pedidos = [projecao.mapeia(linha) for linha in linhas]
+    if pedidos:
+        return jsonify(pedidos), 200
+    return jsonify({'message': 'Nenhum pedido encontrado para este cliente'}), 404
+
+
+# Relatórios
+
+@app.route('/relatorios/vendas', methods=['GET'])
+@_condicional('tbl_pedidos')
+async def get_relatorio_vendas():
+    try:
+        params = vendas.parametros(request.args)
+    except paginacao.ParametroInvalido as err:
+        return {'erro': str(err)}, 400
+    consulta_linhas, consulta_total = vendas.consultas(params)
+    try:
+        linhas, total = await asyncio.gather(_consulta(*consulta_linhas), _consulta(*consulta_total))
+    except MySQLError as err:
+        return {'erro': 'Erro ao gerar relatório', 'message': str(err)}, 500
+    return vendas.monta(params, linhas, total[0] if total else None), 200
+
+
+# Diagnóstico
+
+@app.route('/debug/pool', methods=['GET'])
+@_diagnostico
+async def get_estatisticas_pool():
+    # Pool assíncrono deste worker e o pool síncrono usado pelas escritas em thread
+    return {
+        'pool': db_pool.obter_pool(config).estatisticas(),
+        'pool_async': {'tamanho': _pool.size, 'livres': _pool.freesize, 'maximo': _pool.maxsize},
+    }, 200
+
+
+@app.route('/debug/slow-queries', methods=['GET'])
+@_diagnostico
+async def get_consultas_lentas():
+    # Comandos do pool assíncrono (_comando, _exporta) e dos cursores síncronos das regras em thread
+    ordem = request.args.get('ordem', 'total_ms')
+    if ordem not in ('total_ms', 'max_ms', 'execucoes'):
+        return {'erro': 'ordem deve ser total_ms, max_ms ou execucoes.'}, 400
+    try:
+        quantidade = int(request.args.get('top', 20))
+    except ValueError:
+        return {'erro': 'top deve ser um número inteiro.'}, 400
+    return {
+        'pid': os.getpid(),
+        'limite_ms': consultas_lentas.LIMITE_MS,
+        'consultas': consultas_lentas.piores(quantidade, ordem),
+    }, 200
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metricas():
+    corpo, tipo = metricas.exposicao()
+    return Response(corpo, mimetype=tipo)
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
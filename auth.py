@@ -0,0 +1,328 @@
+"""Autenticação: senhas com hash scrypt, login por e-mail e senha e tokens assinados.
+
+O hash é lento de propósito (AUTH_SCRYPT_N) e roda em um pool de threads do processo
+(o scrypt do hashlib solta o GIL), com uma fila limitada: passando de
+AUTH_HASH_THREADS + AUTH_HASH_FILA hashes pendentes o login responde 503 em vez de
+acumular requisições esperando. Os hashes do POST /clientes/bulk rodam em um pool
+separado, de AUTH_HASH_THREADS_LOTE threads, e nunca ocupam as vagas do login e do
+cadastro; o bulk de clientes aceita no máximo AUTH_BULK_MAX_ITENS itens.
+
+O login grava uma sessão em tbl_sessoes e devolve um token assinado (itsdangerous)
+com o id da sessão. Nas requisições seguintes a sessão é conferida em um cache LRU
+do worker (cache_produtos.CacheLRU): uma sessão vai ao banco uma vez a cada
+AUTH_CACHE_TTL segundos em cada worker. O logout grava revogada_em e incrementa a
+geração de tbl_sessoes (geracoes.py): todos os workers do host descartam as sessões
+em cache na hora e o token revogado deixa de valer imediatamente neles; em outros
+hosts, quando a entrada expira, em até AUTH_CACHE_TTL segundos.
+
+Configuração:
+    AUTH_SEGREDO        chave de assinatura dos tokens (o gunicorn.conf.py sorteia uma se faltar)
+    AUTH_TOKEN_TTL      validade do token e da sessão, em segundos (43200)
+    AUTH_SCRYPT_N       custo do scrypt (16384); hashes com outro custo são refeitos no login
+    AUTH_HASH_THREADS   threads de hash por processo (4)
+    AUTH_HASH_FILA      hashes aguardando thread antes do 503 (32)
+    AUTH_HASH_THREADS_LOTE  threads de hash do bulk de clientes por processo (1)
+    AUTH_BULK_MAX_ITENS     clientes por POST /clientes/bulk (500)
+    AUTH_CACHE_MAX      sessões no cache de cada worker (10000)
+    AUTH_CACHE_TTL      segundos até uma sessão do cache ser conferida de novo no banco (30)
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from mysql.connector import Error
+
+import cache_produtos
+import geracoes
+import repositorios
+
+
+PREFIXO = 'scrypt'
+SCRYPT_N = int(os.getenv('AUTH_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+TAMANHO_SAL = 16
+TAMANHO_HASH = 32
+
+TOKEN_TTL = int(os.getenv('AUTH_TOKEN_TTL', 12 * 3600))
+HASH_THREADS = int(os.getenv('AUTH_HASH_THREADS', 4))
+HASH_FILA = int(os.getenv('AUTH_HASH_FILA', 32))
+HASH_THREADS_LOTE = int(os.getenv('AUTH_HASH_THREADS_LOTE', 1))
+BULK_MAX_ITENS = int(os.getenv('AUTH_BULK_MAX_ITENS', 500))
+
+logger = logging.getLogger('api.auth')
+
+# Sessões válidas já conferidas neste worker: id da sessão -> (cliente_id, expira_em).
+# O TTL curto limita quanto tempo um logout feito em outro worker ou host demora a valer aqui.
+sessoes = cache_produtos.CacheLRU(
+    'tbl_sessoes',
+    max_itens=int(os.getenv('AUTH_CACHE_MAX', 10000)),
+    ttl=float(os.getenv('AUTH_CACHE_TTL', 30)),
+)
+
+
+class Ocupado(Exception):
+    """Fila de hashes cheia (a rota responde 503)."""
+
+
+# Senhas
+
+def gera_hash(senha):
+    """Hash armazenado em tbl_clientes.senha: scrypt$n$r$p$sal$hash (base64)."""
+    sal = secrets.token_bytes(TAMANHO_SAL)
+    calculado = _scrypt(senha, sal, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return '$'.join([PREFIXO, str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P), _b64(sal), _b64(calculado)])
+
+
+def confere(senha, armazenada):
+    """Retorna (confere, precisa_rehash).
+
+    Senhas antigas, gravadas em texto puro, são comparadas em tempo constante e
+    pedem rehash; hashes com outro custo também. Sem senha armazenada (e-mail
+    desconhecido) calcula um hash do mesmo custo, para o tempo não revelar o e-mail.
+    """
+    if armazenada is None:
+        confere(senha, _hash_ficticio())
+        return False, False
+    partes = armazenada.split('$')
+    if len(partes) != 6 or partes[0] != PREFIXO:
+        return hmac.compare_digest(senha.encode(), armazenada.encode()), True
+    n, r, p = int(partes[1]), int(partes[2]), int(partes[3])
+    calculado = _scrypt(senha, _de_b64(partes[4]), n, r, p)
+    ok = hmac.compare_digest(calculado, _de_b64(partes[5]))
+    return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def _scrypt(senha, sal, n, r, p):
+    # maxmem acima dos 32 MiB padrão do OpenSSL, que N=2**15 já ultrapassaria
+    return hashlib.scrypt(senha.encode(), salt=sal, n=n, r=r, p=p, maxmem=256 * n * r, dklen=TAMANHO_HASH)
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).decode().rstrip('=')
+
+
+def _de_b64(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+@functools.lru_cache(maxsize=None)
+def _hash_ficticio():
+    return gera_hash(secrets.token_hex(16))
+
+
+# Pools de hashes (um par por processo: os workers do gunicorn nascem por fork)
+
+_pool = None
+_vagas = None
+_pool_lote = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pools_do_processo():
+    global _pool, _vagas, _pool_lote, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(HASH_THREADS, thread_name_prefix='auth-hash')
+                _vagas = threading.BoundedSemaphore(HASH_THREADS + HASH_FILA)
+                # Bulk: threads próprias, sem fila limitada (o tamanho do lote já é limitado)
+                _pool_lote = ThreadPoolExecutor(max(HASH_THREADS_LOTE, 1), thread_name_prefix='auth-hash-lote')
+                _pool_pid = os.getpid()
+    return _pool, _vagas, _pool_lote
+
+
+def submete(funcao, *args):
+    """Agenda funcao(*args) no pool de hashes e retorna o Future; com a fila cheia levanta Ocupado."""
+    pool, vagas, _ = _pools_do_processo()
+    if not vagas.acquire(blocking=False):
+        raise Ocupado('Fila de hashes de senha cheia.')
+    try:
+        futuro = pool.submit(funcao, *args)
+    except BaseException:
+        vagas.release()
+        raise
+    futuro.add_done_callback(lambda _: vagas.release())
+    return futuro
+
+
+def executa(funcao, *args):
+    """submete() e espera o resultado (rotas síncronas)."""
+    return submete(funcao, *args).result()
+
+
+def gera_hashes(senhas):
+    """Hashes de uma lista de senhas (bulk), no pool do bulk: o login e o cadastro não esperam por eles."""
+    _, _, pool_lote = _pools_do_processo()
+    futuros = [pool_lote.submit(gera_hash, senha) for senha in senhas]
+    return [futuro.result() for futuro in futuros]
+
+
+# Tokens e sessões
+
+_connect_db = None
+
+
+def configurar(connect_db):
+    """Define a conexão (primário) usada no login, no logout e nas sessões fora do cache."""
+    global _connect_db
+    _connect_db = connect_db
+
+
+@functools.lru_cache(maxsize=None)
+def _serializador():
+    segredo = os.getenv('AUTH_SEGREDO')
+    if not segredo:
+        # Sem gunicorn.conf.py (flask run): chave do processo, tokens perdidos ao reiniciar
+        logger.warning('AUTH_SEGREDO não definido; usando uma chave aleatória deste processo')
+        segredo = secrets.token_hex(32)
+    return URLSafeTimedSerializer(segredo, salt='auth.sessao')
+
+
+def le_token(token):
+    """Id da sessão de um token com assinatura válida e dentro do prazo, ou None."""
+    if not token:
+        return None
+    try:
+        return _serializador().loads(token, max_age=TOKEN_TTL)['s']
+    except (BadSignature, KeyError, TypeError):
+        return None
+
+
+def em_cache(sid):
+    """(cliente_id, sid) da sessão se estiver no cache do worker e não expirada, ou None."""
+    sessao = sessoes.obter(sid)
+    if sessao is None or sessao[1] <= datetime.now():
+        return None
+    return sessao[0], sid
+
+
+def consulta_sessao(sid):
+    """(cliente_id, sid) lido de tbl_sessoes (e guardado no cache), ou None se revogada ou expirada."""
+    geracao = sessoes.geracao()
+    conn = _connect_db()
+    if not conn:
+        raise Error('Falha na conexão com o banco de dados.')
+    try:
+        linha = repositorios.sessoes.busca(conn, sid)
+    finally:
+        conn.close()
+    if linha is None:
+        return None
+    _, cliente_id, expira_em, revogada_em = linha
+    if revogada_em is not None or expira_em <= datetime.now():
+        return None
+    sessoes.guardar(sid, (cliente_id, expira_em), geracao)
+    return cliente_id, sid
+
+
+def verifica(token):
+    """(cliente_id, sid) da sessão do token, ou None; vai ao banco só fora do cache."""
+    sid = le_token(token)
+    if sid is None:
+        return None
+    return em_cache(sid) or consulta_sessao(sid)
+
+
+def token_do_cabecalho(autorizacao):
+    """Token de um cabeçalho 'Authorization: Bearer <token>'."""
+    tipo, _, token = (autorizacao or '').partition(' ')
+    return token.strip() if tipo.lower() == 'bearer' else None
+
+
+def requer_login(rota):
+    """Rota só para clientes autenticados; define g.cliente_id e g.sessao_id (401 sem token válido)."""
+    @functools.wraps(rota)
+    def autenticada(*args, **kwargs):
+        sessao = verifica(token_do_cabecalho(request.headers.get('Authorization')))
+        if sessao is None:
+            return NAO_AUTENTICADO
+        g.cliente_id, g.sessao_id = sessao
+        return rota(*args, **kwargs)
+    return autenticada
+
+
+NAO_AUTENTICADO = ({'erro': 'Autenticação necessária.'}, 401, {'WWW-Authenticate': 'Bearer'})
+OCUPADO = ({'erro': 'Servidor ocupado; tente novamente.'}, 503, {'Retry-After': '1'})
+
+
+def login(entrada_dados):
+    """POST /login: confere e-mail e senha e cria a sessão; retorna (resposta, status)."""
+    entrada_dados = entrada_dados or {}
+    email = entrada_dados.get('email')
+    senha = entrada_dados.get('senha')
+    if not email or not senha:
+        return {'erro': 'E-mail e senha são obrigatórios.'}, 400
+
+    conn = _connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    try:
+        cliente = repositorios.clientes.por_email(conn, email)
+    except Error as err:
+        return {'erro': 'Erro ao autenticar', 'message': str(err)}, 500
+    finally:
+        # A conexão volta ao pool antes do hash, que é a parte demorada
+        conn.close()
+
+    try:
+        ok, precisa_rehash = executa(confere, senha, cliente[1] if cliente else None)
+        novo_hash = executa(gera_hash, senha) if ok and precisa_rehash else None
+    except Ocupado:
+        return OCUPADO
+    if not ok:
+        return {'erro': 'E-mail ou senha inválidos.'}, 401
+
+    cliente_id = cliente[0]
+    sid = secrets.token_hex(16)
+    expira_em = datetime.now().replace(microsecond=0) + timedelta(seconds=TOKEN_TTL)
+
+    conn = _connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    try:
+        repositorios.sessoes.cria(conn, sid, cliente_id, expira_em)
+        if novo_hash:
+            # Senha em texto puro (ou com outro custo) trocada pelo hash atual
+            repositorios.clientes.troca_senha(conn, cliente_id, novo_hash)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        return {'erro': 'Erro ao criar sessão', 'message': str(err)}, 500
+    finally:
+        conn.close()
+
+    if novo_hash:
+        geracoes.incrementa('tbl_clientes')
+    sessoes.guardar(sid, (cliente_id, expira_em), sessoes.geracao())
+    token = _serializador().dumps({'s': sid})
+    return {'token': token, 'tipo': 'Bearer', 'expira_em': expira_em, 'cliente_id': cliente_id}, 200
+
+
+def logout(sid):
+    """POST /logout: revoga a sessão e invalida o cache de sessões de todos os workers do host."""
+    conn = _connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    try:
+        repositorios.sessoes.revoga(conn, sid)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        return {'erro': 'Erro ao encerrar sessão', 'message': str(err)}, 500
+    finally:
+        conn.close()
+    # A geração é do host inteiro: os outros workers voltam ao banco e veem revogada_em
+    geracoes.incrementa('tbl_sessoes')
+    sessoes.remover(sid)
+    return {'mensagem': 'Sessão encerrada.'}, 200
@@ -0,0 +1,77 @@
+"""Microbenchmark da codificação JSON de uma listagem de produtos.
+
+Uso:
+    python -m bench.codificar [--linhas 10000] [--repeticoes 20] [--semente 42]
+
+Monta uma resposta de GET /produtos com `--linhas` produtos (Decimal em preco e
+custo_no_fornecedor, como o MySQL devolve) e mede o tempo de codificação no
+provedor JSON padrão do Flask e nos codificadores de serializacao. Não usa o banco.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serializacao
+
+
+def resposta_produtos(linhas, semente):
+    rng = random.Random(semente)
+    produtos = []
+    for id_ in range(1, linhas + 1):
+        preco = Decimal(rng.randint(100, 100000)) / 100
+        produtos.append({
+            'ID': id_, 'Nome': f'Produto {id_}', 'Descricao': 'descrição do produto', 'Preco': preco,
+            'Qtd_em_estoque': rng.randint(0, 5000), 'Fornecedor_ID': rng.randint(1, 1000),
+            'Custo_no_Fornecedor': (preco * Decimal('0.6')).quantize(Decimal('0.01')),
+        })
+    return {'produtos': produtos, 'next': 'eyJpZCI6MTAwMDB9'}
+
+
+def mede(codifica, obj, repeticoes):
+    """Tempos (ms) de cada repetição, depois de uma execução de aquecimento."""
+    codifica(obj)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        codifica(obj)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    obj = resposta_produtos(args.linhas, args.semente)
+    flask_padrao = DefaultJSONProvider(Flask(__name__))
+
+    codificadores = [
+        ('flask (DefaultJSONProvider)', lambda o: flask_padrao.dumps(o, separators=(',', ':')).encode()),
+        ('serializacao.codifica_padrao', serializacao.codifica_padrao),
+    ]
+    if serializacao.orjson is not None:
+        codificadores.append(('serializacao.codifica_orjson', serializacao.codifica_orjson))
+
+    base = None
+    print(f'{args.linhas} produtos, {args.repeticoes} repetições', file=sys.stderr)
+    for nome, codifica in codificadores:
+        tempos = mede(codifica, obj, args.repeticoes)
+        mediana = statistics.median(tempos)
+        base = base or mediana
+        tamanho = len(codifica(obj))
+        print(f'{nome:30} mediana {mediana:8.2f}ms  min {min(tempos):8.2f}ms  '
+              f'{tamanho / 1024:7.0f} KiB  {base / mediana:5.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
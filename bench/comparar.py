@@ -0,0 +1,75 @@
+"""Compara dois resultados do bench.executar, rota a rota.
+
+Uso:
+    python -m bench.comparar base.json novo.json [--tolerancia 10]
+
+Mostra vazão e p50/p95/p99 das duas execuções com a variação percentual. Sai
+com código 1 se o p95 de alguma rota piorar mais que a tolerância (em %), o que
+permite usar a comparação como verificação entre commits.
+"""
+import argparse
+import json
+import sys
+
+
+METRICAS = ('p50', 'p95', 'p99')
+
+
+def _carrega(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _variacao(antes, depois):
+    if not antes or depois is None:
+        return None
+    return (depois - antes) / antes * 100
+
+
+def _formata(variacao):
+    return '     -' if variacao is None else f'{variacao:+6.1f}%'
+
+
+def compara(base, novo, tolerancia):
+    """Retorna as linhas da tabela e as rotas cujo p95 piorou além da tolerância."""
+    linhas = []
+    regressoes = []
+    for rota, medida in novo['endpoints'].items():
+        anterior = base['endpoints'].get(rota)
+        if anterior is None:
+            linhas.append(f'{rota:32} (nova rota)')
+            continue
+        colunas = [f"rps {medida['rps'] or 0:9.1f} {_formata(_variacao(anterior['rps'], medida['rps']))}"]
+        for metrica in METRICAS:
+            antes = anterior['latencia_ms'][metrica]
+            depois = medida['latencia_ms'][metrica]
+            colunas.append(f'{metrica} {depois or 0:8.2f}ms {_formata(_variacao(antes, depois))}')
+        linhas.append(f'{rota:32} ' + '  '.join(colunas))
+
+        variacao = _variacao(anterior['latencia_ms']['p95'], medida['latencia_ms']['p95'])
+        if variacao is not None and variacao > tolerancia:
+            regressoes.append((rota, variacao))
+    return linhas, regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('novo')
+    parser.add_argument('--tolerancia', type=float, default=10.0, help='piora máxima aceita no p95, em %%')
+    args = parser.parse_args(argv)
+
+    base, novo = _carrega(args.base), _carrega(args.novo)
+    print(f"base: {base['meta'].get('commit')}  novo: {novo['meta'].get('commit')}")
+    if base['meta'].get('volumes') != novo['meta'].get('volumes'):
+        print('atenção: as execuções usaram volumes diferentes', file=sys.stderr)
+
+    linhas, regressoes = compara(base, novo, args.tolerancia)
+    print('\n'.join(linhas))
+    for rota, variacao in regressoes:
+        print(f'regressão: {rota} p95 {variacao:+.1f}%', file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
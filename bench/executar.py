@@ -0,0 +1,390 @@
+"""Dispara clientes concorrentes contra cada rota do app e mede a latência.
+
+Uso:
+    python -m bench.executar --concorrencia 16 --requisicoes 2000 --saida resultado.json
+    python -m bench.executar --url http://127.0.0.1:8000 ...   # servidor já em execução
+
+Sem --url as requisições vão direto para o app (Flask test client), no mesmo
+processo e sem rede; o banco é o local configurado no .cred e populado com
+bench.semear. Os volumes informados aqui devem ser os mesmos da semeadura.
+
+O resultado é um JSON com vazão (requisições/s) e p50/p95/p99 por rota, além do
+commit e dos parâmetros usados, para comparar execuções com bench.comparar.
+"""
+import argparse
+import http.client
+import json
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+
+STATUS = ('pendente', 'aprovado', 'cancelado', 'entregue')
+ITENS_BULK = 100
+LINHAS_IMPORTACAO = 2000
+ITENS_CARRINHO = 200
+
+# preparo(cliente, rng, seq) roda fora da medição e devolve o id usado na rota
+Cenario = namedtuple('Cenario', 'nome metodo monta preparo', defaults=(None,))
+
+
+def _cliente_novo(rng, seq):
+    return {'nome': f'Bench {seq}', 'cpf': seq[:14], 'email': f'bench{seq}@exemplo.com', 'senha': 'bench'}
+
+
+def _fornecedor_novo(rng, seq):
+    return {'nome': f'Bench {seq}', 'cnpj': seq[:18], 'email': f'bench{seq}@exemplo.com'}
+
+
+def _csv_produtos(rng, volumes, seq, quantidade):
+    colunas = ('nome', 'descricao', 'qtd_em_estoque', 'preco', 'fornecedor_id', 'custo_no_fornecedor')
+    linhas = [','.join(colunas)]
+    for i in range(quantidade):
+        produto = _produto_novo(rng, volumes, f'{seq}{i:04d}')
+        linhas.append(','.join(str(produto[coluna]) for coluna in colunas))
+    return ('\n'.join(linhas) + '\n').encode()
+
+
+def _produto_novo(rng, volumes, seq):
+    preco = round(rng.uniform(1, 1000), 2)
+    return {
+        'nome': f'Bench {seq}', 'descricao': 'produto do benchmark', 'qtd_em_estoque': 1000000,
+        'preco': preco, 'fornecedor_id': rng.randint(1, volumes['fornecedores']),
+        'custo_no_fornecedor': round(preco * 0.6, 2),
+    }
+
+
+def _pedido_novo(rng, volumes, seq):
+    return {
+        'cliente_id': rng.randint(1, volumes['clientes']),
+        'carrinho_id': rng.randint(1, volumes['carrinhos']),
+    }
+
+
+def cenarios(volumes):
+    """Uma entrada por rota do app; ids sorteados dentro dos volumes semeados."""
+    def id_de(tabela):
+        return lambda rng: rng.randint(1, volumes[tabela])
+
+    def cria(caminho, corpo):
+        # Cria o registro que a rota de DELETE/PUT vai consumir
+        def preparo(cliente, rng, seq):
+            status, resposta = cliente.requisita('POST', caminho, corpo(rng, seq))
+            return resposta.get('id') if status == 201 else None
+        return preparo
+
+    produto_novo = lambda rng, seq: _produto_novo(rng, volumes, seq)
+    pedido_novo = lambda rng, seq: _pedido_novo(rng, volumes, seq)
+    carrinho_novo = lambda rng, seq: {'produto_id': id_de('produtos')(rng), 'quantidade': rng.randint(1, 5)}
+    itens_novos = lambda rng: [
+        {'produto_id': produto_id, 'quantidade': rng.randint(0, 5)}
+        for produto_id in rng.sample(range(1, volumes['produtos'] + 1), ITENS_CARRINHO)
+    ]
+    preco = lambda rng: rng.randint(1, 900)
+
+    def pedido_com_chave(cliente, rng, seq):
+        # Pedido criado com Idempotency-Key; a requisição medida é a retentativa (resposta repetida)
+        corpo, cabecalhos = pedido_novo(rng, seq), {'Idempotency-Key': f'bench-{seq}'}
+        cliente.requisita('POST', '/pedidos', corpo, cabecalhos)
+        return corpo, cabecalhos
+
+    def login(rng):
+        i = id_de('clientes')(rng)
+        return {'email': f'cliente{i}@exemplo.com', 'senha': f'senha{i}'}
+
+    return [
+        # Clientes
+        Cenario('GET /clientes', 'GET', lambda rng, seq, _: '/clientes'),
+        Cenario('GET /clientes/<id>', 'GET', lambda rng, seq, _: f'/clientes/{id_de("clientes")(rng)}'),
+        Cenario('POST /clientes', 'POST', lambda rng, seq, _: ('/clientes', _cliente_novo(rng, seq))),
+        Cenario('POST /clientes/bulk', 'POST', lambda rng, seq, _: (
+            '/clientes/bulk', [_cliente_novo(rng, f'{seq}{i:02d}') for i in range(ITENS_BULK)])),
+        # Senhas da semeadura (senha<i>): o primeiro login de cada cliente também troca o texto puro pelo hash
+        Cenario('POST /login', 'POST', lambda rng, seq, _: ('/login', login(rng))),
+        Cenario('PUT /clientes/<id>', 'PUT', lambda rng, seq, id_: (f'/clientes/{id_}', _cliente_novo(rng, seq)),
+                cria('/clientes', _cliente_novo)),
+        Cenario('DELETE /clientes/<id>', 'DELETE', lambda rng, seq, id_: f'/clientes/{id_}',
+                cria('/clientes', _cliente_novo)),
+
+        # Fornecedores
+        Cenario('GET /fornecedores', 'GET', lambda rng, seq, _: '/fornecedores'),
+        Cenario('GET /fornecedores/<id>', 'GET', lambda rng, seq, _: f'/fornecedores/{id_de("fornecedores")(rng)}'),
+        Cenario('POST /fornecedores', 'POST', lambda rng, seq, _: ('/fornecedores', _fornecedor_novo(rng, seq))),
+        Cenario('POST /fornecedores/bulk', 'POST', lambda rng, seq, _: (
+            '/fornecedores/bulk', [_fornecedor_novo(rng, f'{seq}{i:02d}') for i in range(ITENS_BULK)])),
+        Cenario('PUT /fornecedores/<id>', 'PUT', lambda rng, seq, id_: (
+            f'/fornecedores/{id_}', _fornecedor_novo(rng, seq)),
+                cria('/fornecedores', _fornecedor_novo)),
+        Cenario('DELETE /fornecedores/<id>', 'DELETE', lambda rng, seq, id_: f'/fornecedores/{id_}',
+                cria('/fornecedores', _fornecedor_novo)),
+
+        # Produtos
+        Cenario('GET /produtos', 'GET', lambda rng, seq, _: '/produtos'),
+        Cenario('GET /produtos?fields', 'GET', lambda rng, seq, _: '/produtos?fields=nome,preco'),
+        Cenario('GET /produtos?filtros', 'GET', lambda rng, seq, _: (
+            f'/produtos?preco_min={preco(rng)}&preco_max={preco(rng) + 100}&sort=preco')),
+        Cenario('GET /produtos?stream', 'GET', lambda rng, seq, _: (
+            f'/produtos?stream=1&fornecedor_id={id_de("fornecedores")(rng)}')),
+        Cenario('GET /produtos/<id>', 'GET', lambda rng, seq, _: f'/produtos/{id_de("produtos")(rng)}'),
+        Cenario('GET /produtos/busca', 'GET', lambda rng, seq, _: (
+            f'/produtos/busca?q=produto+{id_de("produtos")(rng)}')),
+        Cenario('GET /produtos/autocomplete', 'GET', lambda rng, seq, _: (
+            f'/produtos/autocomplete?prefix=produto+{str(id_de("produtos")(rng))[:3]}')),
+        Cenario('POST /produtos', 'POST', lambda rng, seq, _: ('/produtos', produto_novo(rng, seq))),
+        Cenario('POST /produtos/bulk', 'POST', lambda rng, seq, _: (
+            '/produtos/bulk', [produto_novo(rng, f'{seq}{i:02d}') for i in range(ITENS_BULK)])),
+        Cenario('POST /produtos/import', 'POST', lambda rng, seq, _: (
+            '/produtos/import', _csv_produtos(rng, volumes, seq, LINHAS_IMPORTACAO))),
+        Cenario('PUT /produtos/<id>', 'PUT', lambda rng, seq, id_: (f'/produtos/{id_}', produto_novo(rng, seq)),
+                cria('/produtos', produto_novo)),
+        Cenario('DELETE /produtos/<id>', 'DELETE', lambda rng, seq, id_: f'/produtos/{id_}',
+                cria('/produtos', produto_novo)),
+
+        # Carrinhos
+        Cenario('GET /carrinhos', 'GET', lambda rng, seq, _: '/carrinhos'),
+        Cenario('GET /carrinhos/<id>', 'GET', lambda rng, seq, _: f'/carrinhos/{id_de("carrinhos")(rng)}'),
+        Cenario('GET /carrinhos/cliente/<id>', 'GET', lambda rng, seq, _: (
+            f'/carrinhos/cliente/{id_de("clientes")(rng)}')),
+        Cenario('POST /carrinhos', 'POST', lambda rng, seq, _: ('/carrinhos', carrinho_novo(rng, seq))),
+        Cenario('PUT /carrinhos/<id>/itens', 'PUT', lambda rng, seq, _: (
+            f'/carrinhos/{id_de("carrinhos")(rng)}/itens', itens_novos(rng))),
+        Cenario('PUT /carrinhos/<id>', 'PUT', lambda rng, seq, id_: (f'/carrinhos/{id_}', carrinho_novo(rng, seq)),
+                cria('/carrinhos', carrinho_novo)),
+        Cenario('DELETE /carrinhos/<id>', 'DELETE', lambda rng, seq, id_: f'/carrinhos/{id_}',
+                cria('/carrinhos', carrinho_novo)),
+
+        # Pedidos
+        Cenario('GET /pedidos', 'GET', lambda rng, seq, _: '/pedidos'),
+        Cenario('GET /pedidos?filtros', 'GET', lambda rng, seq, _: (
+            f'/pedidos?status={rng.choice(STATUS)}&data_de=2024-06-01')),
+        Cenario('GET /pedidos/export.csv', 'GET', lambda rng, seq, _: (
+            f'/pedidos/export.csv?cliente_id={id_de("clientes")(rng)}')),
+        Cenario('GET /pedidos/<id>', 'GET', lambda rng, seq, _: f'/pedidos/{id_de("pedidos")(rng)}'),
+        Cenario('GET /pedidos/cliente/<id>', 'GET', lambda rng, seq, _: f'/pedidos/cliente/{id_de("clientes")(rng)}'),
+        Cenario('GET /relatorios/vendas', 'GET', lambda rng, seq, _: (
+            f'/relatorios/vendas?agrupar={rng.choice(("fornecedor", "produto", "dia"))}'
+            f'&de=2024-{rng.randint(1, 12):02d}-01&ate=2024-12-31')),
+        Cenario('POST /pedidos', 'POST', lambda rng, seq, _: ('/pedidos', pedido_novo(rng, seq))),
+        Cenario('POST /pedidos (retentativa)', 'POST', lambda rng, seq, anterior: ('/pedidos', *anterior),
+                pedido_com_chave),
+        Cenario('PUT /pedidos/<id>', 'PUT', lambda rng, seq, id_: (
+            f'/pedidos/{id_}', dict(pedido_novo(rng, seq), status='cancelado')),
+                cria('/pedidos', pedido_novo)),
+        Cenario('DELETE /pedidos/<id>', 'DELETE', lambda rng, seq, id_: f'/pedidos/{id_}',
+                cria('/pedidos', pedido_novo)),
+    ]
+
+
+class ClienteLocal:
+    """Chama o app no mesmo processo, sem rede (Flask test client)."""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def requisita(self, metodo, caminho, corpo=None, cabecalhos=None):
+        if isinstance(corpo, bytes):  # CSV (POST /produtos/import)
+            resposta = self._cliente.open(caminho, method=metodo, data=corpo, content_type='text/csv',
+                                          headers=cabecalhos)
+        else:
+            resposta = self._cliente.open(caminho, method=metodo, json=corpo, headers=cabecalhos)
+        dados = resposta.get_data()  # consome respostas em streaming por inteiro
+        return resposta.status_code, _json(dados, resposta.mimetype)
+
+
+class ClienteHTTP:
+    """Chama um servidor já em execução com uma conexão keep-alive por thread."""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self._conn = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=60)
+        self._prefixo = partes.path.rstrip('/')
+
+    def requisita(self, metodo, caminho, corpo=None, cabecalhos=None):
+        cabecalhos = dict(cabecalhos or {})
+        dados = None
+        if isinstance(corpo, bytes):  # CSV (POST /produtos/import)
+            dados = corpo
+            cabecalhos['Content-Type'] = 'text/csv'
+        elif corpo is not None:
+            dados = json.dumps(corpo).encode()
+            cabecalhos['Content-Type'] = 'application/json'
+        try:
+            self._conn.request(metodo, self._prefixo + caminho, body=dados, headers=cabecalhos)
+            resposta = self._conn.getresponse()
+            conteudo = resposta.read()
+        except (http.client.HTTPException, OSError):
+            self._conn.close()  # reabre na próxima requisição
+            raise
+        return resposta.status, _json(conteudo, resposta.getheader('Content-Type', ''))
+
+
+def _json(conteudo, tipo):
+    if 'application/json' in (tipo or ''):
+        try:
+            return json.loads(conteudo)
+        except ValueError:
+            pass
+    return {}
+
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada."""
+    if not ordenados:
+        return None
+    posicao = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicao]
+
+
+def executa_cenario(cenario, indice, novo_cliente, args):
+    """Roda `args.requisicoes` requisições do cenário em `args.concorrencia` threads."""
+    latencias = []
+    status = Counter()
+    erros = Counter()
+    lock = threading.Lock()
+    proxima = iter(range(args.requisicoes + args.aquecimento))
+    proxima_lock = threading.Lock()
+
+    def trabalhador(numero):
+        # Sementes fixas por cenário e thread: a mesma execução sorteia os mesmos ids
+        rng = random.Random(f'{args.semente}:{indice}:{numero}')
+        cliente = novo_cliente()
+        while True:
+            with proxima_lock:
+                seq = next(proxima, None)
+            if seq is None:
+                return
+            # Chave única por execução para não colidir com cpf/email/cnpj únicos:
+            # prefixo da execução (4) + rota (2) + sequência (6) + item do bulk (2) = 14
+            seq_unica = f'{args.prefixo}{indice:02d}{seq:06d}'
+            try:
+                id_ = cenario.preparo(cliente, rng, seq_unica) if cenario.preparo else None
+                montado = cenario.monta(rng, seq_unica, id_)
+                caminho, corpo, *cabecalhos = montado if isinstance(montado, tuple) else (montado, None)
+                inicio = time.perf_counter()
+                codigo, _ = cliente.requisita(cenario.metodo, caminho, corpo, *cabecalhos)
+                duracao = time.perf_counter() - inicio
+            except Exception as exc:
+                with lock:
+                    erros[type(exc).__name__] += 1
+                continue
+            if seq < args.aquecimento:
+                continue
+            with lock:
+                latencias.append(duracao)
+                status[codigo] += 1
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador, args=(n,)) for n in range(args.concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    ms = [valor * 1000 for valor in latencias]
+    falhas = sum(erros.values()) + sum(qtd for codigo, qtd in status.items() if codigo >= 500)
+    return {
+        'requisicoes': len(latencias),
+        'erros': falhas,
+        'excecoes': dict(erros),
+        'status': {str(codigo): qtd for codigo, qtd in sorted(status.items())},
+        'duracao_s': round(total, 3),
+        'rps': round(len(latencias) / total, 2) if total else None,
+        'latencia_ms': {
+            'media': round(sum(ms) / len(ms), 3) if ms else None,
+            'p50': _arredonda(percentil(ms, 50)),
+            'p95': _arredonda(percentil(ms, 95)),
+            'p99': _arredonda(percentil(ms, 99)),
+            'max': _arredonda(ms[-1] if ms else None),
+        },
+    }
+
+
+def _arredonda(valor):
+    return None if valor is None else round(valor, 3)
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='servidor alvo; sem ele o app roda no próprio processo')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--requisicoes', type=int, default=500, help='requisições medidas por rota')
+    parser.add_argument('--aquecimento', type=int, default=50, help='requisições descartadas por rota')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--rotas', help='substring para filtrar as rotas, ex.: "GET /produtos"')
+    parser.add_argument('--somente-leitura', action='store_true', help='não executa POST/PUT/DELETE')
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: stdout)')
+    # Mesmos volumes usados em bench.semear
+    parser.add_argument('--fornecedores', type=int, default=1000)
+    parser.add_argument('--clientes', type=int, default=100000)
+    parser.add_argument('--produtos', type=int, default=1000000)
+    parser.add_argument('--carrinhos', type=int, default=1000000)
+    parser.add_argument('--pedidos', type=int, default=5000000)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = argumentos(argv)
+    # Prefixo das chaves únicas (cpf/email/cnpj): cada execução usa uma faixa nova
+    args.prefixo = f'{random.SystemRandom().randrange(16 ** 4):04X}'
+    volumes = {nome: getattr(args, nome) for nome in ('fornecedores', 'clientes', 'produtos', 'carrinhos', 'pedidos')}
+
+    if args.url:
+        novo_cliente = lambda: ClienteHTTP(args.url)
+    else:
+        from app import app
+        novo_cliente = lambda: ClienteLocal(app)
+
+    resultado = {
+        'meta': {
+            'commit': _commit(),
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'alvo': args.url or 'local',
+            'concorrencia': args.concorrencia,
+            'requisicoes': args.requisicoes,
+            'aquecimento': args.aquecimento,
+            'semente': args.semente,
+            'volumes': volumes,
+        },
+        'endpoints': {},
+    }
+
+    for indice, cenario in enumerate(cenarios(volumes)):
+        if args.rotas and args.rotas not in cenario.nome:
+            continue
+        if args.somente_leitura and cenario.metodo != 'GET':
+            continue
+        medida = executa_cenario(cenario, indice, novo_cliente, args)
+        resultado['endpoints'][cenario.nome] = medida
+        print(f"{cenario.nome:32} {medida['rps'] or 0:9.1f} req/s  p50={medida['latencia_ms']['p50']}ms "
+              f"p95={medida['latencia_ms']['p95']}ms p99={medida['latencia_ms']['p99']}ms "
+              f"erros={medida['erros']}", file=sys.stderr)
+
+    saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(saida + '\n')
+    else:
+        print(saida)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
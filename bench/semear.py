@@ -0,0 +1,174 @@
+"""Popula o banco local com dados sintéticos, determinísticos pela semente.
+
+Uso:
+    python -m bench.semear --produtos 1000000 --pedidos 5000000 --semente 42
+
+As tabelas são esvaziadas (TRUNCATE) e recriadas com ids 1..N, então os mesmos
+parâmetros geram sempre o mesmo banco. As linhas são geradas em blocos e
+gravadas com INSERT multi-linha, sem checagem de chaves durante a carga.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import mysql.connector
+
+import lote
+import migracoes
+import vendas
+from configuracao import config
+
+
+# Da tabela que referencia para a referenciada (ordem de limpeza)
+TABELAS = (
+    'tbl_vendas_fornecedor_dia', 'tbl_vendas_produto_dia', 'tbl_vendas_pedidos', 'tbl_idempotencia',
+    'tbl_sessoes', 'tbl_outbox', 'tbl_reservas_estoque', 'tbl_pedidos', 'tbl_carrinho_itens', 'tbl_carrinho',
+    'tbl_produtos_alteracoes', 'tbl_produtos', 'tbl_fornecedores', 'tbl_clientes',
+)
+STATUS = ('pendente', 'aprovado', 'cancelado', 'entregue')
+DATA_BASE = datetime(2024, 1, 1)
+BLOCO = 50000  # linhas geradas e confirmadas por vez
+
+
+def fornecedores(rng, quantidade):
+    for i in range(1, quantidade + 1):
+        yield (f'Fornecedor {i}', f'{i:014d}', f'fornecedor{i}@exemplo.com')
+
+
+def clientes(rng, quantidade):
+    for i in range(1, quantidade + 1):
+        yield (f'Cliente {i}', f'{i:011d}', f'cliente{i}@exemplo.com', f'senha{i}')
+
+
+def produtos(rng, quantidade, total_fornecedores):
+    for i in range(1, quantidade + 1):
+        preco = Decimal(rng.randint(100, 100000)) / 100
+        custo = (preco * Decimal('0.6')).quantize(Decimal('0.01'))
+        yield (f'Produto {i}', rng.randint(1000, 100000), f'Descrição do produto {i}', preco,
+               rng.randint(1, total_fornecedores), custo)
+
+
+def carrinhos(rng, quantidade, total_produtos):
+    for _ in range(quantidade):
+        yield (rng.randint(1, total_produtos), rng.randint(1, 5))
+
+
+def carrinho_itens(semente, quantidade, total_produtos, max_itens):
+    # Cada carrinho com 1 a max_itens produtos distintos (gerador próprio: não altera as demais tabelas)
+    rng = random.Random(f'{semente}:carrinho_itens')
+    for carrinho_id in range(1, quantidade + 1):
+        for produto_id in sorted(rng.sample(range(1, total_produtos + 1), rng.randint(1, max_itens))):
+            yield (carrinho_id, produto_id, rng.randint(1, 5))
+
+
+def pedidos(rng, quantidade, total_clientes, total_carrinhos):
+    for _ in range(quantidade):
+        data_hora = DATA_BASE + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        yield (rng.randint(1, total_clientes), data_hora, rng.randint(1, total_carrinhos), rng.choice(STATUS))
+
+
+def _carrega(conn, tabela, colunas, linhas, tamanho_lote):
+    inicio = time.perf_counter()
+    total = 0
+    cursor = conn.cursor()
+    try:
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) == BLOCO:
+                lote.insere_em_lotes(cursor, tabela, colunas, bloco, tamanho_lote)
+                conn.commit()
+                total += len(bloco)
+                bloco = []
+        if bloco:
+            lote.insere_em_lotes(cursor, tabela, colunas, bloco, tamanho_lote)
+            conn.commit()
+            total += len(bloco)
+    finally:
+        cursor.close()
+    duracao = time.perf_counter() - inicio
+    print(f"{tabela}: {total} linhas em {duracao:.1f}s ({total / max(duracao, 1e-9):.0f} linhas/s)", file=sys.stderr)
+
+
+def semear(conn, args):
+    rng = random.Random(args.semente)
+    migracoes.aplicar(conn)
+
+    cursor = conn.cursor()
+    try:
+        # Carga em massa: as chaves são consistentes por construção
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()"
+        )
+        existentes = {nome for (nome,) in cursor.fetchall()}
+        for tabela in TABELAS:
+            if tabela in existentes:
+                cursor.execute(f"TRUNCATE TABLE {tabela}")
+    finally:
+        cursor.close()
+
+    _carrega(conn, 'tbl_fornecedores', ('nome', 'cnpj', 'email'),
+             fornecedores(rng, args.fornecedores), args.lote)
+    _carrega(conn, 'tbl_clientes', ('nome', 'cpf', 'email', 'senha'),
+             clientes(rng, args.clientes), args.lote)
+    _carrega(conn, 'tbl_produtos',
+             ('nome', 'qtd_em_estoque', 'descricao', 'preco', 'fornecedor_id', 'custo_no_fornecedor'),
+             produtos(rng, args.produtos, args.fornecedores), args.lote)
+    _carrega(conn, 'tbl_carrinho', ('produto_id', 'quantidade'),
+             carrinhos(rng, args.carrinhos, args.produtos), args.lote)
+    _carrega(conn, 'tbl_carrinho_itens', ('carrinho_id', 'produto_id', 'quantidade'),
+             carrinho_itens(args.semente, args.carrinhos, args.produtos, args.itens_por_carrinho), args.lote)
+    _carrega(conn, 'tbl_pedidos', ('cliente_id', 'data_hora', 'carrinho_id', 'status'),
+             pedidos(rng, args.pedidos, args.clientes, args.carrinhos), args.lote)
+
+    cursor = conn.cursor()
+    try:
+        # Vendas consolidadas dos pedidos semeados (aprovados e entregues)
+        inicio = time.perf_counter()
+        vendas.reconstroi(cursor)
+        conn.commit()
+        print(f"vendas consolidadas em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+        # Os gatilhos de busca registraram cada produto carregado; os workers que subirem
+        # depois montam o índice do zero, então o registro da carga não precisa ser lido
+        cursor.execute("TRUNCATE TABLE tbl_produtos_alteracoes")
+
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        # Estatísticas atualizadas para o otimizador escolher os índices certos
+        for tabela in TABELAS:
+            if tabela in existentes:
+                cursor.execute(f"ANALYZE TABLE {tabela}")
+                cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--fornecedores', type=int, default=1000)
+    parser.add_argument('--clientes', type=int, default=100000)
+    parser.add_argument('--produtos', type=int, default=1000000)
+    parser.add_argument('--carrinhos', type=int, default=1000000)
+    parser.add_argument('--itens-por-carrinho', type=int, default=5, help='máximo de itens por carrinho')
+    parser.add_argument('--pedidos', type=int, default=5000000)
+    parser.add_argument('--lote', type=int, default=5000, help='linhas por INSERT multi-linha')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = argumentos(argv)
+    conn = mysql.connector.connect(**config)
+    try:
+        semear(conn, args)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
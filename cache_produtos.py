@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import geracoes
+
+
+TABELA = 'tbl_produtos'
+
+
+class CacheLRU:
+    """Cache LRU limitado com TTL, invalidado pela geração compartilhada de uma tabela."""
+
+    def __init__(self, tabela, max_itens=10000, ttl=60.0):
+        self.tabela = tabela
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (valor, geração, expira_em)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def geracao(self):
+        """Geração atual da tabela; leia ANTES da consulta e passe para guardar()."""
+        return geracoes.atual(self.tabela)
+
+    def obter(self, chave):
+        """Retorna o valor em cache ou None se ausente, expirado ou invalidado."""
+        geracao = geracoes.atual(self.tabela)
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is not None:
+                valor, geracao_item, expira_em = entrada
+                if geracao_item == geracao and expira_em > agora:
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._itens[chave]
+            self.faltas += 1
+            return None
+
+    def guardar(self, chave, valor, geracao):
+        """Guarda um valor lido do banco quando a tabela estava em `geracao`.
+
+        Se outra escrita aconteceu durante a consulta, a geração já mudou e a
+        entrada nasce inválida; assim um dado antigo nunca sobrevive à invalidação.
+        """
+        with self._lock:
+            self._itens[chave] = (valor, geracao, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        """Tira uma entrada do cache deste worker, sem invalidar as demais."""
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def invalidar(self):
+        """Invalida o cache em todos os workers do host (chamar depois do commit)."""
+        geracoes.incrementa(self.tabela)
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {'itens': len(self._itens), 'acertos': self.acertos, 'faltas': self.faltas}
+
+
+produtos = CacheLRU(
+    TABELA,
+    max_itens=int(os.getenv('PRODUTOS_CACHE_MAX', 10000)),
+    ttl=float(os.getenv('PRODUTOS_CACHE_TTL', 60)),
+)
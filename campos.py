@@ -0,0 +1,28 @@
+"""Campos esparsos: ?fields=Nome,Preco limita a resposta, e o SELECT, aos campos pedidos.
+
+Os nomes são as chaves da resposta de cada rota, sem diferenciar maiúsculas
+(?fields=nome,preco em GET /produtos). Só são aceitos os campos permitidos do
+formato da rota (repositorios.Formato); sem ?fields= a resposta é a completa.
+"""
+from flask import request
+
+from paginacao import ParametroInvalido
+
+
+def projecao(formato, args=None):
+    """Lê ?fields= (ou de `args`) e retorna a repositorios.Projecao correspondente."""
+    bruto = (request.args if args is None else args).get('fields')
+    if not bruto:
+        return formato.projecao()
+    chaves = set()
+    for nome in bruto.split(','):
+        nome = nome.strip()
+        if not nome:
+            continue
+        chave = formato.nomes.get(nome.lower())
+        if chave is None:
+            raise ParametroInvalido(f"Campo inválido em fields: {nome}; use: {', '.join(formato.permitidos)}.")
+        chaves.add(chave)
+    if not chaves:
+        raise ParametroInvalido('O parâmetro fields deve listar ao menos um campo.')
+    return formato.projecao(chaves)
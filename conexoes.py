@@ -0,0 +1,59 @@
+"""Conexões síncronas com o banco: o pool do processo (primário) e as réplicas de leitura.
+
+Usadas pelas rotas de app.py e pelas regras síncronas que app_async.py executa em
+threads (pedidos, carrinhos, bulk inserts), além de auth, idempotencia e fila.
+"""
+import time
+
+from mysql.connector import Error
+
+import db_pool
+import logs
+import metricas
+import replicas
+from configuracao import config
+
+
+# Resposta do handler de db_pool.PoolEsgotado nos dois apps
+POOL_ESGOTADO = ({'erro': 'Servidor ocupado; tente novamente.'}, 503, {'Retry-After': '1'})
+
+
+# Função para conectar ao banco de dados
+def connect_db():
+    """Obtém uma conexão do pool do processo; conn.close() a devolve ao pool.
+
+    Retorna None se a conexão falhar; levanta db_pool.PoolEsgotado (um Error) se não
+    houver conexão livre dentro de DB_POOL_TIMEOUT.
+    """
+    inicio = time.perf_counter()
+    try:
+        # Reaproveita conexões já autenticadas em vez de abrir uma nova (TCP + TLS + auth) por requisição
+        return db_pool.obter_pool(config).obter()
+    except db_pool.PoolEsgotado as err:
+        # Pool sem conexão livre: a exceção chega ao handler dos apps, que responde 503
+        logs.logger.warning('Pool de conexões esgotado: %s', err)
+        raise
+    except Error as err:
+        # Em caso de erro, registra a mensagem de erro
+        logs.logger.error('Erro ao obter conexão do pool: %s', err)
+        return None
+    finally:
+        metricas.acumula('conexao', time.perf_counter() - inicio)
+
+
+def connect_db_leitura():
+    """Conexão para as rotas GET: uma réplica em rotação (DB_REPLICAS), ou o primário.
+
+    Vai para o primário quando não há réplicas configuradas ou disponíveis e quando
+    o cliente escreveu há pouco (cookie de replicas.configurar).
+    """
+    roteador = replicas.obter_roteador(config)
+    if roteador is not None and not replicas.fixado_no_primario():
+        inicio = time.perf_counter()
+        try:
+            conn = roteador.obter()
+        finally:
+            metricas.acumula('conexao', time.perf_counter() - inicio)
+        if conn is not None:
+            return conn
+    return connect_db()
@@ -0,0 +1,23 @@
+"""Configuração da conexão com o banco, lida das variáveis de ambiente.
+
+Sem dependências do app: importado pelos dois modos da API (app.py, app_async.py),
+por migrar.py e pelos benchmarks, que só precisam dos dados de conexão.
+"""
+import os
+
+from dotenv import load_dotenv
+
+
+# Carrega as variáveis de ambiente do arquivo .cred (se disponível)
+load_dotenv('.cred')
+
+
+# Configurações para conexão com o banco de dados usando variáveis de ambiente
+config = {
+    'host': os.getenv('DB_HOST', 'localhost'),  # Obtém o host do banco de dados da variável de ambiente
+    'user': os.getenv('DB_USER'),  # Obtém o usuário do banco de dados da variável de ambiente
+    'password': os.getenv('DB_PASSWORD'),  # Obtém a senha do banco de dados da variável de ambiente
+    'database': os.getenv('DB_NAME', 'db_desafio'),  # Obtém o nome do banco de dados da variável de ambiente
+    'port': int(os.getenv('DB_PORT', 3306)),  # Obtém a porta do banco de dados da variável de ambiente
+    'ssl_ca': os.getenv('SSL_CA_PATH')  # Caminho para o certificado SSL
+}
@@ -0,0 +1,176 @@
+"""Log de consultas lentas com captura automática do EXPLAIN.
+
+Todo comando executado pelos cursores das conexões do pool é cronometrado
+(cursores.CursorMedido). Os que passam de SLOW_QUERY_MS milissegundos são
+registrados no log estruturado (logger "api.consultas_lentas") e agregados por SQL
+normalizado neste worker; o plano (EXPLAIN) é capturado uma única vez por SQL
+normalizado. GET /debug/slow-queries mostra os piores comandos do worker.
+
+No modo assíncrono, app_async mede os comandos do pool do aiomysql e os entrega a
+registra(), com o EXPLAIN capturado pela própria conexão assíncrona.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from mysql.connector import Error
+
+import cursores
+
+
+LIMITE_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+MAX_COMANDOS = int(os.getenv('SLOW_QUERY_MAX', 500))
+
+logger = logging.getLogger('api.consultas_lentas')
+
+_EXPLICAVEIS = ('select', 'update', 'delete', 'insert', 'replace')
+_RE_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_MARCADOR = re.compile(r'%s|%\(\w+\)s')
+_RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_LINHAS = re.compile(r'(\(\?\+\))(?:\s*,\s*\(\?\+\))+')
+_RE_ESPACOS = re.compile(r'\s+')
+
+_lock = threading.Lock()
+_comandos = {}  # SQL normalizado -> estatísticas
+_planos = {}  # SQL normalizado -> linhas do EXPLAIN (só dos que estão em _comandos)
+
+
+def normaliza(sql):
+    """Reduz o SQL a um molde: literais e parâmetros viram ?, listas viram (?+)."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode(errors='replace')
+    sql = _RE_ESPACOS.sub(' ', sql).strip()
+    sql = _RE_STRING.sub('?', sql)
+    sql = _RE_MARCADOR.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_LISTA.sub('(?+)', sql)
+    return _RE_LINHAS.sub(r'\1, ...', sql)
+
+
+def redige_parametros(parametros):
+    """Mantém números e datas (úteis para reproduzir o plano) e esconde textos."""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {chave: _redige(valor) for chave, valor in parametros.items()}
+    return [_redige(valor) for valor in parametros]
+
+
+def _redige(valor):
+    if valor is None or isinstance(valor, (bool, int, float, Decimal)):
+        return valor
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return f'<{type(valor).__name__}:{len(valor) if hasattr(valor, "__len__") else "?"}>'
+
+
+def explicavel(sql):
+    """Se o comando admite EXPLAIN."""
+    return sql.lstrip().lower().startswith(_EXPLICAVEIS)
+
+
+def plano(linhas):
+    """Linhas do EXPLAIN (dicionários) prontas para o log: bytes viram texto."""
+    return [
+        {chave: valor.decode(errors='replace') if isinstance(valor, (bytes, bytearray)) else valor
+         for chave, valor in linha.items()}
+        for linha in linhas
+    ]
+
+
+def _explain(conn, sql, parametros):
+    """Executa EXPLAIN do comando na mesma conexão; None se não for possível."""
+    if not explicavel(sql):
+        return None
+    cursor = None
+    try:
+        # Dentro do try: conn.cursor() também falha em uma conexão com resultados pendentes
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute('EXPLAIN ' + sql, parametros)
+        return plano(cursor.fetchall())
+    except Error:
+        # Resultados pendentes na conexão ou comando sem suporte a EXPLAIN
+        return None
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Error:
+                pass
+
+
+def lenta(duracao):
+    """Se um comando que levou duracao segundos passa de SLOW_QUERY_MS."""
+    return duracao * 1000 >= LIMITE_MS
+
+
+def sem_plano(sql):
+    """Se o EXPLAIN do molde de sql ainda não foi capturado neste worker."""
+    return normaliza(sql) not in _planos
+
+
+def observa(sql, parametros, duracao, linhas, cursor):
+    """Observador de cursores.CursorMedido: registra os comandos acima do limite."""
+    if not lenta(duracao) or sql is None:
+        return
+
+    explain = None
+    if sem_plano(sql):
+        explain = _explain(cursor._conn, sql if isinstance(sql, str) else sql.decode(), parametros)
+    registra(sql, parametros, duracao, linhas, explain)
+
+
+def registra(sql, parametros, duracao, linhas, explain=None):
+    """Registra um comando lento no log e nas estatísticas do worker.
+
+    explain é o resultado de plano() para o comando, guardado se o molde ainda não
+    tinha plano; None quando não foi possível capturá-lo.
+    """
+    ms = duracao * 1000
+    molde = normaliza(sql)
+    redigidos = redige_parametros(parametros)
+    with _lock:
+        item = _comandos.get(molde)
+        if item is None:
+            if len(_comandos) >= MAX_COMANDOS:
+                # Descarta o comando que menos pesou no total
+                menor = min(_comandos, key=lambda chave: _comandos[chave]['total_ms'])
+                del _comandos[menor]
+                _planos.pop(menor, None)
+            item = _comandos[molde] = {'sql': molde, 'execucoes': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        # Só há plano para comandos em _comandos: os dois ficam limitados a MAX_COMANDOS
+        if explain is not None:
+            _planos[molde] = explain
+        item['execucoes'] += 1
+        item['total_ms'] += ms
+        item['max_ms'] = max(item['max_ms'], ms)
+        item['ultimos_parametros'] = redigidos
+        item['ultimas_linhas'] = linhas
+        item['ultima_vez'] = time.time()
+
+    logger.warning('consulta lenta', extra={'campos': {
+        'sql': molde, 'duracao_ms': round(ms, 3), 'linhas': linhas, 'parametros': redigidos,
+        'plano': _planos.get(molde),
+    }})
+
+
+def piores(quantidade=20, ordem='total_ms'):
+    """Retorna os comandos lentos deste worker, do pior para o melhor."""
+    with _lock:
+        itens = [dict(item, plano=_planos.get(molde)) for molde, item in _comandos.items()]
+    itens.sort(key=lambda item: item[ordem], reverse=True)
+    for item in itens:
+        item['media_ms'] = round(item['total_ms'] / item['execucoes'], 3)
+        item['total_ms'] = round(item['total_ms'], 3)
+        item['max_ms'] = round(item['max_ms'], 3)
+    return itens[:quantidade]
+
+
+def configurar():
+    if observa not in cursores.observadores:
+        cursores.observadores.append(observa)
@@ -0,0 +1,92 @@
+import time
+
+
+# Funções chamadas após cada comando: observador(sql, parametros, duracao, linhas, cursor)
+observadores = []
+
+
+class CursorMedido:
+    """Envolve um cursor do mysql-connector e mede execute() e fetch*().
+
+    O tempo de execute() mais o das leituras de linhas é o tempo da consulta; ao
+    terminar (fechamento do cursor ou novo execute) os observadores recebem o total.
+    """
+
+    __slots__ = ('_cursor', '_conn', '_sql', '_parametros', '_duracao', '_pendente')
+
+    def __init__(self, cursor, conn):
+        self._cursor = cursor
+        self._conn = conn
+        self._sql = None
+        self._parametros = None
+        self._duracao = 0.0
+        self._pendente = False
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._notifica()
+        self._sql = operation
+        self._parametros = params
+        self._pendente = True
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._duracao = time.perf_counter() - inicio
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._notifica()
+        self._sql = operation
+        self._parametros = None
+        self._pendente = True
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._duracao = time.perf_counter() - inicio
+
+    def _mede(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            self._duracao += time.perf_counter() - inicio
+
+    def fetchone(self):
+        return self._mede(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._mede(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._mede(self._cursor.fetchall)
+
+    def libera(self):
+        """Encerra a medição sem fechar o cursor (prepared statements reaproveitados)."""
+        self._notifica()
+
+    def close(self):
+        # Fecha antes de notificar: a conexão fica livre para o observador (ex.: EXPLAIN)
+        try:
+            return self._cursor.close()
+        finally:
+            self._notifica()
+
+    def _notifica(self):
+        if not self._pendente:
+            return
+        self._pendente = False
+        linhas = self._cursor.rowcount
+        for observador in observadores:
+            observador(self._sql, self._parametros, self._duracao, linhas, self)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+import cursores
+
+
+# Modos de limpeza aplicados quando uma conexão volta para o pool
+RESET_SESSAO = 'sessao'  # COM_RESET_CONNECTION: desfaz transação, variáveis, tabelas temporárias e prepared statements
+RESET_ROLLBACK = 'rollback'  # apenas desfaz a transação aberta (mais barato; mantém os prepared statements)
+RESET_NENHUM = 'nenhum'
+
+
+class PoolEsgotado(PoolError):
+    """Nenhuma conexão livre no pool dentro do timeout (sobrecarga passageira: a rota responde 503)."""
+
+
+class ConexaoPooled:
+    """Envolve uma conexão do pool; close() devolve a conexão em vez de fechá-la."""
+
+    __slots__ = ('_pool', '_conn', '_criada_em', '_preparados')
+
+    def __init__(self, pool, conn, criada_em, preparados):
+        self._pool = pool
+        self._conn = conn
+        self._criada_em = criada_em
+        self._preparados = preparados
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn, self._criada_em, self._preparados)
+
+    def cursor(self, *args, **kwargs):
+        # Cursores medidos: cada comando é cronometrado e repassado aos observadores
+        return cursores.CursorMedido(self._conn.cursor(*args, **kwargs), self._conn)
+
+    def preparado(self, sql, valores=()):
+        """Executa `sql` em um prepared statement do servidor reaproveitado nesta conexão.
+
+        O statement é preparado na primeira execução e fica em cache enquanto a
+        conexão viver (até DB_POOL_PREPARADOS por conexão, o menos usado sai). Retorna
+        o cursor medido já executado: leia as linhas e chame libera(), não close().
+        """
+        item = self._preparados.get(sql)
+        if item is None:
+            if len(self._preparados) >= self._pool.max_preparados:
+                _, (_, antigo) = self._preparados.popitem(last=False)
+                antigo.close()  # COM_STMT_CLOSE desaloca o statement no servidor
+            item = self._preparados[sql] = (sql, self._conn.cursor(prepared=True))
+        else:
+            self._preparados.move_to_end(sql)
+        # O mysql-connector só reaproveita o statement se receber o mesmo objeto str
+        sql_preparado, cursor = item
+        medido = cursores.CursorMedido(cursor, self._conn)
+        medido.execute(sql_preparado, valores)
+        return medido
+
+    def is_connected(self):
+        # A conexão já foi validada no checkout; evita um ping extra por requisição
+        return self._conn is not None
+
+    def __getattr__(self, nome):
+        if self._conn is None:
+            raise Error('Conexão já devolvida ao pool.')
+        return getattr(self._conn, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoolConexoes:
+    """Pool de conexões MySQL com overflow, tempo de vida máximo e validação no checkout."""
+
+    def __init__(self, config, tamanho=5, max_overflow=10, tempo_vida=1800,
+                 timeout=30.0, pre_ping=True, reset=RESET_ROLLBACK, max_preparados=64):
+        self._config = dict(config)
+        self.tamanho = tamanho
+        self.max_overflow = max_overflow
+        self.tempo_vida = tempo_vida
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.reset = reset
+        self.max_preparados = max_preparados
+
+        self._cond = threading.Condition()
+        self._livres = []  # pilha de (conexão, criada_em, preparados); LIFO mantém as conexões "quentes"
+        self._abertas = 0  # livres + emprestadas + em criação
+        self._emprestadas = 0
+
+        # Estatísticas
+        self._checkouts = 0
+        self._esperas = 0
+        self._tempo_espera_total = 0.0
+        self._tempo_espera_max = 0.0
+        self._timeouts = 0
+        self._criadas = 0
+        self._descartadas = 0
+
+    def obter(self):
+        """Retira uma conexão do pool, criando uma nova se houver capacidade."""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        esperou = False
+        conn = criada_em = preparados = None
+
+        with self._cond:
+            while True:
+                if self._livres:
+                    conn, criada_em, preparados = self._livres.pop()
+                    break
+                if self._abertas < self.tamanho + self.max_overflow:
+                    # Reserva a vaga; a conexão é aberta fora do lock
+                    self._abertas += 1
+                    break
+                esperou = True
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolEsgotado(
+                        f'Tempo esgotado ({self.timeout}s) aguardando conexão do pool.'
+                    )
+                self._cond.wait(restante)
+            self._emprestadas += 1
+
+        try:
+            if conn is not None and not self._valida(conn, criada_em):
+                self._fecha(conn)
+                conn = None
+            if conn is None:
+                conn = mysql.connector.connect(**self._config)
+                criada_em = time.monotonic()
+                preparados = OrderedDict()  # SQL -> (SQL, cursor preparado) desta conexão
+                with self._cond:
+                    self._criadas += 1
+        except Exception:
+            with self._cond:
+                self._abertas -= 1
+                self._emprestadas -= 1
+                self._cond.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._checkouts += 1
+            if esperou:
+                self._esperas += 1
+                self._tempo_espera_total += espera
+                self._tempo_espera_max = max(self._tempo_espera_max, espera)
+
+        return ConexaoPooled(self, conn, criada_em, preparados)
+
+    def devolver(self, conn, criada_em, preparados):
+        """Limpa a sessão e recoloca a conexão no pool (ou a descarta)."""
+        descartar = self._expirada(criada_em)
+        if not descartar:
+            try:
+                if self.reset == RESET_SESSAO:
+                    conn.reset_session()
+                    # O servidor desalocou os statements; o cache da conexão não vale mais
+                    preparados.clear()
+                elif self.reset == RESET_ROLLBACK:
+                    conn.rollback()
+            except Error:
+                # Resultados não lidos ou conexão quebrada: não vale a pena reaproveitar
+                descartar = True
+
+        with self._cond:
+            self._emprestadas -= 1
+            if descartar or len(self._livres) >= self.tamanho:
+                # Conexões de overflow são fechadas ao voltar (contadas em _fecha)
+                self._abertas -= 1
+            else:
+                self._livres.append((conn, criada_em, preparados))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._fecha(conn)
+
+    @property
+    def emprestadas(self):
+        """Conexões em uso agora (carga do pool, sem lock: é só uma leitura)."""
+        return self._emprestadas
+
+    def estatisticas(self):
+        """Retorna um retrato do estado do pool neste processo."""
+        with self._cond:
+            return {
+                'pid': os.getpid(),
+                'tamanho': self.tamanho,
+                'max_overflow': self.max_overflow,
+                'abertas': self._abertas,
+                'livres': len(self._livres),
+                'emprestadas': self._emprestadas,
+                'checkouts': self._checkouts,
+                'esperas': self._esperas,
+                'tempo_espera_total': round(self._tempo_espera_total, 6),
+                'tempo_espera_max': round(self._tempo_espera_max, 6),
+                'timeouts': self._timeouts,
+                'conexoes_criadas': self._criadas,
+                'conexoes_descartadas': self._descartadas,
+            }
+
+    def _expirada(self, criada_em):
+        return bool(self.tempo_vida) and time.monotonic() - criada_em > self.tempo_vida
+
+    def _valida(self, conn, criada_em):
+        if self._expirada(criada_em):
+            return False
+        if self.pre_ping:
+            try:
+                conn.ping(reconnect=False)
+            except Error:
+                return False
+        return True
+
+    def _fecha(self, conn):
+        with self._cond:
+            self._descartadas += 1
+        try:
+            conn.close()
+        except Error:
+            pass
+
+
+def _env_bool(nome, padrao):
+    valor = os.getenv(nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+def criar_pool(config):
+    """Cria um pool usando as variáveis de ambiente DB_POOL_*."""
+    return PoolConexoes(
+        config,
+        tamanho=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),
+        tempo_vida=float(os.getenv('DB_POOL_RECYCLE', 1800)),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        pre_ping=_env_bool('DB_POOL_PRE_PING', True),
+        reset=os.getenv('DB_POOL_RESET', RESET_ROLLBACK),
+        max_preparados=int(os.getenv('DB_POOL_PREPARADOS', 64)),
+    )
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool(config):
+    """Retorna o pool do processo atual.
+
+    Cada worker do gunicorn tem o seu próprio pool: sockets herdados do processo
+    pai via fork nunca são reaproveitados.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = criar_pool(config)
+                _pool_pid = pid
+    return _pool
@@ -0,0 +1,43 @@
+"""Acesso às rotas de diagnóstico (/debug/pool, /debug/slow-queries).
+
+As rotas expõem o estado interno do worker: o pool de conexões e o SQL dos comandos
+lentos, com os planos de execução. Ficam desligadas (404) a não ser que DEBUG_TOKEN
+esteja definido; com ele, respondem só a quem enviar o mesmo valor no cabeçalho
+X-Debug-Token (403 para os demais).
+
+Configuração:
+    DEBUG_TOKEN     segredo das rotas de diagnóstico (vazio: rotas desligadas)
+"""
+import functools
+import hmac
+import os
+
+from flask import request
+
+
+CABECALHO = 'X-Debug-Token'
+TOKEN = os.getenv('DEBUG_TOKEN', '')
+
+DESLIGADAS = ({'erro': 'Rota não encontrada.'}, 404)
+NAO_AUTORIZADO = ({'erro': f'{CABECALHO} ausente ou inválido.'}, 403)
+
+
+def recusa(token):
+    """Resposta de erro para o token recebido, ou None se o acesso é permitido."""
+    if not TOKEN:
+        return DESLIGADAS
+    # Comparação em tempo constante: o tempo da resposta não revela o prefixo correto
+    if not token or not hmac.compare_digest(token.encode(), TOKEN.encode()):
+        return NAO_AUTORIZADO
+    return None
+
+
+def protegida(rota):
+    """Rota de diagnóstico: só com DEBUG_TOKEN definido e enviado em X-Debug-Token."""
+    @functools.wraps(rota)
+    def envolvida(*args, **kwargs):
+        erro = recusa(request.headers.get(CABECALHO))
+        if erro is not None:
+            return erro
+        return rota(*args, **kwargs)
+    return envolvida
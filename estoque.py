@@ -0,0 +1,93 @@
+"""Reserva de estoque para pedidos.
+
+A baixa é um único UPDATE condicional (qtd_em_estoque >= quantidade) na mesma
+transação que grava o pedido: não há leitura seguida de escrita, então duas
+requisições concorrentes nunca vendem a mesma unidade e o estoque nunca fica
+negativo.
+
+As baixas ficam no fim da transação, para que a linha do produto fique bloqueada o
+menor tempo possível: depois delas só vêm o INSERT das reservas (um comando) e, para
+pedidos que já nascem aprovados ou entregues, a consolidação de vendas
+(vendas.ajusta, que lê preço e custo dos produtos já bloqueados). O pedido e a
+outbox são gravados antes.
+"""
+
+
+class EstoqueInsuficiente(Exception):
+    """Não há estoque para um dos itens do pedido."""
+
+    def __init__(self, produto_id):
+        super().__init__(f'Estoque insuficiente para o produto {produto_id}.')
+        self.produto_id = produto_id
+
+
+class CarrinhoNaoEncontrado(Exception):
+    """O carrinho do pedido não existe ou está vazio."""
+
+    def __init__(self, carrinho_id):
+        super().__init__(f'Carrinho {carrinho_id} não encontrado.')
+        self.carrinho_id = carrinho_id
+
+
+def itens_do_carrinho(cursor, carrinho_id):
+    """Retorna [(produto_id, quantidade)] do carrinho, ordenados por produto."""
+    # Um item por produto (chave primária (carrinho_id, produto_id)), já na ordem da chave
+    cursor.execute(
+        "SELECT produto_id, quantidade FROM tbl_carrinho_itens WHERE carrinho_id = %s ORDER BY produto_id",
+        (carrinho_id,),
+    )
+    itens = [(produto_id, int(quantidade)) for produto_id, quantidade in cursor.fetchall()]
+    if not itens:
+        raise CarrinhoNaoEncontrado(carrinho_id)
+    return itens
+
+
+def reservar(cursor, pedido_id, itens):
+    """Baixa o estoque e registra as reservas do pedido (não faz commit).
+
+    Os produtos são atualizados em ordem de id para que pedidos com vários itens
+    sempre bloqueiem as linhas na mesma ordem e não entrem em deadlock. As reservas
+    são gravadas depois das baixas: a checagem da chave estrangeira para tbl_produtos
+    põe um bloqueio compartilhado na linha do produto, e dois pedidos com esse
+    bloqueio esperariam um pelo outro no UPDATE.
+    """
+    for produto_id, quantidade in sorted(itens):
+        cursor.execute(
+            "UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque - %s "
+            "WHERE id = %s AND qtd_em_estoque >= %s",
+            (quantidade, produto_id, quantidade),
+        )
+        if cursor.rowcount != 1:
+            raise EstoqueInsuficiente(produto_id)
+    marcadores = ', '.join(['(%s, %s, %s)'] * len(itens))
+    cursor.execute(
+        f"INSERT INTO tbl_reservas_estoque (pedido_id, produto_id, quantidade) VALUES {marcadores}",
+        [valor for produto_id, quantidade in itens for valor in (pedido_id, produto_id, quantidade)],
+    )
+
+
+def liberar(cursor, pedido_id):
+    """Devolve ao estoque as reservas ainda ativas do pedido (não faz commit).
+
+    As reservas são bloqueadas com FOR UPDATE e marcadas como liberadas, então
+    cancelar o mesmo pedido duas vezes (ou em paralelo) devolve o estoque uma vez só.
+    Retorna quantas reservas foram liberadas.
+    """
+    cursor.execute(
+        "SELECT id, produto_id, quantidade FROM tbl_reservas_estoque "
+        "WHERE pedido_id = %s AND liberada_em IS NULL ORDER BY produto_id FOR UPDATE",
+        (pedido_id,),
+    )
+    reservas = cursor.fetchall()
+    for _, produto_id, quantidade in reservas:
+        cursor.execute(
+            "UPDATE tbl_produtos SET qtd_em_estoque = qtd_em_estoque + %s WHERE id = %s",
+            (quantidade, produto_id),
+        )
+    if reservas:
+        marcadores = ', '.join(['%s'] * len(reservas))
+        cursor.execute(
+            f"UPDATE tbl_reservas_estoque SET liberada_em = NOW() WHERE id IN ({marcadores})",
+            [reserva_id for reserva_id, _, _ in reservas],
+        )
+    return len(reservas)
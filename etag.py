@@ -0,0 +1,50 @@
+import functools
+import hashlib
+
+from flask import make_response, request
+
+import geracoes
+import replicas
+import streaming
+
+
+def calcula(tabelas, requisicao=None):
+    """ETag forte derivada das gerações das tabelas lidas pela rota e da URL pedida.
+
+    Não depende do corpo da resposta: qualquer escrita em uma das tabelas muda a
+    geração e, portanto, a ETag; sem escritas a mesma URL produz a mesma resposta.
+    """
+    versoes = '.'.join(str(geracoes.atual(tabela)) for tabela in tabelas)
+    requisicao = request if requisicao is None else requisicao
+    url = hashlib.blake2b(requisicao.full_path.encode(), digest_size=8).hexdigest()
+    return f'{geracoes.epoca():x}-{versoes}-{url}'
+
+
+def marca(resp, tag):
+    """ETag e Cache-Control da resposta de uma rota condicional (só respostas 200)."""
+    if resp.status_code == 200:
+        resp.set_etag(tag)
+        # O cliente pode guardar a resposta, mas deve revalidar a cada uso
+        resp.headers.setdefault('Cache-Control', 'no-cache')
+    return resp
+
+
+def condicional(*tabelas):
+    """Decorator para rotas GET: responde 304 sem executar a rota se If-None-Match bater."""
+    def decorador(view):
+        @functools.wraps(view)
+        def envolvida(*args, **kwargs):
+            if streaming.solicitado():
+                return view(*args, **kwargs)
+
+            # Tabela alterada há pouco: o corpo marcado com a geração nova vem do primário
+            replicas.fixa_se_alterada(tabelas)
+            tag = calcula(tabelas)
+            if request.if_none_match.contains(tag):
+                resp = make_response('', 304)
+                resp.set_etag(tag)
+                return resp
+
+            return marca(make_response(view(*args, **kwargs)), tag)
+        return envolvida
+    return decorador
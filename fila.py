@@ -0,0 +1,188 @@
+"""Fila de jobs para efeitos colaterais lentos (e-mails, integrações).
+
+As rotas gravam o evento em tbl_outbox com enfileirar(), na mesma transação da
+escrita que o originou: se a transação for desfeita o evento também é, e se ela
+for confirmada o evento com certeza será entregue. A resposta HTTP sai logo após o
+commit; um pool de threads de cada worker consome a outbox em segundo plano.
+
+Vários processos podem consumir a mesma outbox: os jobs são reivindicados com
+SELECT ... FOR UPDATE SKIP LOCKED e recebem um prazo (lease). Se o processo morrer
+no meio da entrega, o job volta a ficar disponível quando o prazo vence.
+
+Para rodar apenas os consumidores, sem servir HTTP: python fila.py
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from mysql.connector import Error
+
+
+QUANTIDADE_WORKERS = int(os.getenv('FILA_WORKERS', 2))
+TAMANHO_LOTE = int(os.getenv('FILA_LOTE', 20))
+MAX_TENTATIVAS = int(os.getenv('FILA_MAX_TENTATIVAS', 8))
+INTERVALO_OCIOSO = float(os.getenv('FILA_INTERVALO', 2))  # segundos entre consultas sem trabalho
+PRAZO_PROCESSAMENTO = int(os.getenv('FILA_PRAZO', 300))  # segundos até um job reivindicado voltar à fila
+
+logger = logging.getLogger('api.fila')
+
+_tarefas = {}
+_acordar = threading.Event()
+_lock = threading.Lock()
+_pid = None
+_parar = threading.Event()
+
+
+def tarefa(tipo):
+    """Registra a função que entrega os eventos de um tipo: funcao(connect_db, payload)."""
+    def registra(funcao):
+        _tarefas[tipo] = funcao
+        return funcao
+    return registra
+
+
+def enfileirar(cursor, tipo, payload):
+    """Grava o evento na outbox dentro da transação em andamento (não faz commit)."""
+    cursor.execute(
+        "INSERT INTO tbl_outbox (tipo, payload) VALUES (%s, %s)",
+        (tipo, json.dumps(payload, default=str)),
+    )
+
+
+def avisar():
+    """Acorda os consumidores deste processo; chame depois do commit."""
+    _acordar.set()
+
+
+def iniciar(connect_db, quantidade=QUANTIDADE_WORKERS):
+    """Inicia os consumidores deste processo, uma única vez por PID."""
+    global _pid
+    if quantidade <= 0 or _pid == os.getpid():
+        return
+    with _lock:
+        if _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        for numero in range(quantidade):
+            thread = threading.Thread(
+                target=_consome, args=(connect_db,), name=f'fila-{numero}', daemon=True
+            )
+            thread.start()
+
+
+def _consome(connect_db):
+    while not _parar.is_set():
+        try:
+            processados = processa_lote(connect_db)
+        except Error as err:
+            logger.error('Erro na fila de jobs: %s', err)
+            processados = 0
+        if not processados:
+            _acordar.wait(INTERVALO_OCIOSO)
+            _acordar.clear()
+
+
+def _reivindica(conn, limite):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, tipo, payload, tentativas FROM tbl_outbox "
+            "WHERE status IN ('pendente', 'processando') AND proxima_tentativa <= NOW() "
+            "ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED",
+            (limite,),
+        )
+        jobs = cursor.fetchall()
+        if jobs:
+            marcadores = ', '.join(['%s'] * len(jobs))
+            cursor.execute(
+                "UPDATE tbl_outbox SET status = 'processando', tentativas = tentativas + 1, "
+                f"proxima_tentativa = NOW() + INTERVAL %s SECOND WHERE id IN ({marcadores})",
+                [PRAZO_PROCESSAMENTO] + [job[0] for job in jobs],
+            )
+        conn.commit()
+        return jobs
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _finaliza(conn, job_id, tentativas, erro):
+    cursor = conn.cursor()
+    try:
+        if erro is None:
+            cursor.execute("UPDATE tbl_outbox SET status = 'entregue', ultimo_erro = NULL WHERE id = %s", (job_id,))
+        elif tentativas >= MAX_TENTATIVAS:
+            cursor.execute("UPDATE tbl_outbox SET status = 'falhou', ultimo_erro = %s WHERE id = %s", (erro, job_id))
+        else:
+            # Backoff exponencial: 2, 4, 8, ... segundos, limitado a 1 hora
+            espera = min(2 ** tentativas, 3600)
+            cursor.execute(
+                "UPDATE tbl_outbox SET status = 'pendente', ultimo_erro = %s, "
+                "proxima_tentativa = NOW() + INTERVAL %s SECOND WHERE id = %s",
+                (erro, espera, job_id),
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def processa_lote(connect_db, limite=TAMANHO_LOTE):
+    """Reivindica e entrega um lote de jobs; retorna quantos foram processados.
+
+    Nenhuma conexão fica presa durante as entregas (SMTP lento, integrações): a
+    reivindicação é confirmada e a conexão devolvida ao pool antes delas, e cada job
+    é finalizado em uma conexão curta, logo depois da sua entrega.
+    """
+    conn = connect_db()
+    if not conn:
+        return 0
+    try:
+        jobs = _reivindica(conn, limite)
+    finally:
+        conn.close()
+
+    for job_id, tipo, payload, tentativas in jobs:
+        erro = None
+        funcao = _tarefas.get(tipo)
+        if funcao is None:
+            erro = f'Nenhuma tarefa registrada para o tipo {tipo}.'
+        else:
+            try:
+                funcao(connect_db, json.loads(payload))
+            except Exception as exc:
+                erro = f'{type(exc).__name__}: {exc}'
+                logger.warning('Falha ao entregar o job %s (%s): %s', job_id, tipo, erro)
+        _finaliza_job(connect_db, job_id, tentativas + 1, erro)
+    return len(jobs)
+
+
+def _finaliza_job(connect_db, job_id, tentativas, erro):
+    # Sem conexão, o job continua reivindicado e volta à fila quando o prazo vencer
+    try:
+        conn = connect_db()
+        if not conn:
+            raise Error('Falha na conexão com o banco de dados.')
+        try:
+            _finaliza(conn, job_id, tentativas, erro)
+        finally:
+            conn.close()
+    except Error as err:
+        logger.error('Erro ao finalizar o job %s (volta à fila em até %s s): %s', job_id, PRAZO_PROCESSAMENTO, err)
+
+
+if __name__ == '__main__':
+    # Usa o módulo "fila" importado pelo app (onde as tarefas foram registradas), não __main__
+    import fila
+    from app import connect_db
+
+    print(f"Consumindo a outbox com {max(QUANTIDADE_WORKERS, 1)} threads (Ctrl+C para sair)")
+    fila.iniciar(connect_db, max(QUANTIDADE_WORKERS, 1))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fila._parar.set()
@@ -0,0 +1,194 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import request
+
+import paginacao
+from paginacao import ParametroInvalido
+
+
+STATUS_PEDIDO = ('pendente', 'aprovado', 'cancelado', 'entregue')
+
+
+def _decimal(valor):
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValueError(valor)
+
+
+def _status(valor):
+    if valor not in STATUS_PEDIDO:
+        raise ValueError(valor)
+    return valor
+
+
+# Filtros (parâmetro -> coluna, operador, conversor), colunas ordenáveis (coluna -> conversor)
+# e índices secundários existentes em cada tabela (criados pelas migrações). Todo índice
+# secundário do InnoDB termina implicitamente na chave primária (id).
+ESPECIFICACOES = {
+    'tbl_produtos': {
+        'filtros': {
+            'preco_min': ('preco', '>=', _decimal),
+            'preco_max': ('preco', '<=', _decimal),
+            'fornecedor_id': ('fornecedor_id', '=', int),
+        },
+        'ordenaveis': {'id': int, 'preco': _decimal},
+        'indices': [
+            ('preco',),
+            ('fornecedor_id', 'preco'),
+        ],
+    },
+    'tbl_pedidos': {
+        'filtros': {
+            'status': ('status', '=', _status),
+            'cliente_id': ('cliente_id', '=', int),
+            'data_de': ('data_hora', '>=', datetime.fromisoformat),
+            'data_ate': ('data_hora', '<=', datetime.fromisoformat),
+        },
+        'ordenaveis': {'id': int, 'data_hora': datetime.fromisoformat},
+        'indices': [
+            ('cliente_id', 'data_hora'),
+            ('status', 'data_hora'),
+            ('data_hora',),
+            ('carrinho_id',),
+        ],
+    },
+}
+
+
+class Consulta:
+    """SELECT paginado montado a partir dos filtros e da ordenação pedidos."""
+
+    def __init__(self, sql, valores, limite, ordem, colunas=None):
+        self.sql = sql
+        self.valores = valores
+        self.limite = limite
+        self.ordem = ordem  # (parâmetro sort, coluna) ou None quando ordenado por id
+        self.colunas = colunas  # colunas do SELECT quando as linhas chegam como tuplas
+
+    def pagina(self, linhas):
+        if self.colunas is None:
+            return paginacao.pagina(linhas, self.limite, ordem=self.ordem)
+        # Linhas em tupla: a chave e a coluna de ordenação viram posições
+        ordem = self.ordem and (self.ordem[0], self.colunas.index(self.ordem[1]))
+        return paginacao.pagina(linhas, self.limite, chave=self.colunas.index('id'), ordem=ordem)
+
+
+def _suportada(indices, iguais, coluna_ordem):
+    """Verifica se algum índice entrega as linhas já na ordem pedida.
+
+    Serve um índice cujas primeiras colunas são exatamente as colunas filtradas por
+    igualdade (em qualquer ordem) e cuja coluna seguinte é a coluna de ordenação;
+    filtros de intervalo só são aceitos na própria coluna de ordenação. Assim o
+    MySQL percorre o índice e para no LIMIT, sem filesort nem varredura da tabela.
+    """
+    if not iguais and coluna_ordem == 'id':
+        return True
+    for indice in indices:
+        colunas = indice + ('id',)
+        if len(colunas) > len(iguais) and set(colunas[:len(iguais)]) == iguais \
+                and colunas[len(iguais)] == coluna_ordem:
+            return True
+    return False
+
+
+def _ordem_padrao(indices, iguais, intervalos):
+    """Escolhe a ordenação quando ?sort= não é informado: a que os índices suportam."""
+    if intervalos:
+        return next(iter(intervalos))
+    if _suportada(indices, iguais, 'id'):
+        return 'id'
+    for indice in indices:
+        colunas = indice + ('id',)
+        if len(colunas) > len(iguais) and set(colunas[:len(iguais)]) == iguais:
+            return colunas[len(iguais)]
+    return 'id'
+
+
+def monta_consulta(tabela, paginar=True, colunas=None, args=None):
+    """Traduz ?<filtro>=, ?sort=, ?limit= e ?cursor= em um SELECT parametrizado.
+
+    Só aceita parâmetros da lista de cada tabela e rejeita (ParametroInvalido) as
+    combinações de filtro e ordenação sem índice que as sustente. Com paginar=False
+    o SELECT não tem LIMIT (usado pelo modo streaming). Com `colunas`, o SELECT lista
+    essas colunas (nessa ordem, mais a de ordenação no fim se faltar) em vez de *. `args` substitui os parâmetros da
+    requisição do Flask (usado pelo app assíncrono).
+    """
+    args = request.args if args is None else args
+    spec = ESPECIFICACOES[tabela]
+    condicoes = []
+    valores = []
+    iguais = set()
+    intervalos = set()
+
+    for parametro, (coluna, operador, conversor) in spec['filtros'].items():
+        bruto = args.get(parametro)
+        if bruto is None or bruto == '':
+            continue
+        try:
+            valor = conversor(bruto)
+        except ValueError:
+            raise ParametroInvalido(f'Valor inválido para o filtro {parametro}.')
+        condicoes.append(f'{coluna} {operador} %s')
+        valores.append(valor)
+        (iguais if operador == '=' else intervalos).add(coluna)
+
+    if len(intervalos) > 1:
+        raise ParametroInvalido('Filtros de intervalo só podem ser usados em uma coluna por vez.')
+
+    sort = args.get('sort')
+    if sort:
+        descendente = sort.startswith('-')
+        coluna_ordem = sort.lstrip('-')
+        if coluna_ordem not in spec['ordenaveis']:
+            permitidos = ', '.join(sorted(spec['ordenaveis']))
+            raise ParametroInvalido(f'Ordenação inválida; use uma de: {permitidos} (com "-" para decrescente).')
+    else:
+        descendente = False
+        coluna_ordem = _ordem_padrao(spec['indices'], iguais, intervalos)
+        sort = coluna_ordem
+
+    if (intervalos and intervalos != {coluna_ordem}) or \
+            not _suportada(spec['indices'], iguais, coluna_ordem):
+        raise ParametroInvalido(
+            'Combinação de filtros e ordenação sem índice que a suporte; '
+            'ordene pela coluna filtrada por intervalo ou remova um dos filtros.'
+        )
+
+    limite = paginacao.limite(args)
+    cursor = paginacao.cursor_recebido(args)
+    comparacao = '<' if descendente else '>'
+    if cursor:
+        if coluna_ordem == 'id':
+            condicoes.append(f'id {comparacao} %s')
+            valores.append(cursor['id'])
+        else:
+            if cursor.get('s') != sort:
+                raise ParametroInvalido('Cursor gerado com outra ordenação.')
+            try:
+                valor = spec['ordenaveis'][coluna_ordem](cursor.get('v'))
+            except (TypeError, ValueError):
+                raise ParametroInvalido('Cursor inválido.')
+            # Keyset em (coluna, id): continua exatamente após a última linha vista
+            condicoes.append(f'({coluna_ordem}, id) {comparacao} (%s, %s)')
+            valores.extend([valor, cursor['id']])
+
+    if colunas and coluna_ordem not in colunas:
+        # A coluna de ordenação vai para o cursor da próxima página mesmo fora de ?fields=
+        colunas = tuple(colunas) + (coluna_ordem,)
+
+    direcao = ' DESC' if descendente else ''
+    sql = f"SELECT {', '.join(colunas) if colunas else '*'} FROM {tabela}"
+    if condicoes:
+        sql += ' WHERE ' + ' AND '.join(condicoes)
+    if coluna_ordem == 'id':
+        sql += f' ORDER BY id{direcao}'
+    else:
+        sql += f' ORDER BY {coluna_ordem}{direcao}, id{direcao}'
+    if paginar:
+        sql += ' LIMIT %s'
+        valores.append(limite + 1)
+
+    ordem = None if coluna_ordem == 'id' else (sort, coluna_ordem)
+    return Consulta(sql, valores, limite, ordem, colunas)
@@ -0,0 +1,31 @@
+"""Formatos JSON das respostas: como cada linha (tupla) das tabelas vira um dicionário.
+
+Compartilhados pelos dois modos da API (app.py e app_async.py), que respondem com os
+mesmos nomes de campos. Os nomes históricos (ID, Nome, Produto_ID, ...) vêm das
+respostas originais da API e são mantidos para os clientes existentes.
+"""
+import repositorios
+
+
+cliente = repositorios.clientes.formato(
+    ID='id', Nome='nome', Email='email', CPF='cpf',
+)
+
+fornecedor = repositorios.fornecedores.formato(ID='id', Nome='nome', Email='email', CNPJ='cnpj')
+
+produto = repositorios.produtos.formato(
+    ID='id', Nome='nome', Descricao='descricao', Preco='preco', Qtd_em_estoque='qtd_em_estoque',
+    Fornecedor_ID='fornecedor_id', Custo_no_Fornecedor='custo_no_fornecedor',
+)
+
+# Listagens de tbl_carrinho
+carrinho = repositorios.carrinhos.formato(ID='id', Produto_ID='produto_id', Quantidade='quantidade')
+# GET /carrinhos/<id> sempre respondeu com "Produto_id"; GET /carrinhos/cliente/<id>, com os nomes das colunas
+carrinho_detalhe = repositorios.carrinhos.formato(ID='id', Produto_id='produto_id', Quantidade='quantidade')
+carrinho_colunas = repositorios.carrinhos.formato(id='id', produto_id='produto_id', quantidade='quantidade')
+
+pedido = repositorios.pedidos.formato(
+    ID='id', Cliente_ID='cliente_id', carrinho_id='carrinho_id', data_hora='data_hora', status='status',
+)
+# GET /pedidos/cliente/<id> responde com os nomes das colunas
+pedido_colunas = repositorios.pedidos.formato(**{coluna: coluna for coluna in repositorios.pedidos.colunas})
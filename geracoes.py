@@ -0,0 +1,112 @@
+"""Contadores de geração por tabela, compartilhados entre os workers do mesmo host.
+
+Cada escrita bem-sucedida incrementa o contador da tabela alterada (depois do
+commit). Caches locais guardam a geração lida antes da consulta e descartam a
+entrada quando o contador muda, então uma alteração feita em qualquer worker
+invalida os caches de todos os outros sem nenhuma troca de mensagens.
+
+Os contadores ficam em um arquivo mapeado em memória (em /dev/shm quando existe).
+O arquivo começa com uma "época" aleatória gravada na criação, para que contadores
+recriados do zero nunca se confundam com os anteriores. Depois dos contadores vem o
+instante (time.time()) do último incremento de cada um, usado para saber se uma
+tabela mudou há pouco (ver replicas.fixa_se_alterada).
+"""
+import os
+import mmap
+import random
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem memória compartilhada, contadores apenas do processo
+    fcntl = None
+
+
+# Ordem fixa dos contadores no arquivo; novos nomes devem ser acrescentados ao final
+NOMES = (
+    'tbl_clientes',
+    'tbl_fornecedores',
+    'tbl_produtos',
+    'tbl_carrinho',
+    'tbl_pedidos',
+    'tbl_sessoes',
+)
+
+_CAPACIDADE = 64
+_TAMANHO = 8 * (2 * _CAPACIDADE + 1)  # época + contadores + instantes dos incrementos, 8 bytes cada
+
+_diretorio = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+ARQUIVO = os.getenv(
+    'GERACOES_ARQUIVO',
+    os.path.join(_diretorio, f"api-geracoes-{os.getenv('DB_NAME', 'db_desafio')}"),
+)
+
+_lock = threading.Lock()
+_mapa = None
+_fd = None
+_pid = None
+
+
+def _abre():
+    global _mapa, _fd, _pid
+    if _mapa is not None and _pid == os.getpid():
+        return _mapa
+    with _lock:
+        if _mapa is not None and _pid == os.getpid():
+            return _mapa
+        if fcntl is None:
+            _mapa = bytearray(_TAMANHO)
+            struct.pack_into('<Q', _mapa, 0, random.getrandbits(63))
+        else:
+            fd = os.open(ARQUIVO, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < _TAMANHO:
+                    # Primeiro processo a abrir: inicializa a época e zera os contadores
+                    os.ftruncate(fd, _TAMANHO)
+                    os.pwrite(fd, struct.pack('<Q', random.getrandbits(63)), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            _mapa = mmap.mmap(fd, _TAMANHO)
+            _fd = fd
+        _pid = os.getpid()
+    return _mapa
+
+
+def _posicao(nome):
+    return 8 * (NOMES.index(nome) + 1)
+
+
+def epoca():
+    """Identificador aleatório do arquivo de contadores atual."""
+    return struct.unpack_from('<Q', _abre(), 0)[0]
+
+
+def atual(nome):
+    """Lê a geração atual de `nome` (sem lock; leitura de 8 bytes alinhados)."""
+    return struct.unpack_from('<Q', _abre(), _posicao(nome))[0]
+
+
+def alterado_em(nome):
+    """Instante (time.time()) do último incremento de `nome` neste host; 0.0 se nunca foi incrementado."""
+    return struct.unpack_from('<d', _abre(), _posicao(nome) + 8 * _CAPACIDADE)[0]
+
+
+def incrementa(nome):
+    """Marca `nome` como alterado; deve ser chamado depois do commit."""
+    mapa = _abre()
+    posicao = _posicao(nome)
+    with _lock:
+        if fcntl is not None:
+            fcntl.flock(_fd, fcntl.LOCK_EX)
+        try:
+            valor = struct.unpack_from('<Q', mapa, posicao)[0] + 1
+            struct.pack_into('<Q', mapa, posicao, valor)
+            struct.pack_into('<d', mapa, posicao + 8 * _CAPACIDADE, time.time())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(_fd, fcntl.LOCK_UN)
+    return valor
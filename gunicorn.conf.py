@@ -0,0 +1,53 @@
+# Configuração lida automaticamente pelo gunicorn (gunicorn, ou gunicorn app:app)
+import os
+import secrets
+import shutil
+import tempfile
+
+
+# Modo de execução escolhido no deploy: API_MODO=sync (Flask, app:app) ou
+# API_MODO=async (Quart + aiomysql, app_async:app, em workers do uvicorn)
+if os.getenv('API_MODO', 'sync') == 'async':
+    wsgi_app = 'app_async:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'app:app'
+
+
+# Orçamento de conexões com o MySQL primário, por worker: o pool síncrono (db_pool) em
+# qualquer modo, e no modo async também o pool do aiomysql. Com os padrões, 15 por worker
+# síncrono e 35 por worker assíncrono; vezes o número de workers, o total deve caber em
+# max_connections do servidor (151 no MySQL padrão), com folga para administração e
+# conexões de outros serviços. Ver on_starting.
+def _conexoes_por_worker():
+    sincronas = int(os.getenv('DB_POOL_SIZE', 5)) + int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+    if os.getenv('API_MODO', 'sync') == 'async':
+        return sincronas + int(os.getenv('ASYNC_DB_POOL_MAX', 20))
+    return sincronas
+
+
+# Métricas do Prometheus compartilhadas entre os workers (ver metricas.py)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'api-prometheus'))
+
+
+# Chave dos tokens de login (ver auth.py) igual em todos os workers; sem AUTH_SEGREDO no
+# ambiente, uma chave sorteada aqui no master, e os tokens valem até o próximo reinício
+os.environ.setdefault('AUTH_SEGREDO', secrets.token_hex(32))
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam contadores de processos que já não existem
+    diretorio = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio, exist_ok=True)
+    # Aviso (sem impedir a partida) quando os pools de todos os workers excedem o servidor
+    total = server.cfg.workers * _conexoes_por_worker()
+    limite = int(os.getenv('DB_MAX_CONEXOES', 151))
+    if total > limite:
+        server.log.warning('Pools de %d workers somam até %d conexões; DB_MAX_CONEXOES é %d',
+                           server.cfg.workers, total, limite)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,348 @@
+"""Chaves de idempotência (cabeçalho Idempotency-Key) para POST /pedidos e POST /clientes.
+
+O cliente envia uma chave única por operação e a repete nas retentativas. A primeira
+requisição com a chave reserva uma linha em tbl_idempotencia (INSERT pela chave
+primária, que decide sozinho entre workers e hosts concorrentes) e executa a rota. A
+rota grava o status e o corpo da resposta na linha da chave dentro da própria transação
+da escrita (Reserva.conclui), antes do commit: o pedido (ou o cliente) e a resposta
+guardada são confirmados juntos ou não são confirmados. As retentativas não executam a
+rota de novo:
+
+- chave concluída: a resposta gravada é repetida, com Idempotent-Replayed: true;
+- chave em execução: a retentativa espera a primeira terminar (lendo só a linha da
+  chave) e repete a resposta; passado IDEMPOTENCIA_ESPERA responde 409 com Retry-After;
+- mesma chave com outro corpo: 422.
+
+As respostas sem escrita (erros 4xx) são guardadas depois da rota, em uma transação
+própria. Respostas 5xx não são guardadas (a linha é apagada e a próxima tentativa
+executa a rota), já que nelas nada foi confirmado. Uma reserva em execução há mais de
+IDEMPOTENCIA_TRAVA segundos é considerada abandonada (worker encerrado no meio) e pode
+ser assumida por uma retentativa. Isso só acontece enquanto a rota não confirmou nada:
+a conclusão faz parte do commit da escrita. A reserva assumida ganha outro dono, e a
+requisição original, se ainda estiver executando, não consegue mais concluir a chave:
+desfaz a sua escrita e responde 409.
+
+A chave vale para a rota e para quem a usa (escopo_de): o cliente da sessão, quando há
+um token válido em Authorization; sem token, o próprio corpo da requisição, de forma
+que um cliente anônimo nunca recebe a resposta de outro. Sem o cabeçalho, a rota
+funciona como antes.
+
+Configuração:
+    IDEMPOTENCIA_TTL      segundos em que a resposta fica guardada (86400)
+    IDEMPOTENCIA_ESPERA   segundos que uma retentativa espera a requisição original (10)
+    IDEMPOTENCIA_TRAVA    segundos até uma reserva em execução ser considerada abandonada (60)
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+
+from flask import g, make_response, request
+from mysql.connector import Error, errorcode
+
+import auth
+import db_pool
+import serializacao
+
+
+CABECALHO = 'Idempotency-Key'
+TIPO_JSON = 'application/json'
+
+TTL = int(os.getenv('IDEMPOTENCIA_TTL', 24 * 3600))
+ESPERA = float(os.getenv('IDEMPOTENCIA_ESPERA', 10))
+TRAVA = int(os.getenv('IDEMPOTENCIA_TRAVA', 60))
+LIMPEZA_INTERVALO = 60
+LIMPEZA_LOTE = 1000
+
+# Estados de uma chave
+NOVA = 'nova'  # reservada por esta requisição: executar a rota
+CONCLUIDA = 'concluida'
+EM_EXECUCAO = 'em_execucao'
+DIVERGENTE = 'divergente'
+
+_CHAVE = re.compile(r'^[\x21-\x7e]{1,255}$')
+
+CHAVE_INVALIDA = ({'erro': f'{CABECALHO} deve ter de 1 a 255 caracteres ASCII visíveis.'}, 400)
+DIVERGENTE_RESP = ({'erro': f'{CABECALHO} já usada com outro corpo de requisição.'}, 422)
+EM_EXECUCAO_RESP = (
+    {'erro': f'Requisição com esta {CABECALHO} ainda em execução; tente novamente.'}, 409, {'Retry-After': '1'},
+)
+FALHA_CONEXAO = ({'erro': 'Falha na conexão com o banco de dados.'}, 500)
+
+logger = logging.getLogger('api.idempotencia')
+
+_SQL_RESERVA = (
+    "INSERT INTO tbl_idempotencia (escopo, chave, impressao, dono, expira_em) "
+    "VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s SECOND)"
+)
+# Flags calculadas com o relógio do banco, o mesmo para todos os hosts
+_SQL_CONSULTA = (
+    "SELECT impressao, status, tipo, corpo, expira_em < NOW(), "
+    "status IS NULL AND criado_em < NOW() - INTERVAL %s SECOND "
+    "FROM tbl_idempotencia WHERE escopo = %s AND chave = %s"
+)
+# A condição é conferida de novo no UPDATE: só uma retentativa assume a reserva. Uma reserva
+# concluída na transação da rota ainda não confirmada tem a linha bloqueada: o UPDATE espera
+# o commit e então não a encontra mais em execução
+_SQL_ASSUME = (
+    "UPDATE tbl_idempotencia SET impressao = %s, dono = %s, status = NULL, tipo = NULL, corpo = NULL, "
+    "criado_em = NOW(), expira_em = NOW() + INTERVAL %s SECOND "
+    "WHERE escopo = %s AND chave = %s "
+    "AND (expira_em < NOW() OR (status IS NULL AND criado_em < NOW() - INTERVAL %s SECOND))"
+)
+_SQL_CONCLUI = (
+    "UPDATE tbl_idempotencia SET status = %s, tipo = %s, corpo = %s "
+    "WHERE escopo = %s AND chave = %s AND dono = %s AND status IS NULL"
+)
+_SQL_LIBERA = "DELETE FROM tbl_idempotencia WHERE escopo = %s AND chave = %s AND dono = %s AND status IS NULL"
+_SQL_LIMPA = f"DELETE FROM tbl_idempotencia WHERE expira_em < NOW() LIMIT {LIMPEZA_LOTE}"
+
+_connect_db = None
+_proxima_limpeza = 0.0
+_limpeza_lock = threading.Lock()
+
+
+def configurar(connect_db):
+    """Define a conexão (primário) usada para reservar e concluir as chaves."""
+    global _connect_db
+    _connect_db = connect_db
+
+
+def chave_valida(chave):
+    return bool(_CHAVE.match(chave))
+
+
+def impressao(rota, entrada_dados, corpo):
+    """Hash da rota e do corpo; o JSON é normalizado (ordem das chaves e espaços não contam)."""
+    if entrada_dados is not None:
+        corpo = json.dumps(entrada_dados, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.sha256(rota.encode() + b'\n' + corpo).hexdigest()
+
+
+def escopo_de(rota, sessao, marca):
+    """Escopo da chave: a rota e quem chama (o cliente de sessao, ou o corpo se anônimo)."""
+    if sessao:
+        return f'{rota} cliente:{sessao[0]}'
+    # Sem sessão não há identidade: a mesma chave com outro corpo é outra operação
+    return f'{rota} anonimo:{marca}'
+
+
+class ReservaPerdida(Exception):
+    """A chave foi assumida por outra requisição; a escrita desta deve ser desfeita."""
+
+
+class Reserva:
+    """Chave reservada por esta requisição (estado NOVA).
+
+    dono identifica esta reserva na linha da chave: uma retentativa que assume a chave
+    grava outro dono, e as conclusões desta deixam de encontrá-la.
+    """
+
+    def __init__(self, escopo, chave):
+        self.escopo = escopo
+        self.chave = chave
+        self.dono = secrets.token_hex(16)
+
+    def comando(self, resposta, status):
+        """(sql, valores) que grava a resposta JSON da rota na linha da chave.
+
+        Executar na transação da escrita, antes do commit, e passar as linhas afetadas
+        a confere(). O corpo tem os mesmos bytes que o provedor JSON do app envia.
+        """
+        corpo = serializacao.codifica(resposta) + b'\n'
+        return _SQL_CONCLUI, (status, TIPO_JSON, corpo, self.escopo, self.chave, self.dono)
+
+    def confere(self, linhas):
+        """Levanta ReservaPerdida se o comando() não encontrou esta reserva em execução."""
+        if linhas != 1:
+            raise ReservaPerdida(f'{CABECALHO} assumida por outra requisição: {self.escopo} {self.chave}')
+
+    def conclui(self, conn, resposta, status):
+        """Grava a resposta na transação aberta em conn, sem commit (ver comando())."""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(*self.comando(resposta, status))
+            self.confere(cursor.rowcount)
+        finally:
+            cursor.close()
+
+    def guarda(self, status, tipo, corpo):
+        """Grava, em uma transação própria, a resposta que a rota não concluiu (ou libera a chave, se 5xx).
+
+        Sem efeito se a rota já concluiu a chave na sua transação. Uma falha aqui não
+        muda a resposta já produzida: a reserva fica em execução até ser considerada
+        abandonada, e nesse caso a rota não confirmou nenhuma escrita.
+        """
+        try:
+            conn = _conexao()
+            cursor = conn.cursor()
+            try:
+                if status >= 500:
+                    cursor.execute(_SQL_LIBERA, (self.escopo, self.chave, self.dono))
+                else:
+                    cursor.execute(_SQL_CONCLUI, (status, tipo, corpo, self.escopo, self.chave, self.dono))
+                conn.commit()
+            finally:
+                cursor.close()
+                conn.close()
+        except Error as err:
+            logger.error('Erro ao gravar a resposta de %s %s: %s', self.escopo, self.chave, err)
+
+
+def reservar(escopo, chave, marca):
+    """(estado, registro) da chave; NOVA quando esta requisição ficou com ela e deve executar a rota.
+
+    registro é a Reserva em NOVA e (status, tipo, corpo) da resposta guardada em
+    CONCLUIDA. Levanta Error se o banco falhar.
+    """
+    reserva = Reserva(escopo, chave)
+    conn = _conexao()
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.execute(_SQL_RESERVA, (escopo, chave, marca, reserva.dono, TTL))
+            conn.commit()
+        except Error as err:
+            conn.rollback()
+            if getattr(err, 'errno', None) != errorcode.ER_DUP_ENTRY:
+                raise
+            # Linha apagada entre o INSERT e a leitura: a próxima consulta tenta reservar de novo
+            return _situacao(conn, cursor, reserva, marca) or (EM_EXECUCAO, None)
+    finally:
+        cursor.close()
+        conn.close()
+    _limpa_expiradas()
+    return NOVA, reserva
+
+
+def situacao(escopo, chave, marca):
+    """Como reservar(), mas só lê a linha da chave enquanto ela existir (espera das retentativas)."""
+    conn = _conexao()
+    cursor = conn.cursor()
+    try:
+        estado = _situacao(conn, cursor, Reserva(escopo, chave), marca)
+    finally:
+        cursor.close()
+        conn.close()
+    if estado is None:
+        # A requisição original falhou (5xx) e liberou a chave
+        return reservar(escopo, chave, marca)
+    return estado
+
+
+def _situacao(conn, cursor, reserva, marca):
+    cursor.execute(_SQL_CONSULTA, (TRAVA, reserva.escopo, reserva.chave))
+    linha = cursor.fetchone()
+    conn.commit()
+    if linha is None:
+        return None
+    impressao_gravada, status, tipo, corpo, expirada, abandonada = linha
+    if expirada or abandonada:
+        cursor.execute(_SQL_ASSUME, (marca, reserva.dono, TTL, reserva.escopo, reserva.chave, TRAVA))
+        conn.commit()
+        if cursor.rowcount == 1:
+            if abandonada:
+                logger.warning('Reserva abandonada assumida: %s %s', reserva.escopo, reserva.chave)
+            return NOVA, reserva
+        return EM_EXECUCAO, None
+    if impressao_gravada != marca:
+        return DIVERGENTE, None
+    if status is None:
+        return EM_EXECUCAO, None
+    return CONCLUIDA, (status, tipo, bytes(corpo or b''))
+
+
+def pausas():
+    """Intervalos de espera das retentativas (50 ms dobrando até 500 ms), até ESPERA."""
+    limite = time.monotonic() + ESPERA
+    pausa = 0.05
+    while time.monotonic() + pausa <= limite:
+        yield pausa
+        pausa = min(pausa * 2, 0.5)
+
+
+def responde(estado, registro):
+    """Resposta para uma chave que não é NOVA."""
+    if estado == CONCLUIDA:
+        status, tipo, corpo = registro
+        return corpo, status, {'Content-Type': tipo, 'Idempotent-Replayed': 'true'}
+    if estado == DIVERGENTE:
+        return DIVERGENTE_RESP
+    return EM_EXECUCAO_RESP
+
+
+def idempotente(view):
+    """Decorator para rotas POST: executa a rota uma vez por Idempotency-Key (ver o início do módulo).
+
+    A rota recebe a reserva em g.idempotencia e a conclui na transação da sua escrita.
+    """
+    @functools.wraps(view)
+    def envolvida(*args, **kwargs):
+        chave = request.headers.get(CABECALHO)
+        if chave is None:
+            return view(*args, **kwargs)
+        if not chave_valida(chave):
+            return CHAVE_INVALIDA
+
+        rota = f'{request.method} {request.path}'
+        marca = impressao(rota, request.get_json(silent=True), request.get_data())
+        try:
+            sessao = auth.verifica(auth.token_do_cabecalho(request.headers.get('Authorization')))
+            escopo = escopo_de(rota, sessao, marca)
+            estado, registro = reservar(escopo, chave, marca)
+            for pausa in pausas():
+                if estado != EM_EXECUCAO:
+                    break
+                time.sleep(pausa)
+                estado, registro = situacao(escopo, chave, marca)
+        except db_pool.PoolEsgotado:
+            raise  # 503 pelo handler do app
+        except Error as err:
+            logger.error('Erro ao reservar %s %s: %s', rota, chave, err)
+            return FALHA_CONEXAO
+        if estado != NOVA:
+            return responde(estado, registro)
+
+        g.idempotencia = registro
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except BaseException:
+            registro.guarda(500, None, None)
+            raise
+        registro.guarda(resp.status_code, resp.content_type, resp.get_data())
+        return resp
+    return envolvida
+
+
+def _conexao():
+    conn = _connect_db()
+    if not conn:
+        raise Error('Falha na conexão com o banco de dados.')
+    return conn
+
+
+def _limpa_expiradas():
+    # No máximo uma limpeza por minuto em cada worker, depois de uma reserva nova
+    global _proxima_limpeza
+    agora = time.monotonic()
+    if agora < _proxima_limpeza or not _limpeza_lock.acquire(blocking=False):
+        return
+    try:
+        _proxima_limpeza = agora + LIMPEZA_INTERVALO
+        conn = _conexao()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_SQL_LIMPA)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Error as err:
+        logger.warning('Erro ao apagar chaves de idempotência expiradas: %s', err)
+    finally:
+        _limpeza_lock.release()
@@ -0,0 +1,277 @@
+"""Importação de CSV em lotes: POST /produtos/import.
+
+O arquivo vem no corpo da requisição (Content-Type: text/csv) e é lido em blocos,
+à medida que chega: a memória usada depende do tamanho do lote, não do arquivo.
+A primeira linha é o cabeçalho, com os nomes das colunas em qualquer ordem;
+separador vírgula ou ponto e vírgula (planilhas em português, com vírgula decimal
+nos números).
+
+Cada lote de IMPORTACAO_LOTE linhas é validado (como no bulk, ver lote.py) e gravado
+em uma transação com INSERTs multi-linha. As linhas inválidas não derrubam o lote:
+vão para o arquivo de rejeitos (as colunas originais mais o número da linha e o
+erro), que pode ser baixado em GET /produtos/import/<id>/rejeitos. A resposta é
+NDJSON, uma linha de progresso por lote confirmado e um resumo no fim; se a
+importação parar no meio (ex.: queda do banco), os lotes já confirmados ficam.
+
+O arquivo de rejeitos fica no disco do host que recebeu a importação. Com vários
+hosts, ou IMPORTACAO_DIR aponta para um armazenamento compartilhado por todos (o link
+relativo funciona em qualquer um), ou cada host define IMPORTACAO_URL com o próprio
+endereço e o link do resumo aponta para ele.
+
+Configuração:
+    IMPORTACAO_LOTE       linhas por transação (5000)
+    IMPORTACAO_DIR        diretório dos arquivos de rejeitos (<tmp>/api-importacoes)
+    IMPORTACAO_RETENCAO   segundos até um arquivo de rejeitos ser apagado (86400)
+    IMPORTACAO_URL        endereço deste host no link dos rejeitos (vazio: link relativo)
+"""
+import csv
+import io
+import os
+import re
+import secrets
+import tempfile
+import time
+
+from flask import Response, current_app, stream_with_context
+from mysql.connector import Error
+
+import lote
+import streaming
+
+
+TAMANHO_LOTE = int(os.getenv('IMPORTACAO_LOTE', 5000))
+DIRETORIO = os.getenv('IMPORTACAO_DIR', os.path.join(tempfile.gettempdir(), 'api-importacoes'))
+RETENCAO = int(os.getenv('IMPORTACAO_RETENCAO', 24 * 3600))
+URL_HOST = os.getenv('IMPORTACAO_URL', '').rstrip('/')
+
+_ID = re.compile(r'^[0-9a-f]{16}$')
+_ID_REFERENCIA = re.compile(r'^[+-]?[0-9]+$')
+
+
+def abre(corpo, colunas, obrigatorios):
+    """(leitor, erro): csv.DictReader sobre o corpo binário, com o cabeçalho conferido, ou a resposta 400."""
+    texto = io.TextIOWrapper(corpo, encoding='utf-8-sig', newline='')
+    try:
+        primeira = texto.readline()
+    except UnicodeDecodeError:
+        return None, ({'erro': 'O arquivo deve estar em UTF-8.'}, 400)
+    if not primeira.strip():
+        return None, ({'erro': 'O arquivo CSV está vazio; a primeira linha deve ser o cabeçalho.'}, 400)
+
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    cabecalho = [nome.strip().lower() for nome in next(csv.reader([primeira], delimiter=separador))]
+    desconhecidas = [nome for nome in cabecalho if nome not in colunas]
+    faltando = [nome for nome in obrigatorios if nome not in cabecalho]
+    if desconhecidas or faltando or len(set(cabecalho)) != len(cabecalho):
+        return None, ({
+            'erro': 'Cabeçalho inválido.', 'desconhecidas': desconhecidas, 'faltando': faltando,
+            'colunas': list(colunas),
+        }, 400)
+
+    return csv.DictReader(texto, fieldnames=cabecalho, delimiter=separador), None
+
+
+def progresso(connect_db, leitor, tabela, colunas, obrigatorios, numericos=(), referencias=None, apos_commit=None):
+    """Importa as linhas do leitor de abre(); gera um dicionário de progresso por lote e o resumo final.
+
+    `referencias` mapeia colunas para as tabelas referenciadas (ex.: fornecedor_id ->
+    tbl_fornecedores): os ids existentes são lidos uma vez e as linhas com ids
+    inexistentes são rejeitadas antes do INSERT.
+    """
+    inicio = time.perf_counter()
+    rejeitos = Rejeitos(leitor.fieldnames)
+    lidas = inseridas = 0
+    resumo = {}
+    try:
+        conn = connect_db()
+    except Error:
+        # Pool esgotado: a resposta já começou, o erro vai no próprio NDJSON
+        conn = None
+    if not conn:
+        yield {'erro': 'Falha na conexão com o banco de dados.', 'linhas': 0}
+        return
+    cursor = conn.cursor()
+    try:
+        existentes = _ids_existentes(cursor, referencias or {})
+        # Separador ';': números com vírgula decimal (1.234,56)
+        decimal_com_virgula = leitor.reader.dialect.delimiter == ';'
+        for bloco, lidas in _blocos(leitor, rejeitos):
+            validas = _valida(bloco, colunas, obrigatorios, numericos, existentes, decimal_com_virgula, rejeitos)
+            inseridas += _grava(conn, cursor, tabela, colunas, validas, rejeitos)
+            if apos_commit:
+                apos_commit()
+            yield {'linhas': lidas, 'inseridos': inseridas, 'rejeitados': rejeitos.quantidade}
+        resumo['concluido'] = True
+    except UnicodeDecodeError as err:
+        resumo['erro'] = f'O arquivo deve estar em UTF-8 (byte inválido na posição {err.start} de um bloco).'
+    except csv.Error as err:
+        resumo['erro'] = f'CSV inválido perto da linha {leitor.line_num}: {err}'
+    except Error as err:
+        conn.rollback()
+        resumo['erro'] = f'Erro ao gravar o lote; os lotes anteriores foram mantidos: {err}'
+    finally:
+        cursor.close()
+        conn.close()
+        rejeitos.fecha()
+
+    resumo.update({
+        'linhas': lidas, 'inseridos': inseridas, 'rejeitados': rejeitos.quantidade,
+        'rejeitos': link(rejeitos.id) if rejeitos.quantidade else None,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    })
+    yield resumo
+
+
+def resposta(connect_db, corpo, **regras):
+    """POST /<recurso>/import síncrono: o CSV de `corpo` importado enquanto o progresso é enviado."""
+    leitor, erro = abre(corpo, regras['colunas'], regras['obrigatorios'])
+    if erro:
+        return erro
+    codifica = current_app.json.codifica
+
+    def gera():
+        for etapa in progresso(connect_db, leitor, **regras):
+            yield codifica(etapa) + b'\n'
+
+    return Response(stream_with_context(gera()), mimetype=streaming.MIMETYPE_NDJSON)
+
+
+def _blocos(leitor, rejeitos):
+    # ([(número da linha no arquivo, registro)], registros lidos até aqui) a cada TAMANHO_LOTE registros;
+    # linhas com colunas a mais são rejeitadas aqui
+    bloco = []
+    lidas = 0
+    for registro in leitor:
+        lidas += 1
+        numero = leitor.line_num
+        if None in registro:
+            rejeitos.grava(numero, registro, 'Linha com mais colunas que o cabeçalho.')
+            continue
+        bloco.append((numero, registro))
+        if len(bloco) >= TAMANHO_LOTE:
+            yield bloco, lidas
+            bloco = []
+    if bloco or lidas == 0:
+        yield bloco, lidas
+
+
+def _ids_existentes(cursor, referencias):
+    existentes = {}
+    for coluna, tabela in referencias.items():
+        cursor.execute(f"SELECT id FROM {tabela}")
+        existentes[coluna] = {id_ for (id_,) in cursor.fetchall()}
+    return existentes
+
+
+def _valida(bloco, colunas, obrigatorios, numericos, existentes, decimal_com_virgula, rejeitos):
+    # [(número da linha, registro, valores)] das linhas válidas; as demais vão para os rejeitos
+    itens = []
+    for _, registro in bloco:
+        # Células vazias valem NULL (as obrigatórias continuam rejeitadas pela validação)
+        item = {coluna: (valor.strip() or None) if valor is not None else None for coluna, valor in registro.items()}
+        if decimal_com_virgula:
+            for coluna in numericos:
+                if item.get(coluna) and ',' in item[coluna]:
+                    item[coluna] = item[coluna].replace('.', '').replace(',', '.')
+        itens.append(item)
+
+    linhas, erros = lote.valida_itens(itens, colunas, obrigatorios, numericos)
+    invalidos = {erro['indice']: erro['erro'] for erro in erros}
+    validas = []
+    valores = iter(linhas)
+    for indice, (numero, registro) in enumerate(bloco):
+        if indice in invalidos:
+            rejeitos.grava(numero, registro, invalidos[indice])
+            continue
+        linha = next(valores)
+        erro = _confere_referencias(linha, colunas, existentes)
+        if erro:
+            rejeitos.grava(numero, registro, erro)
+            continue
+        validas.append((numero, registro, linha))
+    return validas
+
+
+def _confere_referencias(linha, colunas, existentes):
+    # Ids de referência só como inteiros literais: "3.7" seria arredondado pelo MySQL para
+    # outro id, e "nan" ou "inf" (aceitos como números pela validação) não são ids
+    for coluna, ids in existentes.items():
+        valor = linha[colunas.index(coluna)]
+        if valor is None:
+            continue
+        if not _ID_REFERENCIA.match(str(valor)):
+            return f'{coluna} deve ser um número inteiro.'
+        if int(valor) not in ids:
+            return f'{coluna} não encontrado.'
+    return None
+
+
+def _grava(conn, cursor, tabela, colunas, validas, rejeitos):
+    # Um lote, uma transação; se o INSERT multi-linha falhar, as linhas são gravadas uma a uma
+    # (no InnoDB um comando que falha não desfaz os anteriores da transação) e as que falharem são rejeitadas
+    if not validas:
+        return 0
+    try:
+        lote.insere_em_lotes(cursor, tabela, colunas, [linha for _, _, linha in validas])
+        conn.commit()
+        return len(validas)
+    except Error:
+        conn.rollback()
+
+    gravadas = 0
+    for numero, registro, linha in validas:
+        try:
+            lote.insere_em_lotes(cursor, tabela, colunas, [linha])
+            gravadas += 1
+        except Error as err:
+            rejeitos.grava(numero, registro, f'Erro do banco: {err.msg}')
+    conn.commit()
+    return gravadas
+
+
+class Rejeitos:
+    """Arquivo CSV com as linhas rejeitadas, criado só na primeira rejeição."""
+
+    def __init__(self, cabecalho):
+        self.id = secrets.token_hex(8)
+        self.cabecalho = list(cabecalho) + ['linha', 'erro']
+        self.quantidade = 0
+        self._arquivo = None
+        self._escritor = None
+
+    def grava(self, numero, registro, erro):
+        if self._arquivo is None:
+            os.makedirs(DIRETORIO, exist_ok=True)
+            _limpa_antigos()
+            self._arquivo = open(caminho(self.id), 'w', encoding='utf-8-sig', newline='')
+            self._escritor = csv.writer(self._arquivo)
+            self._escritor.writerow(self.cabecalho)
+        valores = [registro.get(coluna) for coluna in self.cabecalho[:-2]]
+        self._escritor.writerow(valores + [numero, erro])
+        self.quantidade += 1
+
+    def fecha(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+def link(id_):
+    """Link de GET /produtos/import/<id>/rejeitos: absoluto para este host com IMPORTACAO_URL."""
+    return f'{URL_HOST}/produtos/import/{id_}/rejeitos'
+
+
+def caminho(id_):
+    """Caminho do arquivo de rejeitos de uma importação, ou None se o id não for válido."""
+    if not _ID.match(id_ or ''):
+        return None
+    return os.path.join(DIRETORIO, f'rejeitos-{id_}.csv')
+
+
+def _limpa_antigos():
+    limite = time.time() - RETENCAO
+    for nome in os.listdir(DIRETORIO):
+        try:
+            if os.path.getmtime(os.path.join(DIRETORIO, nome)) < limite:
+                os.remove(os.path.join(DIRETORIO, nome))
+        except OSError:
+            pass
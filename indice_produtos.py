@@ -0,0 +1,507 @@
+"""Busca de produtos por relevância e autocomplete, servidos de um índice em memória.
+
+Cada worker monta, em uma thread, um índice invertido do catálogo: para cada termo
+(palavra sem acentos e em minúsculas, sem stopwords) a lista ordenada dos ids dos
+produtos que o contêm no nome e outra para a descrição, em array('I'). A busca
+percorre os candidatos do termo mais raro e confere os demais por bisseção; o
+autocomplete acha os termos com o prefixo digitado por bisseção no vocabulário
+ordenado. Nenhuma das duas consultas vai ao banco.
+
+O índice acompanha as escritas pelo registro tbl_produtos_alteracoes, preenchido
+por gatilhos na mesma transação de cada INSERT, DELETE ou UPDATE de nome e descrição
+(migração 0008). A thread do worker lê as linhas novas quando a geração de
+tbl_produtos muda (escritas de qualquer worker do host) ou a cada
+BUSCA_SINCRONIZA_MAX segundos (escritas de outros hosts) e recarrega só os produtos
+alterados. Até a primeira montagem terminar, as rotas respondem 503.
+
+Configuração:
+    BUSCA_INTERVALO         segundos entre verificações da geração de tbl_produtos (0.1)
+    BUSCA_SINCRONIZA_MAX    segundos máximos sem ler o registro de alterações (5)
+    BUSCA_JANELA            segundos em que uma lacuna no registro ainda pode ser preenchida (60)
+    BUSCA_RETENCAO          segundos até uma alteração lida ser apagada do registro (3600)
+    BUSCA_MAX_CANDIDATOS    produtos examinados por busca, a partir do termo mais raro (50000)
+"""
+import functools
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+from flask import request
+from mysql.connector import Error
+
+import geracoes
+import paginacao
+
+
+INTERVALO = float(os.getenv('BUSCA_INTERVALO', 0.1))
+SINCRONIZA_MAX = float(os.getenv('BUSCA_SINCRONIZA_MAX', 5))
+JANELA = float(os.getenv('BUSCA_JANELA', 60))
+RETENCAO = int(os.getenv('BUSCA_RETENCAO', 3600))
+MAX_CANDIDATOS = int(os.getenv('BUSCA_MAX_CANDIDATOS', 50000))
+
+PESO_NOME = 3.0  # um termo no nome vale mais que na descrição
+TAMANHO_LOTE = 1000  # produtos lidos por vez na montagem e na sincronização
+MAX_SUGESTOES = 10
+
+STOPWORDS = frozenset(
+    'a o as os um uma uns umas de da do das dos e em na no nas nos com para por pra sem'.split()
+)
+
+_PALAVRA = re.compile(r'\w+')
+_ACENTOS = re.compile('[\u0300-\u036f]')
+
+logger = logging.getLogger('api.busca')
+
+
+def sem_acento(texto):
+    """Minúsculas e sem acentos: 'Pão de Açúcar' -> 'pao de acucar'."""
+    return _ACENTOS.sub('', unicodedata.normalize('NFD', texto.casefold()))
+
+
+@functools.lru_cache(maxsize=200000)
+def _termo(palavra):
+    # O vocabulário de um catálogo se repete muito: cada palavra é normalizada uma vez
+    termo = sem_acento(palavra)
+    return None if termo in STOPWORDS else termo
+
+
+def palavras(texto):
+    """[(termo, grafia)] das palavras do texto, sem stopwords; grafia é a palavra original em minúsculas."""
+    resultado = []
+    for palavra in _PALAVRA.findall((texto or '').casefold()):
+        termo = _termo(palavra)
+        if termo is not None:
+            resultado.append((termo, palavra))
+    return resultado
+
+
+def termos(texto):
+    return [termo for termo, _ in palavras(texto)]
+
+
+class _Indice:
+    """Listas invertidas e vocabulário; escritas só pela thread do worker (com o lock de IndiceProdutos)."""
+
+    def __init__(self):
+        self.nome = {}  # termo -> array('I') de ids em ordem
+        self.descricao = {}
+        self.docs = {}  # id -> (nome, termos do nome, termos da descrição)
+        self.grafias = {}  # termo -> palavra com acentos, para as sugestões
+        self.vocabulario = []  # termos do nome, em ordem (prefixos por bisseção)
+        self.sugestoes = {}  # prefixo -> sugestões já ordenadas; trocado por um novo depois de cada alteração
+
+    def carrega(self, linhas):
+        """Montagem: acrescenta linhas (id, nome, descricao) em ordem crescente de id.
+
+        Caminho rápido da carga inicial (sem bisseção nem vocabulário); finaliza()
+        converte as listas em arrays e ordena o vocabulário.
+        """
+        listas_nome = self.nome
+        listas_descricao = self.descricao
+        docs = self.docs
+        grafias = self.grafias
+        encontra = _PALAVRA.findall
+        termo_de = _termo
+        for produto_id, nome, descricao in linhas:
+            nome = nome or ''
+            termos_nome = {}
+            for palavra in encontra(nome.casefold()):
+                termo = termo_de(palavra)
+                if termo is not None and termo not in termos_nome:
+                    termos_nome[termo] = None
+                    if termo not in grafias:
+                        grafias[termo] = palavra
+                    ids = listas_nome.get(termo)
+                    if ids is None:
+                        listas_nome[termo] = [produto_id]
+                    else:
+                        ids.append(produto_id)
+            termos_descricao = {}
+            for palavra in encontra((descricao or '').casefold()):
+                termo = termo_de(palavra)
+                if termo is not None and termo not in termos_descricao:
+                    termos_descricao[termo] = None
+                    ids = listas_descricao.get(termo)
+                    if ids is None:
+                        listas_descricao[termo] = [produto_id]
+                    else:
+                        ids.append(produto_id)
+            docs[produto_id] = (nome, tuple(termos_nome), tuple(termos_descricao))
+
+    def adiciona(self, produto_id, nome, descricao):
+        if produto_id in self.docs:
+            self.remove(produto_id)
+        nome = nome or ''
+        do_nome = palavras(nome)
+        for termo, grafia in do_nome:
+            self.grafias.setdefault(termo, grafia)
+        termos_nome = tuple(dict.fromkeys(termo for termo, _ in do_nome))
+        termos_descricao = tuple(dict.fromkeys(termos(descricao)))
+        for termo in termos_nome:
+            self._inclui(self.nome, termo, produto_id, vocabulario=True)
+        for termo in termos_descricao:
+            self._inclui(self.descricao, termo, produto_id)
+        self.docs[produto_id] = (nome, termos_nome, termos_descricao)
+        self.sugestoes = {}
+
+    def remove(self, produto_id):
+        doc = self.docs.pop(produto_id, None)
+        if doc is None:
+            return
+        _, termos_nome, termos_descricao = doc
+        for termo in termos_nome:
+            self._exclui(self.nome, termo, produto_id, vocabulario=True)
+        for termo in termos_descricao:
+            self._exclui(self.descricao, termo, produto_id)
+        self.sugestoes = {}
+
+    def _inclui(self, listas, termo, produto_id, vocabulario=False):
+        ids = listas.get(termo)
+        if ids is None:
+            listas[termo] = array('I', (produto_id,))
+            if vocabulario:
+                insort(self.vocabulario, termo)
+        elif ids[-1] < produto_id:
+            ids.append(produto_id)  # produto novo: o maior id até agora
+        else:
+            ids.insert(bisect_left(ids, produto_id), produto_id)
+
+    def _exclui(self, listas, termo, produto_id, vocabulario=False):
+        ids = listas.get(termo)
+        if ids is None:
+            return
+        i = bisect_left(ids, produto_id)
+        if i < len(ids) and ids[i] == produto_id:
+            del ids[i]
+        if not ids:
+            del listas[termo]
+            if vocabulario:
+                j = bisect_left(self.vocabulario, termo)
+                if j < len(self.vocabulario) and self.vocabulario[j] == termo:
+                    del self.vocabulario[j]
+
+    def finaliza(self):
+        """Fim da montagem: listas em array('I') (4 bytes por id) e o vocabulário ordenado."""
+        for listas in (self.nome, self.descricao):
+            for termo, ids in listas.items():
+                listas[termo] = array('I', ids)
+        self.vocabulario = sorted(self.nome)
+
+    # Consultas (sem lock: cada operação sobre dict, list ou array é atômica sob o GIL)
+
+    def frequencia(self, termo):
+        return len(self.nome.get(termo, ())) + len(self.descricao.get(termo, ()))
+
+    def busca(self, texto, limite):
+        """[(id, nome, relevância)] dos produtos com todos os termos, nome pesando mais."""
+        consulta = sorted(set(termos(texto)), key=self.frequencia)
+        if not consulta or self.frequencia(consulta[0]) == 0:
+            return []
+        total = max(len(self.docs), 1)
+        pesos = [(termo, math.log(1 + total / max(self.frequencia(termo), 1))) for termo in consulta]
+
+        # Candidatos: os produtos do termo mais raro, primeiro os que o têm no nome
+        raro = consulta[0]
+        candidatos = _unicos(self.nome.get(raro, ()), self.descricao.get(raro, ()))
+        melhores = []
+        for examinados, produto_id in enumerate(candidatos):
+            if examinados >= MAX_CANDIDATOS:
+                break
+            pontos = 0.0
+            for termo, idf in pesos:
+                if _contem(self.nome.get(termo), produto_id):
+                    pontos += idf * PESO_NOME
+                elif _contem(self.descricao.get(termo), produto_id):
+                    pontos += idf
+                else:
+                    break
+            else:
+                item = (pontos, -produto_id)
+                if len(melhores) < limite:
+                    heapq.heappush(melhores, item)
+                elif item > melhores[0]:
+                    heapq.heapreplace(melhores, item)
+        resultado = []
+        for pontos, negativo in sorted(melhores, reverse=True):
+            doc = self.docs.get(-negativo)
+            if doc is not None:
+                resultado.append((-negativo, doc[0], round(pontos, 4)))
+        return resultado
+
+    def completa(self, prefixo):
+        """Termos do vocabulário que começam com `prefixo`, os mais frequentes primeiro."""
+        # Lido sem o lock da thread do worker, que troca o dicionário depois de cada alteração:
+        # guardando no dicionário obtido antes do cálculo, um resultado calculado durante uma
+        # alteração vai para o dicionário descartado, nunca para o novo
+        cache = self.sugestoes
+        sugestoes = cache.get(prefixo)
+        if sugestoes is None:
+            vocabulario = self.vocabulario
+            inicio = bisect_left(vocabulario, prefixo)
+            fim = bisect_left(vocabulario, prefixo + '\uffff')
+            faixa = vocabulario[inicio:fim]
+            sugestoes = heapq.nlargest(MAX_SUGESTOES, faixa, key=lambda termo: len(self.nome.get(termo, ())))
+            cache[prefixo] = sugestoes
+        return sugestoes
+
+    def autocompleta(self, texto, limite):
+        """(sugestões, [(id, nome)]): a última palavra é prefixo, as anteriores filtram os produtos."""
+        digitadas = _PALAVRA.findall(sem_acento(texto))
+        if not digitadas:
+            return [], []
+        anteriores = [termo for termo in digitadas[:-1] if termo not in STOPWORDS]
+        completados = self.completa(digitadas[-1])
+
+        produtos = []
+        vistos = set()
+        examinados = 0
+        for termo in completados:
+            for produto_id in self.nome.get(termo, ()):
+                examinados += 1
+                if len(produtos) >= limite or examinados > MAX_CANDIDATOS:
+                    break
+                if produto_id in vistos:
+                    continue
+                if all(_contem(self.nome.get(anterior), produto_id) for anterior in anteriores):
+                    vistos.add(produto_id)
+                    doc = self.docs.get(produto_id)
+                    if doc is not None:
+                        produtos.append((produto_id, doc[0]))
+            else:
+                continue
+            break
+        prefixo = ' '.join(self.grafias.get(termo, termo) for termo in anteriores)
+        sugestoes = [f'{prefixo} {self.grafias.get(termo, termo)}'.strip() for termo in completados]
+        return sugestoes, produtos
+
+
+def _contem(ids, produto_id):
+    if not ids:
+        return False
+    i = bisect_left(ids, produto_id)
+    return i < len(ids) and ids[i] == produto_id
+
+
+def _unicos(primeiros, segundos):
+    for produto_id in primeiros:
+        yield produto_id
+    for produto_id in segundos:
+        if not _contem(primeiros, produto_id):
+            yield produto_id
+
+
+class IndiceProdutos:
+    """Índice de busca do worker: montagem em segundo plano e sincronização pelo registro de alterações."""
+
+    def __init__(self, tabela='tbl_produtos'):
+        self.tabela = tabela
+        self._indice = None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._pid = None
+        self._ultimo = 0  # maior seq já lido de tbl_produtos_alteracoes
+        self._lacunas = {}  # seq ainda não visto (transação em andamento) -> quando foi notado
+        self._geracao = None
+        self._sincronizado_em = 0.0
+        self._limpo_em = 0.0
+
+    @property
+    def pronto(self):
+        return self._indice is not None
+
+    def iniciar(self, connect_db):
+        """Monta o índice em uma thread deste processo, uma única vez por PID."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._indice = None
+            threading.Thread(target=self._executa, args=(connect_db,), name='busca-produtos', daemon=True).start()
+
+    def avisar(self):
+        """Antecipa a próxima sincronização deste worker (chamar depois do commit)."""
+        self._acordar.set()
+
+    def busca(self, texto, limite):
+        return self._indice.busca(texto, limite)
+
+    def autocompleta(self, texto, limite):
+        return self._indice.autocompleta(texto, limite)
+
+    def _executa(self, connect_db):
+        while self._indice is None:
+            try:
+                self.monta(connect_db)
+            except Error as err:
+                logger.error('Erro ao montar o índice de busca: %s', err)
+                time.sleep(5)
+        while True:
+            self._acordar.wait(INTERVALO)
+            self._acordar.clear()
+            geracao = geracoes.atual(self.tabela)
+            if geracao == self._geracao and time.monotonic() - self._sincronizado_em < SINCRONIZA_MAX:
+                continue
+            try:
+                self.sincroniza(connect_db, geracao)
+            except Error as err:
+                logger.error('Erro ao sincronizar o índice de busca: %s', err)
+                time.sleep(1)
+
+    def monta(self, connect_db):
+        """Lê o catálogo inteiro e troca o índice do worker pelo novo."""
+        inicio = time.perf_counter()
+        conn = connect_db()
+        if not conn:
+            raise Error('Falha na conexão com o banco de dados.')
+        try:
+            cursor = conn.cursor()
+            try:
+                # Recomeça o registro um pouco antes do fim: alterações ainda não confirmadas
+                # na hora da leitura são reaplicadas na primeira sincronização
+                cursor.execute(
+                    "SELECT COALESCE((SELECT MIN(seq) - 1 FROM tbl_produtos_alteracoes "
+                    "WHERE criado_em >= NOW() - INTERVAL %s SECOND), "
+                    "(SELECT MAX(seq) FROM tbl_produtos_alteracoes), 0)",
+                    (int(JANELA),),
+                )
+                ultimo = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+
+            indice = _Indice()
+            cursor = conn.cursor(buffered=False)
+            try:
+                cursor.execute("SELECT id, nome, descricao FROM tbl_produtos ORDER BY id")
+                while True:
+                    linhas = cursor.fetchmany(TAMANHO_LOTE)
+                    if not linhas:
+                        break
+                    indice.carrega(linhas)
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+        indice.finaliza()
+
+        with self._lock:
+            self._indice = indice
+            self._ultimo = ultimo
+            self._lacunas = {}
+            self._geracao = None  # força a primeira sincronização
+        logger.info('Índice de busca montado: %s produtos em %.1f s', len(indice.docs), time.perf_counter() - inicio)
+
+    def sincroniza(self, connect_db, geracao=None):
+        """Aplica ao índice as alterações registradas desde a última leitura."""
+        conn = connect_db()
+        if not conn:
+            raise Error('Falha na conexão com o banco de dados.')
+        try:
+            with self._lock:
+                alterados = self._le_registro(conn)
+                if alterados:
+                    self._recarrega(conn, sorted(alterados))
+                self._geracao = geracao
+                self._sincronizado_em = time.monotonic()
+            if time.monotonic() - self._limpo_em > RETENCAO / 10:
+                self._limpa(conn)
+        finally:
+            conn.close()
+
+    def _le_registro(self, conn):
+        # Lacunas na sequência são transações ainda não confirmadas (ou desfeitas):
+        # continuam sendo pedidas até aparecerem ou até passar BUSCA_JANELA
+        agora = time.monotonic()
+        self._lacunas = {seq: desde for seq, desde in self._lacunas.items() if agora - desde < JANELA}
+        sql = "SELECT seq, produto_id FROM tbl_produtos_alteracoes WHERE seq > %s"
+        valores = [self._ultimo]
+        if self._lacunas:
+            pendentes = sorted(self._lacunas)[:TAMANHO_LOTE]
+            sql += f" OR seq IN ({', '.join(['%s'] * len(pendentes))})"
+            valores.extend(pendentes)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql + " ORDER BY seq", valores)
+            linhas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        alterados = set()
+        for seq, produto_id in linhas:
+            alterados.add(produto_id)
+            if self._lacunas.pop(seq, None) is None and seq > self._ultimo:
+                for faltando in range(self._ultimo + 1, seq):
+                    self._lacunas[faltando] = agora
+                self._ultimo = seq
+        return alterados
+
+    def _recarrega(self, conn, ids):
+        indice = self._indice
+        cursor = conn.cursor()
+        try:
+            for inicio in range(0, len(ids), TAMANHO_LOTE):
+                lote = ids[inicio:inicio + TAMANHO_LOTE]
+                cursor.execute(
+                    f"SELECT id, nome, descricao FROM tbl_produtos WHERE id IN ({', '.join(['%s'] * len(lote))})",
+                    lote,
+                )
+                existentes = {linha[0]: linha for linha in cursor.fetchall()}
+                for produto_id in lote:
+                    linha = existentes.get(produto_id)
+                    if linha is None:
+                        indice.remove(produto_id)
+                    else:
+                        indice.adiciona(*linha)
+        finally:
+            cursor.close()
+
+    def _limpa(self, conn):
+        # Qualquer worker apaga o que todos já leram há muito tempo
+        self._limpo_em = time.monotonic()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "DELETE FROM tbl_produtos_alteracoes WHERE criado_em < NOW() - INTERVAL %s SECOND LIMIT 10000",
+                (RETENCAO,),
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+produtos = IndiceProdutos()
+
+EM_CONSTRUCAO = ({'erro': 'Índice de busca em construção; tente novamente.'}, 503, {'Retry-After': '5'})
+
+
+def parametros(nome, args=None):
+    """(texto, limite) de uma rota de busca: ?<nome>= obrigatório e ?limit=."""
+    args = request.args if args is None else args
+    texto = (args.get(nome) or '').strip()
+    if not texto:
+        raise paginacao.ParametroInvalido(f'O parâmetro {nome} é obrigatório.')
+    return texto, paginacao.limite(args)
+
+
+def resposta_busca(texto, limite):
+    """GET /produtos/busca: os produtos mais relevantes para o texto."""
+    return {'q': texto, 'produtos': [
+        {'id': produto_id, 'nome': nome, 'relevancia': relevancia}
+        for produto_id, nome, relevancia in produtos.busca(texto, limite)
+    ]}
+
+
+def resposta_autocomplete(texto, limite):
+    """GET /produtos/autocomplete: termos que completam o texto e produtos com eles no nome."""
+    sugestoes, encontrados = produtos.autocompleta(texto, limite)
+    return {'prefix': texto, 'sugestoes': sugestoes, 'produtos': [
+        {'id': produto_id, 'nome': nome} for produto_id, nome in encontrados
+    ]}
@@ -0,0 +1,151 @@
+"""Logs estruturados (uma linha JSON por evento) sem bloquear as requisições.
+
+A thread da requisição só decide a amostragem, anexa o request id e coloca o
+registro em uma fila em memória; formatação, redação de campos sensíveis e a
+escrita em stdout acontecem em uma thread de fundo. Se a fila encher (stdout
+travado), registros são descartados e contados em vez de segurar a requisição.
+
+Configuração:
+    LOG_NIVEL        nível mínimo (INFO)
+    LOG_AMOSTRAGEM   taxa por rota, ex.: "post_pedido=1,post_produto=0.1,*=0.5" (padrão 1)
+    LOG_FILA_MAX     tamanho máximo da fila em memória (10000)
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context, request
+
+
+CAMPOS_SENSIVEIS = frozenset({'senha', 'password', 'token', 'authorization', 'ssl_ca', 'cpf'})
+REDIGIDO = '***'
+
+FILA_MAX = int(os.getenv('LOG_FILA_MAX', 10000))
+
+logger = logging.getLogger('api')
+
+
+def _le_amostragem(texto):
+    taxas = {}
+    for parte in filter(None, (p.strip() for p in texto.split(','))):
+        rota, _, taxa = parte.partition('=')
+        taxas[rota.strip()] = float(taxa)
+    return taxas
+
+
+_amostragem = _le_amostragem(os.getenv('LOG_AMOSTRAGEM', ''))
+_taxa_padrao = _amostragem.pop('*', 1.0)
+
+
+def redige(valor):
+    """Substitui os valores de campos sensíveis, inclusive em dicionários aninhados."""
+    if isinstance(valor, dict):
+        return {
+            chave: REDIGIDO if str(chave).lower() in CAMPOS_SENSIVEIS else redige(item)
+            for chave, item in valor.items()
+        }
+    if isinstance(valor, (list, tuple)):
+        return [redige(item) for item in valor]
+    return valor
+
+
+class FormatoJSON(logging.Formatter):
+    """Formata o registro como uma linha JSON (executado na thread de fundo)."""
+
+    def format(self, record):
+        linha = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'rota': getattr(record, 'rota', None),
+        }
+        campos = getattr(record, 'campos', None)
+        if campos:
+            linha.update(redige(campos))
+        if record.exc_info:
+            linha['exc'] = self.formatException(record.exc_info)
+        return json.dumps(linha, default=str, ensure_ascii=False)
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloqueia e reinicia a thread de escrita após um fork."""
+
+    def __init__(self, destino):
+        super().__init__(queue.Queue(FILA_MAX))
+        self.destino = destino
+        self.descartados = 0
+        self._pid = None
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _garante_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(FILA_MAX)
+                self._listener = logging.handlers.QueueListener(self.queue, self.destino)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # A formatação fica para a thread de fundo; só copiamos o contexto da requisição
+        return record
+
+    def enqueue(self, record):
+        self._garante_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def emit(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.rota = request.endpoint
+        self.enqueue(record)
+
+
+def configurar(app):
+    """Liga os logs estruturados e o request id às requisições do app."""
+    if not any(isinstance(handler, HandlerFila) for handler in logger.handlers):
+        destino = logging.StreamHandler(sys.stdout)
+        destino.setFormatter(FormatoJSON())
+        logger.addHandler(HandlerFila(destino))
+        logger.setLevel(os.getenv('LOG_NIVEL', 'INFO'))
+        logger.propagate = False
+
+    @app.before_request
+    def define_request_id():
+        # Reaproveita o id enviado pelo proxy/cliente para correlacionar os logs
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def devolve_request_id(resp):
+        if 'request_id' in g:
+            resp.headers['X-Request-ID'] = g.request_id
+        return resp
+
+
+def amostrado():
+    """Decide se o evento da rota atual entra na amostra (LOG_AMOSTRAGEM)."""
+    rota = request.endpoint if has_request_context() else None
+    taxa = _amostragem.get(rota, _taxa_padrao)
+    return taxa >= 1.0 or random.random() < taxa
+
+
+def sql(comando, valores, colunas):
+    """Registra um comando SQL executado; valores de colunas sensíveis são redigidos."""
+    if not logger.isEnabledFor(logging.INFO) or not amostrado():
+        return
+    # O dicionário é montado aqui (barato), mas a redação e o JSON ficam para a thread de fundo
+    logger.info('sql', extra={'campos': {'sql': comando, 'valores': dict(zip(colunas, valores))}})
@@ -0,0 +1,136 @@
+import os
+
+from flask import request
+from mysql.connector import Error
+
+
+# Linhas por comando INSERT multi-linha e máximo de itens aceitos por requisição
+TAMANHO_LOTE = int(os.getenv('BULK_TAMANHO_LOTE', 1000))
+MAX_ITENS = int(os.getenv('BULK_MAX_ITENS', 50000))
+
+
+def valida_itens(itens, colunas, obrigatorios, numericos=(), unicos=()):
+    """Valida todos os itens antes de tocar no banco.
+
+    Retorna (linhas, erros): as tuplas de valores na ordem de `colunas` e a lista de
+    erros por item ({"indice", "erro"}). Valores repetidos em colunas únicas dentro
+    do próprio lote também são rejeitados aqui, em vez de derrubar a transação.
+    """
+    linhas = []
+    erros = []
+    vistos = {coluna: {} for coluna in unicos}
+
+    for indice, item in enumerate(itens):
+        if not isinstance(item, dict):
+            erros.append({'indice': indice, 'erro': 'Cada item deve ser um objeto JSON.'})
+            continue
+
+        faltando = [campo for campo in obrigatorios if item.get(campo) in (None, '')]
+        if faltando:
+            erros.append({'indice': indice, 'erro': f"Campos obrigatórios ausentes: {', '.join(faltando)}."})
+            continue
+
+        invalidos = [campo for campo in numericos
+                     if item.get(campo) is not None and not _numero(item.get(campo))]
+        if invalidos:
+            erros.append({'indice': indice, 'erro': f"Campos devem ser numéricos: {', '.join(invalidos)}."})
+            continue
+
+        repetido = None
+        for coluna in unicos:
+            if item[coluna] in vistos[coluna]:
+                repetido = f"{coluna} repetido no item {vistos[coluna][item[coluna]]}."
+                break
+        if repetido:
+            erros.append({'indice': indice, 'erro': repetido})
+            continue
+        for coluna in unicos:
+            vistos[coluna][item[coluna]] = indice
+
+        linhas.append(tuple(item.get(coluna) for coluna in colunas))
+
+    return linhas, erros
+
+
+def insere_em_lotes(cursor, tabela, colunas, linhas, tamanho_lote=TAMANHO_LOTE):
+    """Insere as linhas com comandos INSERT multi-linha e retorna os ids gerados.
+
+    Não faz commit. Dentro de um único INSERT com número de linhas conhecido o InnoDB
+    reserva ids consecutivos, então os ids saem de lastrowid (o primeiro do lote).
+    """
+    ids = []
+    marcadores = '(' + ', '.join(['%s'] * len(colunas)) + ')'
+    prefixo = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES "
+
+    for inicio in range(0, len(linhas), tamanho_lote):
+        bloco = linhas[inicio:inicio + tamanho_lote]
+        sql = prefixo + ', '.join([marcadores] * len(bloco))
+        cursor.execute(sql, [valor for linha in bloco for valor in linha])
+        primeiro_id = cursor.lastrowid
+        ids.extend(range(primeiro_id, primeiro_id + len(bloco)))
+
+    return ids
+
+
+def insere_requisicao(connect_db, tabela, colunas, obrigatorios, numericos=(), unicos=(), apos_commit=None,
+                      converte=None, max_itens=MAX_ITENS):
+    """Trata um POST /<recurso>/bulk: valida o array inteiro e insere tudo em uma transação.
+
+    Se algum item for inválido nada é gravado e a resposta (400) traz o erro de cada
+    item; caso contrário a resposta (201) traz o id gerado para cada item.
+    `apos_commit` é chamado depois do commit (por exemplo, para invalidar caches);
+    `converte` recebe as linhas validadas e devolve as que serão gravadas (ex.: hash de senhas);
+    `max_itens` limita o tamanho do array (padrão BULK_MAX_ITENS).
+    """
+    return insere_itens(
+        connect_db, request.get_json(silent=True), tabela, colunas, obrigatorios, numericos, unicos, apos_commit,
+        converte, max_itens,
+    )
+
+
+def insere_itens(connect_db, itens, tabela, colunas, obrigatorios, numericos=(), unicos=(), apos_commit=None,
+                 converte=None, max_itens=MAX_ITENS):
+    """insere_requisicao() com o corpo já lido; retorna (resposta, status)."""
+    if not isinstance(itens, list) or not itens:
+        return {'erro': 'O corpo da requisição deve ser um array JSON não vazio.'}, 400
+    if len(itens) > max_itens:
+        return {'erro': f'No máximo {max_itens} itens por requisição.'}, 400
+
+    linhas, erros = valida_itens(itens, colunas, obrigatorios, numericos, unicos)
+    if erros:
+        return {'erro': 'Itens inválidos; nenhum registro foi inserido.', 'resultados': erros}, 400
+    if converte:
+        linhas = converte(linhas)
+
+    conn = connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+
+    cursor = conn.cursor()
+    try:
+        ids = insere_em_lotes(cursor, tabela, colunas, linhas)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        return {'erro': 'Erro ao inserir registros; nenhum registro foi inserido.', 'message': str(err)}, 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    if apos_commit:
+        apos_commit()
+
+    resultados = [{'indice': indice, 'id': novo_id} for indice, novo_id in enumerate(ids)]
+    return {'inseridos': len(ids), 'resultados': resultados}, 201
+
+
+def _numero(valor):
+    if isinstance(valor, bool):
+        return False
+    if isinstance(valor, (int, float)):
+        return True
+    try:
+        float(valor)
+    except (TypeError, ValueError):
+        return False
+    return True
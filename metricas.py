@@ -0,0 +1,134 @@
+"""Métricas no formato do Prometheus, expostas em /metrics.
+
+Todas as rotas do app são medidas pelos hooks de requisição: contagem por status,
+histograma de latência e o tempo de cada requisição dividido em fases:
+
+    conexao     espera + checkout no pool de conexões (connect_db)
+    consulta    execute() + leitura das linhas (cursores.CursorMedido)
+    mapeamento  conversão das linhas em dicionários de resposta
+    json        codificação da resposta em JSON (ProvedorJSONMedido, sobre serializacao)
+
+Com vários workers do gunicorn, defina PROMETHEUS_MULTIPROC_DIR (o gunicorn.conf.py
+do projeto já faz isso): cada processo grava as métricas em arquivos mapeados
+nesse diretório e /metrics soma os valores de todos os workers.
+"""
+import contextlib
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+import cursores
+import serializacao
+
+
+FASES = ('conexao', 'consulta', 'mapeamento', 'json')
+
+REQUISICOES = Counter(
+    'http_requisicoes_total', 'Requisições HTTP atendidas.', ['rota', 'metodo', 'status'],
+)
+LATENCIA = Histogram(
+    'http_latencia_segundos', 'Latência das requisições HTTP.', ['rota', 'metodo'],
+)
+TEMPO_FASE = Histogram(
+    'http_fase_segundos', 'Tempo gasto em cada fase da requisição.', ['rota', 'fase'],
+)
+
+
+def acumula(fase, segundos):
+    """Soma `segundos` à fase na requisição atual (ignorado fora de requisições)."""
+    if has_request_context():
+        fases = g.get('_fases')
+        if fases is not None:
+            fases[fase] = fases.get(fase, 0.0) + segundos
+
+
+@contextlib.contextmanager
+def fase(nome):
+    """Mede o bloco e acumula o tempo na fase `nome` da requisição atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        acumula(nome, time.perf_counter() - inicio)
+
+
+def _observa_consulta(sql, parametros, duracao, linhas, cursor):
+    acumula('consulta', duracao)
+
+
+class CodificacaoMedida(serializacao.CodificacaoRapida):
+    """serializacao.CodificacaoRapida que acumula o tempo de codificação na fase 'json'.
+
+    acumula é a função da requisição atual do framework (a deste módulo, no Flask).
+    """
+
+    acumula = staticmethod(acumula)
+
+    def codifica(self, obj):
+        inicio = time.perf_counter()
+        try:
+            return super().codifica(obj)
+        finally:
+            self.acumula('json', time.perf_counter() - inicio)
+
+
+class ProvedorJSONMedido(CodificacaoMedida, serializacao.ProvedorJSON):
+    """Provedor JSON do app que mede o tempo de codificação das respostas."""
+
+
+def registra(rota, metodo, status, duracao, fases):
+    """Registra uma requisição atendida: contagem, latência e o tempo de cada fase."""
+    REQUISICOES.labels(rota, metodo, str(status)).inc()
+    LATENCIA.labels(rota, metodo).observe(duracao)
+    for nome, segundos in fases.items():
+        TEMPO_FASE.labels(rota, nome).observe(segundos)
+
+
+def exposicao():
+    """Corpo de GET /metrics (todos os workers com PROMETHEUS_MULTIPROC_DIR) e o seu Content-Type."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
+
+
+def rota(regra):
+    """Rótulo da rota: o molde (/produtos/<int:produto_id>), para não criar uma série por id."""
+    return regra.rule if regra is not None else 'desconhecida'
+
+
+def configurar(app):
+    """Instrumenta todas as rotas do app e registra GET /metrics."""
+    app.json = ProvedorJSONMedido(app)
+    cursores.observadores.append(_observa_consulta)
+
+    @app.before_request
+    def inicia_medicao():
+        g._inicio = time.perf_counter()
+        g._fases = {}
+
+    @app.after_request
+    def guarda_status(resp):
+        g._status = resp.status_code
+        return resp
+
+    @app.teardown_request
+    def registra_medicao(exc):
+        # Executado depois que a resposta foi enviada (inclusive respostas em streaming)
+        inicio = g.get('_inicio')
+        if inicio is None:
+            return
+        status = 500 if exc is not None else g.get('_status', 500)
+        registra(rota(request.url_rule), request.method, status, time.perf_counter() - inicio, g.get('_fases', {}))
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metricas():
+        corpo, tipo = exposicao()
+        return Response(corpo, mimetype=tipo)
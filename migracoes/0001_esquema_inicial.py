@@ -0,0 +1,60 @@
+# Tabelas do desafio. IF NOT EXISTS permite adotar um banco criado antes das migrações.
+
+UP = [
+    """
+    CREATE TABLE IF NOT EXISTS tbl_clientes (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        cpf VARCHAR(14) NOT NULL,
+        senha VARCHAR(255) NOT NULL,
+        UNIQUE KEY uq_clientes_email (email),
+        UNIQUE KEY uq_clientes_cpf (cpf)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_fornecedores (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        cnpj VARCHAR(18) NOT NULL,
+        UNIQUE KEY uq_fornecedores_email (email),
+        UNIQUE KEY uq_fornecedores_cnpj (cnpj)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_produtos (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        nome VARCHAR(255) NOT NULL,
+        descricao TEXT,
+        preco DECIMAL(10, 2) NOT NULL,
+        qtd_em_estoque INT NOT NULL DEFAULT 0,
+        fornecedor_id INT NOT NULL,
+        custo_no_fornecedor DECIMAL(10, 2) NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_carrinho (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        produto_id INT NOT NULL,
+        quantidade INT NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tbl_pedidos (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        cliente_id INT NOT NULL,
+        carrinho_id INT NOT NULL,
+        data_hora DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        status ENUM('pendente', 'aprovado', 'cancelado', 'entregue') NOT NULL DEFAULT 'pendente'
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS tbl_pedidos",
+    "DROP TABLE IF EXISTS tbl_carrinho",
+    "DROP TABLE IF EXISTS tbl_produtos",
+    "DROP TABLE IF EXISTS tbl_fornecedores",
+    "DROP TABLE IF EXISTS tbl_clientes",
+]
@@ -0,0 +1,43 @@
+# Chaves estrangeiras e os índices secundários usados pelas consultas da API.
+# Os índices de tbl_produtos e tbl_pedidos são os declarados em filtros.ESPECIFICACOES.
+
+UP = [
+    # Listagem por faixa de preço e produtos de um fornecedor (também atende a FK)
+    "CREATE INDEX idx_produtos_preco ON tbl_produtos (preco)",
+    "CREATE INDEX idx_produtos_fornecedor_preco ON tbl_produtos (fornecedor_id, preco)",
+    """
+    ALTER TABLE tbl_produtos
+        ADD CONSTRAINT fk_produtos_fornecedor FOREIGN KEY (fornecedor_id) REFERENCES tbl_fornecedores (id)
+    """,
+
+    "CREATE INDEX idx_carrinho_produto ON tbl_carrinho (produto_id)",
+    """
+    ALTER TABLE tbl_carrinho
+        ADD CONSTRAINT fk_carrinho_produto FOREIGN KEY (produto_id) REFERENCES tbl_produtos (id)
+    """,
+
+    # GET /pedidos/cliente/<id> e o JOIN de GET /carrinhos/cliente/<id>
+    "CREATE INDEX idx_pedidos_cliente_data ON tbl_pedidos (cliente_id, data_hora)",
+    # Filtro por status e por período em GET /pedidos
+    "CREATE INDEX idx_pedidos_status_data ON tbl_pedidos (status, data_hora)",
+    "CREATE INDEX idx_pedidos_data ON tbl_pedidos (data_hora)",
+    "CREATE INDEX idx_pedidos_carrinho ON tbl_pedidos (carrinho_id)",
+    """
+    ALTER TABLE tbl_pedidos
+        ADD CONSTRAINT fk_pedidos_cliente FOREIGN KEY (cliente_id) REFERENCES tbl_clientes (id),
+        ADD CONSTRAINT fk_pedidos_carrinho FOREIGN KEY (carrinho_id) REFERENCES tbl_carrinho (id)
+    """,
+]
+
+DOWN = [
+    "ALTER TABLE tbl_pedidos DROP FOREIGN KEY fk_pedidos_cliente, DROP FOREIGN KEY fk_pedidos_carrinho",
+    "DROP INDEX idx_pedidos_carrinho ON tbl_pedidos",
+    "DROP INDEX idx_pedidos_data ON tbl_pedidos",
+    "DROP INDEX idx_pedidos_status_data ON tbl_pedidos",
+    "DROP INDEX idx_pedidos_cliente_data ON tbl_pedidos",
+    "ALTER TABLE tbl_carrinho DROP FOREIGN KEY fk_carrinho_produto",
+    "DROP INDEX idx_carrinho_produto ON tbl_carrinho",
+    "ALTER TABLE tbl_produtos DROP FOREIGN KEY fk_produtos_fornecedor",
+    "DROP INDEX idx_produtos_fornecedor_preco ON tbl_produtos",
+    "DROP INDEX idx_produtos_preco ON tbl_produtos",
+]
@@ -0,0 +1,25 @@
+# Reservas de estoque feitas pelos pedidos; liberadas (devolvidas ao estoque) no cancelamento.
+
+UP = [
+    """
+    CREATE TABLE tbl_reservas_estoque (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        pedido_id INT NOT NULL,
+        produto_id INT NOT NULL,
+        quantidade INT NOT NULL,
+        criada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        liberada_em DATETIME NULL,
+        KEY idx_reservas_pedido (pedido_id, liberada_em),
+        KEY idx_reservas_produto (produto_id),
+        CONSTRAINT fk_reservas_pedido FOREIGN KEY (pedido_id) REFERENCES tbl_pedidos (id) ON DELETE CASCADE,
+        CONSTRAINT fk_reservas_produto FOREIGN KEY (produto_id) REFERENCES tbl_produtos (id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    # O estoque nunca pode ficar negativo, nem por uma escrita fora da API (MySQL 8.0.16+)
+    "ALTER TABLE tbl_produtos ADD CONSTRAINT chk_produtos_estoque CHECK (qtd_em_estoque >= 0)",
+]
+
+DOWN = [
+    "ALTER TABLE tbl_produtos DROP CHECK chk_produtos_estoque",
+    "DROP TABLE IF EXISTS tbl_reservas_estoque",
+]
@@ -0,0 +1,22 @@
+# Outbox de eventos: gravado na mesma transação da escrita e entregue pela fila de jobs.
+
+UP = [
+    """
+    CREATE TABLE tbl_outbox (
+        id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        tipo VARCHAR(64) NOT NULL,
+        payload JSON NOT NULL,
+        status ENUM('pendente', 'processando', 'entregue', 'falhou') NOT NULL DEFAULT 'pendente',
+        tentativas INT NOT NULL DEFAULT 0,
+        proxima_tentativa DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        ultimo_erro TEXT NULL,
+        criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_outbox_fila (status, proxima_tentativa)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS tbl_outbox",
+]
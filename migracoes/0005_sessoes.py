@@ -0,0 +1,19 @@
+# Sessões de login: o token assinado carrega o id da sessão; logout grava revogada_em.
+
+UP = [
+    """
+    CREATE TABLE tbl_sessoes (
+        id CHAR(32) NOT NULL PRIMARY KEY,
+        cliente_id INT NOT NULL,
+        criada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        expira_em DATETIME NOT NULL,
+        revogada_em DATETIME NULL,
+        KEY idx_sessoes_cliente (cliente_id),
+        CONSTRAINT fk_sessoes_cliente FOREIGN KEY (cliente_id) REFERENCES tbl_clientes (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS tbl_sessoes",
+]
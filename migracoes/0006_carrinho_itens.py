@@ -0,0 +1,30 @@
+# Itens do carrinho: um carrinho passa a ter vários produtos, um por linha de tbl_carrinho_itens.
+# A chave primária (carrinho_id, produto_id) atende a leitura dos itens de um carrinho, já em
+# ordem de produto, e o upsert em lote. produto_id e quantidade de tbl_carrinho ficam como o
+# item de um carrinho criado pela API antiga e passam a aceitar NULL.
+
+UP = [
+    """
+    CREATE TABLE tbl_carrinho_itens (
+        carrinho_id INT NOT NULL,
+        produto_id INT NOT NULL,
+        quantidade INT NOT NULL,
+        PRIMARY KEY (carrinho_id, produto_id),
+        KEY idx_carrinho_itens_produto (produto_id),
+        CONSTRAINT fk_carrinho_itens_carrinho FOREIGN KEY (carrinho_id) REFERENCES tbl_carrinho (id) ON DELETE CASCADE,
+        CONSTRAINT fk_carrinho_itens_produto FOREIGN KEY (produto_id) REFERENCES tbl_produtos (id),
+        CONSTRAINT chk_carrinho_itens_quantidade CHECK (quantidade > 0)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    INSERT INTO tbl_carrinho_itens (carrinho_id, produto_id, quantidade)
+    SELECT id, produto_id, quantidade FROM tbl_carrinho WHERE quantidade > 0
+    """,
+    "ALTER TABLE tbl_carrinho MODIFY produto_id INT NULL, MODIFY quantidade INT NULL",
+]
+
+DOWN = [
+    # Falha se houver carrinhos criados só com itens (produto_id NULL)
+    "ALTER TABLE tbl_carrinho MODIFY produto_id INT NOT NULL, MODIFY quantidade INT NOT NULL",
+    "DROP TABLE IF EXISTS tbl_carrinho_itens",
+]
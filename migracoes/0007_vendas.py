@@ -0,0 +1,69 @@
+# Vendas consolidadas por dia, mantidas pelas escritas de pedidos (ver vendas.py).
+# tbl_vendas_pedidos guarda o que cada pedido aprovado ou entregue somou, para que o
+# estorno (cancelamento, volta a pendente, DELETE) subtraia exatamente os mesmos valores.
+# O backfill consolida os pedidos já aprovados ou entregues com os preços atuais.
+
+UP = [
+    """
+    CREATE TABLE tbl_vendas_pedidos (
+        pedido_id INT NOT NULL,
+        produto_id INT NOT NULL,
+        fornecedor_id INT NOT NULL,
+        dia DATE NOT NULL,
+        quantidade INT NOT NULL,
+        receita DECIMAL(14, 2) NOT NULL,
+        custo DECIMAL(14, 2) NOT NULL,
+        PRIMARY KEY (pedido_id, produto_id),
+        CONSTRAINT fk_vendas_pedidos_pedido FOREIGN KEY (pedido_id) REFERENCES tbl_pedidos (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE tbl_vendas_produto_dia (
+        produto_id INT NOT NULL,
+        dia DATE NOT NULL,
+        fornecedor_id INT NOT NULL,
+        quantidade BIGINT NOT NULL,
+        receita DECIMAL(16, 2) NOT NULL,
+        custo DECIMAL(16, 2) NOT NULL,
+        PRIMARY KEY (produto_id, dia),
+        KEY idx_vendas_produto_dia_dia (dia),
+        KEY idx_vendas_produto_dia_fornecedor (fornecedor_id, dia)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE tbl_vendas_fornecedor_dia (
+        fornecedor_id INT NOT NULL,
+        dia DATE NOT NULL,
+        quantidade BIGINT NOT NULL,
+        receita DECIMAL(16, 2) NOT NULL,
+        custo DECIMAL(16, 2) NOT NULL,
+        PRIMARY KEY (fornecedor_id, dia),
+        KEY idx_vendas_fornecedor_dia_dia (dia)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    INSERT INTO tbl_vendas_pedidos (pedido_id, produto_id, fornecedor_id, dia, quantidade, receita, custo)
+    SELECT pe.id, i.produto_id, p.fornecedor_id, DATE(pe.data_hora), i.quantidade,
+           i.quantidade * p.preco, i.quantidade * p.custo_no_fornecedor
+    FROM tbl_pedidos pe
+    JOIN tbl_carrinho_itens i ON i.carrinho_id = pe.carrinho_id
+    JOIN tbl_produtos p ON p.id = i.produto_id
+    WHERE pe.status IN ('aprovado', 'entregue')
+    """,
+    """
+    INSERT INTO tbl_vendas_produto_dia (produto_id, dia, fornecedor_id, quantidade, receita, custo)
+    SELECT produto_id, dia, MAX(fornecedor_id), SUM(quantidade), SUM(receita), SUM(custo)
+    FROM tbl_vendas_pedidos GROUP BY produto_id, dia
+    """,
+    """
+    INSERT INTO tbl_vendas_fornecedor_dia (fornecedor_id, dia, quantidade, receita, custo)
+    SELECT fornecedor_id, dia, SUM(quantidade), SUM(receita), SUM(custo)
+    FROM tbl_vendas_pedidos GROUP BY fornecedor_id, dia
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS tbl_vendas_fornecedor_dia",
+    "DROP TABLE IF EXISTS tbl_vendas_produto_dia",
+    "DROP TABLE IF EXISTS tbl_vendas_pedidos",
+]
@@ -0,0 +1,42 @@
+# Registro das alterações de produtos que afetam a busca (ver indice_produtos.py).
+# Os gatilhos gravam o id do produto a cada INSERT, DELETE ou UPDATE de nome/descrição, na
+# mesma transação do comando, qualquer que seja o caminho da escrita (rotas, bulk, cargas em
+# massa). Os índices de busca dos workers leem as linhas novas e recarregam só esses produtos.
+# Linhas antigas são apagadas pelos próprios workers (BUSCA_RETENCAO).
+# Custo: um INSERT de uma linha a mais por produto gravado, inclusive em cada linha de um
+# bulk ou de POST /produtos/import (ver o README).
+
+UP = [
+    """
+    CREATE TABLE tbl_produtos_alteracoes (
+        seq BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        produto_id INT NOT NULL,
+        criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_produtos_alteracoes_criado_em (criado_em)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TRIGGER trg_produtos_busca_insere AFTER INSERT ON tbl_produtos FOR EACH ROW
+        INSERT INTO tbl_produtos_alteracoes (produto_id) VALUES (NEW.id)
+    """,
+    """
+    CREATE TRIGGER trg_produtos_busca_atualiza AFTER UPDATE ON tbl_produtos FOR EACH ROW
+    BEGIN
+        -- Baixas de estoque e mudanças de preço não alteram a busca
+        IF NOT (NEW.nome <=> OLD.nome AND NEW.descricao <=> OLD.descricao) THEN
+            INSERT INTO tbl_produtos_alteracoes (produto_id) VALUES (NEW.id);
+        END IF;
+    END
+    """,
+    """
+    CREATE TRIGGER trg_produtos_busca_remove AFTER DELETE ON tbl_produtos FOR EACH ROW
+        INSERT INTO tbl_produtos_alteracoes (produto_id) VALUES (OLD.id)
+    """,
+]
+
+DOWN = [
+    "DROP TRIGGER IF EXISTS trg_produtos_busca_remove",
+    "DROP TRIGGER IF EXISTS trg_produtos_busca_atualiza",
+    "DROP TRIGGER IF EXISTS trg_produtos_busca_insere",
+    "DROP TABLE IF EXISTS tbl_produtos_alteracoes",
+]
@@ -0,0 +1,27 @@
+# Chaves de idempotência (cabeçalho Idempotency-Key) das rotas POST (ver idempotencia.py).
+# Uma linha por escopo (rota e cliente) e chave: status NULL enquanto a primeira requisição
+# executa; depois, o status, o tipo e o corpo da resposta, repetidos para as retentativas até
+# expira_em. dono identifica a requisição que reservou a chave (trocado quando outra a assume).
+# A chave é comparada byte a byte (ascii_bin). Linhas expiradas são apagadas pelos workers.
+
+UP = [
+    """
+    CREATE TABLE tbl_idempotencia (
+        escopo VARCHAR(128) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+        chave VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+        impressao CHAR(64) CHARACTER SET ascii NOT NULL,
+        dono CHAR(32) CHARACTER SET ascii NOT NULL,
+        status SMALLINT NULL,
+        tipo VARCHAR(100) NULL,
+        corpo MEDIUMBLOB NULL,
+        criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        expira_em DATETIME NOT NULL,
+        PRIMARY KEY (escopo, chave),
+        KEY idx_idempotencia_expira_em (expira_em)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+DOWN = [
+    "DROP TABLE IF EXISTS tbl_idempotencia",
+]
@@ -0,0 +1,89 @@
+"""Migrações versionadas do esquema do banco.
+
+Cada migração é um módulo `NNNN_descricao.py` neste pacote com duas listas de
+comandos SQL: UP (aplicar) e DOWN (reverter). As versões aplicadas ficam
+registradas na tabela schema_migrations. Use `python migrar.py` para executá-las.
+
+Comandos DDL no MySQL fazem commit implícito, então uma migração que falhe no meio
+não é desfeita automaticamente; por isso cada comando deve ser pequeno e os DOWN
+devem desfazer exatamente o que o UP criou.
+"""
+import importlib
+import os
+import re
+
+
+_PADRAO = re.compile(r'^(\d{4})_\w+\.py$')
+
+SQL_TABELA_CONTROLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    versao VARCHAR(255) NOT NULL PRIMARY KEY,
+    aplicada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def disponiveis():
+    """Lista (versão, módulo) de todas as migrações do pacote, em ordem."""
+    diretorio = os.path.dirname(__file__)
+    nomes = sorted(nome for nome in os.listdir(diretorio) if _PADRAO.match(nome))
+    return [(nome[:-3], importlib.import_module(f'{__name__}.{nome[:-3]}')) for nome in nomes]
+
+
+def aplicadas(conn):
+    """Retorna o conjunto de versões já aplicadas no banco."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_TABELA_CONTROLE)
+        cursor.execute("SELECT versao FROM schema_migrations")
+        return {versao for (versao,) in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def aplicar(conn, ate=None):
+    """Aplica as migrações pendentes (até a versão `ate`, se informada)."""
+    feitas = aplicadas(conn)
+    executadas = []
+    cursor = conn.cursor()
+    try:
+        for versao, modulo in disponiveis():
+            if versao in feitas:
+                continue
+            for comando in modulo.UP:
+                cursor.execute(comando)
+            cursor.execute("INSERT INTO schema_migrations (versao) VALUES (%s)", (versao,))
+            conn.commit()
+            executadas.append(versao)
+            if ate and versao.startswith(ate):
+                break
+    finally:
+        cursor.close()
+    return executadas
+
+
+def reverter(conn, passos=1):
+    """Reverte as `passos` últimas migrações aplicadas."""
+    feitas = aplicadas(conn)
+    revertidas = []
+    cursor = conn.cursor()
+    try:
+        for versao, modulo in reversed(disponiveis()):
+            if len(revertidas) >= passos:
+                break
+            if versao not in feitas:
+                continue
+            for comando in modulo.DOWN:
+                cursor.execute(comando)
+            cursor.execute("DELETE FROM schema_migrations WHERE versao = %s", (versao,))
+            conn.commit()
+            revertidas.append(versao)
+    finally:
+        cursor.close()
+    return revertidas
+
+
+def status(conn):
+    """Retorna [(versão, aplicada?)] para todas as migrações conhecidas."""
+    feitas = aplicadas(conn)
+    return [(versao, versao in feitas) for versao, _ in disponiveis()]
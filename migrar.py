@@ -0,0 +1,45 @@
+"""Executa as migrações do banco.
+
+Uso:
+    python migrar.py apply [versao]   aplica as migrações pendentes (até a versão, se informada)
+    python migrar.py rollback [n]     reverte as n últimas migrações aplicadas (padrão 1)
+    python migrar.py status           lista as migrações e se já foram aplicadas
+"""
+import sys
+
+import mysql.connector
+
+import migracoes
+from configuracao import config
+
+
+def main(argv):
+    if not argv or argv[0] not in ('apply', 'rollback', 'status'):
+        print(__doc__)
+        return 2
+
+    conn = mysql.connector.connect(**config)
+    try:
+        comando = argv[0]
+        if comando == 'apply':
+            executadas = migracoes.aplicar(conn, ate=argv[1] if len(argv) > 1 else None)
+            for versao in executadas:
+                print(f"Aplicada: {versao}")
+            if not executadas:
+                print("Nenhuma migração pendente.")
+        elif comando == 'rollback':
+            revertidas = migracoes.reverter(conn, passos=int(argv[1]) if len(argv) > 1 else 1)
+            for versao in revertidas:
+                print(f"Revertida: {versao}")
+            if not revertidas:
+                print("Nenhuma migração para reverter.")
+        else:
+            for versao, aplicada in migracoes.status(conn):
+                print(f"[{'x' if aplicada else ' '}] {versao}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,74 @@
+"""Notificações por e-mail dos pedidos, entregues pela fila de jobs (fila.py)."""
+import os
+import smtplib
+from email.message import EmailMessage
+
+import fila
+
+
+PEDIDO_CRIADO = 'pedido_criado'
+PEDIDO_STATUS = 'pedido_status'
+
+SMTP_HOST = os.getenv('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 25))
+SMTP_USUARIO = os.getenv('SMTP_USUARIO')
+SMTP_SENHA = os.getenv('SMTP_SENHA')
+SMTP_TLS = os.getenv('SMTP_TLS', '0') == '1'
+SMTP_REMETENTE = os.getenv('SMTP_REMETENTE', 'pedidos@localhost')
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 10))
+
+
+def _cliente(connect_db, cliente_id):
+    conn = connect_db()
+    if not conn:
+        raise RuntimeError('Falha na conexão com o banco de dados.')
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT nome, email FROM tbl_clientes WHERE id = %s", (cliente_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def envia_email(destinatario, assunto, corpo):
+    """Envia um e-mail pelo servidor SMTP configurado (SMTP_*)."""
+    mensagem = EmailMessage()
+    mensagem['From'] = SMTP_REMETENTE
+    mensagem['To'] = destinatario
+    mensagem['Subject'] = assunto
+    mensagem.set_content(corpo)
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as smtp:
+        if SMTP_TLS:
+            smtp.starttls()
+        if SMTP_USUARIO:
+            smtp.login(SMTP_USUARIO, SMTP_SENHA)
+        smtp.send_message(mensagem)
+
+
+@fila.tarefa(PEDIDO_CRIADO)
+def notifica_pedido_criado(connect_db, payload):
+    cliente = _cliente(connect_db, payload['cliente_id'])
+    if not cliente:
+        return  # Cliente removido: não há para quem enviar
+    nome, email = cliente
+    envia_email(
+        email,
+        f"Pedido {payload['pedido_id']} recebido",
+        f"Olá, {nome}!\n\nRecebemos o seu pedido {payload['pedido_id']} (status: {payload['status']}).\n",
+    )
+
+
+@fila.tarefa(PEDIDO_STATUS)
+def notifica_status_pedido(connect_db, payload):
+    cliente = _cliente(connect_db, payload['cliente_id'])
+    if not cliente:
+        return
+    nome, email = cliente
+    envia_email(
+        email,
+        f"Pedido {payload['pedido_id']}: {payload['status']}",
+        f"Olá, {nome}!\n\nO status do seu pedido {payload['pedido_id']} mudou de "
+        f"{payload['status_anterior']} para {payload['status']}.\n",
+    )
@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+import os
+
+from flask import request
+
+
+# Limites de página para as listagens
+LIMITE_PADRAO = int(os.getenv('PAGINA_LIMITE_PADRAO', 100))
+LIMITE_MAXIMO = int(os.getenv('PAGINA_LIMITE_MAXIMO', 1000))
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro de consulta inválido; as rotas respondem 400 com a mensagem."""
+
+
+def codifica_cursor(dados):
+    """Gera o cursor opaco (base64 de um JSON) devolvido em "next"."""
+    bruto = json.dumps(dados, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(bruto).rstrip(b'=').decode()
+
+
+def decodifica_cursor(cursor):
+    """Decodifica um cursor gerado por codifica_cursor()."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(bruto)
+    except (binascii.Error, ValueError):
+        raise ParametroInvalido('Cursor inválido.')
+    if not isinstance(dados, dict):
+        raise ParametroInvalido('Cursor inválido.')
+    return dados
+
+
+def limite(args=None):
+    """Lê ?limit= da requisição (ou de `args`, os parâmetros de outra requisição)."""
+    args = request.args if args is None else args
+    try:
+        valor = int(args.get('limit', LIMITE_PADRAO))
+    except ValueError:
+        raise ParametroInvalido('O parâmetro limit deve ser um número inteiro.')
+    if not 1 <= valor <= LIMITE_MAXIMO:
+        raise ParametroInvalido(f'O parâmetro limit deve estar entre 1 e {LIMITE_MAXIMO}.')
+    return valor
+
+
+def cursor_recebido(args=None):
+    """Retorna o conteúdo de ?cursor= (dicionário vazio na primeira página)."""
+    cursor = (request.args if args is None else args).get('cursor')
+    if not cursor:
+        return {}
+    dados = decodifica_cursor(cursor)
+    if not isinstance(dados.get('id'), int):
+        raise ParametroInvalido('Cursor inválido.')
+    return dados
+
+
+def parametros(args=None):
+    """Lê ?limit= e ?cursor= da requisição e retorna (limite, id do último item visto)."""
+    return limite(args), cursor_recebido(args).get('id', 0)
+
+
+def pagina(linhas, limite, chave='id', ordem=None):
+    """Corta as linhas buscadas com LIMIT limite + 1 e gera o cursor da próxima página.
+
+    A linha extra só indica que existe uma próxima página; o cursor aponta para a
+    última linha devolvida, então a página seguinte continua com WHERE id > cursor.
+    Com `ordem` = (parâmetro sort, coluna), o cursor também guarda o valor da coluna
+    de ordenação da última linha.
+    """
+    if len(linhas) <= limite:
+        return linhas, None
+    linhas = linhas[:limite]
+    dados = {'id': linhas[-1][chave]}
+    if ordem:
+        parametro, coluna = ordem
+        valor = linhas[-1][coluna]
+        dados['s'] = parametro
+        dados['v'] = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+    return linhas, codifica_cursor(dados)
@@ -0,0 +1,200 @@
+"""Carrinhos com vários itens: escritas em lote e o detalhe com o total.
+
+Os itens ficam em tbl_carrinho_itens, um por produto. Como em regras_pedidos, as
+escritas recebem o JSON já lido da requisição e retornam (resposta, status), e as
+rotas de app.py e de app_async.py (em uma thread) usam as mesmas regras.
+
+Um lote de itens é gravado com dois comandos (upsert dos itens e DELETE dos que
+vieram com quantidade 0), com o carrinho bloqueado: escritas concorrentes no mesmo
+carrinho acontecem em série e o número de round-trips não cresce com o lote.
+"""
+import os
+from decimal import Decimal
+
+from mysql.connector import Error, errorcode
+
+import geracoes
+import logs
+import lote
+import repositorios
+
+
+MAX_ITENS = int(os.getenv('CARRINHO_MAX_ITENS', 1000))
+
+# Item do detalhe a partir de uma linha de repositorios.carrinhos.detalhe()
+_item_json = repositorios.compila_mapeador(
+    [('Produto_ID', 3), ('Quantidade', 4), ('Nome', 5), ('Preco', 6)],
+)
+
+
+def valida_itens(itens, minimo=1):
+    """Retorna (itens, erro): [(produto_id, quantidade)] em ordem de produto, ou a resposta 400."""
+    if not isinstance(itens, list) or not itens:
+        return None, ({'erro': 'Os itens devem ser um array JSON não vazio.'}, 400)
+    if len(itens) > MAX_ITENS:
+        return None, ({'erro': f'No máximo {MAX_ITENS} itens por requisição.'}, 400)
+
+    linhas, erros = lote.valida_itens(
+        itens, ('produto_id', 'quantidade'), obrigatorios=('produto_id', 'quantidade'),
+        numericos=('produto_id', 'quantidade'), unicos=('produto_id',),
+    )
+    if not erros:
+        for indice, (produto_id, quantidade) in enumerate(linhas):
+            if not _inteiro(produto_id) or not _inteiro(quantidade) or int(quantidade) < minimo:
+                erros.append({
+                    'indice': indice,
+                    'erro': f'produto_id e quantidade devem ser inteiros, com quantidade a partir de {minimo}.',
+                })
+    if erros:
+        return None, ({'erro': 'Itens inválidos; nenhum item foi gravado.', 'resultados': erros}, 400)
+    return sorted((int(produto_id), int(quantidade)) for produto_id, quantidade in linhas), None
+
+
+def _item_legado(produto_id, quantidade):
+    """(item, erro): o item único da API antiga como (produto_id, quantidade) inteiros, ou a resposta 400.
+
+    O JSON pode trazer os números como strings ("2"), que o MySQL aceitava; a conversão
+    e o mínimo são os de valida_itens.
+    """
+    if not _inteiro(produto_id) or not _inteiro(quantidade) or int(quantidade) < 1:
+        return None, ({'erro': 'produto_id e quantidade devem ser inteiros, com quantidade a partir de 1.'}, 400)
+    return (int(produto_id), int(quantidade)), None
+
+
+def cria(connect_db, entrada_dados):
+    """POST /carrinhos: com "itens", um carrinho com vários produtos; sem, o carrinho de um item da API antiga."""
+    entrada_dados = entrada_dados or {}
+    if 'itens' in entrada_dados:
+        itens, erro = valida_itens(entrada_dados['itens'])
+        if erro:
+            return erro
+        values = (None, None)
+    else:
+        produto_id = entrada_dados.get('produto_id')
+        quantidade = entrada_dados.get('quantidade')
+        itens = []
+        if produto_id and quantidade:
+            item, erro = _item_legado(produto_id, quantidade)
+            if erro:
+                return erro
+            produto_id, quantidade = item
+            itens = [item]
+        values = (produto_id, quantidade)  # Na ordem de repositorios.carrinhos.gravaveis
+
+    conn = connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    cursor = conn.cursor()
+    try:
+        # Registra o comando no log estruturado (assíncrono, com a senha redigida)
+        logs.sql(repositorios.carrinhos.sql_insere, values, repositorios.carrinhos.gravaveis)
+        carrinho_id = repositorios.carrinhos.insere(conn, values)
+        repositorios.carrinhos.grava_itens(cursor, carrinho_id, itens)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        return _erro_escrita(err, 'Erro ao inserir carrinho')
+    finally:
+        cursor.close()
+        conn.close()
+    # Invalida as ETags de tbl_carrinho
+    geracoes.incrementa('tbl_carrinho')
+
+    if 'itens' in entrada_dados:
+        return {'id': carrinho_id, 'itens': [
+            {'produto_id': produto_id, 'quantidade': quantidade} for produto_id, quantidade in itens
+        ]}, 201
+    return {'id': carrinho_id, 'produto_id': values[0], 'quantidade': values[1]}, 201
+
+
+def atualiza(connect_db, carrinho_id, entrada_dados):
+    """PUT /carrinhos/<id> da API antiga: o carrinho passa a ter só o produto informado."""
+    produto_id = entrada_dados.get('produto_id')
+    quantidade = entrada_dados.get('quantidade')
+
+    # Validação básica dos dados
+    if not all([produto_id, quantidade]):
+        return {'erro': 'Todos os campos são obrigatórios.'}, 400
+    item, erro = _item_legado(produto_id, quantidade)
+    if erro:
+        return erro
+
+    def escrita(conn, cursor):
+        repositorios.carrinhos.atualiza(conn, carrinho_id, item)
+        repositorios.carrinhos.esvazia(conn, carrinho_id)
+        repositorios.carrinhos.grava_itens(cursor, carrinho_id, [item])
+
+    return _escreve(connect_db, carrinho_id, escrita, {'mensagem': 'carrinho atualizado com sucesso!'})
+
+
+def atualiza_itens(connect_db, carrinho_id, itens):
+    """PUT /carrinhos/<id>/itens: inclui ou altera os itens do array; quantidade 0 remove o item."""
+    if isinstance(itens, dict):
+        itens = itens.get('itens')
+    itens, erro = valida_itens(itens, minimo=0)
+    if erro:
+        return erro
+
+    removidos = sum(1 for _, quantidade in itens if quantidade == 0)
+
+    def escrita(conn, cursor):
+        repositorios.carrinhos.grava_itens(cursor, carrinho_id, itens)
+
+    return _escreve(connect_db, carrinho_id, escrita, {
+        'mensagem': 'Itens do carrinho atualizados.', 'gravados': len(itens) - removidos, 'removidos': removidos,
+    })
+
+
+def _escreve(connect_db, carrinho_id, escrita, resposta):
+    # Bloqueia o carrinho (404 se não existir), aplica a escrita e confirma
+    conn = connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+    cursor = conn.cursor()
+    try:
+        if not repositorios.carrinhos.bloqueia(conn, carrinho_id):
+            conn.rollback()
+            return {'erro': 'carrinho não encontrado.'}, 404
+        escrita(conn, cursor)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        return _erro_escrita(err, 'Erro ao atualizar carrinho')
+    finally:
+        cursor.close()
+        conn.close()
+    # Invalida as ETags de tbl_carrinho
+    geracoes.incrementa('tbl_carrinho')
+    return resposta, 200
+
+
+def _erro_escrita(err, mensagem):
+    if getattr(err, 'errno', None) == errorcode.ER_NO_REFERENCED_ROW_2:
+        return {'erro': 'Produto não encontrado.', 'message': str(err)}, 400
+    return {'erro': mensagem, 'message': str(err)}, 500
+
+
+def detalhe(linhas, cabecalho):
+    """GET /carrinhos/<id>: o cabeçalho (dict já formatado) com os itens, subtotais e o total.
+
+    `linhas` são as de repositorios.carrinhos.detalhe(), com o preço atual de cada produto.
+    """
+    itens = []
+    total = Decimal('0.00')
+    for linha in linhas:
+        if linha[3] is None:  # carrinho sem itens
+            continue
+        item = _item_json(linha)
+        item['Subtotal'] = item['Preco'] * item['Quantidade']
+        total += item['Subtotal']
+        itens.append(item)
+    cabecalho['Itens'] = itens
+    cabecalho['Total'] = total
+    return cabecalho
+
+
+def _inteiro(valor):
+    try:
+        return not isinstance(valor, bool) and int(valor) == float(valor)
+    except (TypeError, ValueError, OverflowError):
+        return False
@@ -0,0 +1,54 @@
+"""Regras dos bulk inserts (POST /<recurso>/bulk) e da importação de produtos.
+
+Cada dicionário são os argumentos de lote.insere_requisicao / lote.insere_itens (e de
+importacao.resposta, no caso de IMPORTA_PRODUTOS); os dois modos da API usam os mesmos.
+"""
+import functools
+
+import auth
+import cache_produtos
+import geracoes
+import indice_produtos
+
+
+def _hash_senhas(linhas):
+    # Troca a senha (última coluna de BULK_CLIENTES) pelo hash, no pool de hashes do bulk
+    hashes = auth.gera_hashes([linha[-1] for linha in linhas])
+    return [linha[:-1] + (senha,) for linha, senha in zip(linhas, hashes)]
+
+
+def produtos_alterados():
+    """Depois de uma escrita em tbl_produtos: cache de todos os workers e índice de busca deste."""
+    cache_produtos.produtos.invalidar()
+    indice_produtos.produtos.avisar()
+
+
+BULK_CLIENTES = dict(
+    tabela='tbl_clientes',
+    colunas=('nome', 'cpf', 'email', 'senha'),
+    obrigatorios=('nome', 'cpf', 'email', 'senha'),
+    unicos=('cpf', 'email'),
+    apos_commit=functools.partial(geracoes.incrementa, 'tbl_clientes'),
+    converte=_hash_senhas,
+    # Cada item custa um hash scrypt: limite bem menor que o dos outros bulks
+    max_itens=auth.BULK_MAX_ITENS,
+)
+
+BULK_FORNECEDORES = dict(
+    tabela='tbl_fornecedores',
+    colunas=('nome', 'cnpj', 'email'),
+    obrigatorios=('nome', 'cnpj', 'email'),
+    unicos=('cnpj', 'email'),
+    apos_commit=functools.partial(geracoes.incrementa, 'tbl_fornecedores'),
+)
+
+BULK_PRODUTOS = dict(
+    tabela='tbl_produtos',
+    colunas=('nome', 'qtd_em_estoque', 'descricao', 'preco', 'fornecedor_id', 'custo_no_fornecedor'),
+    obrigatorios=('nome', 'qtd_em_estoque', 'preco', 'fornecedor_id', 'custo_no_fornecedor'),
+    numericos=('qtd_em_estoque', 'preco', 'fornecedor_id', 'custo_no_fornecedor'),
+    apos_commit=produtos_alterados,
+)
+
+# POST /produtos/import: as regras do bulk, com os fornecedores conferidos antes do INSERT
+IMPORTA_PRODUTOS = dict(BULK_PRODUTOS, referencias={'fornecedor_id': 'tbl_fornecedores'})
@@ -0,0 +1,239 @@
+"""Escritas de pedidos: pedido, reservas de estoque e outbox na mesma transação.
+
+As funções recebem o JSON já lido da requisição e retornam (resposta, status), sem
+depender do Flask; as rotas de app.py e de app_async.py (em uma thread) usam as
+mesmas regras.
+"""
+from datetime import datetime
+
+from mysql.connector import Error
+
+import cache_produtos
+import estoque
+import fila
+import filtros
+import geracoes
+import idempotencia
+import logs
+import notificacoes
+import repositorios
+import vendas
+
+
+STATUS_INVALIDO = ({'erro': f"status deve ser um de: {', '.join(filtros.STATUS_PEDIDO)}."}, 400)
+
+
+def cria(connect_db, entrada_dados, reserva=None):
+    """POST /pedidos; reserva é a idempotencia.Reserva da Idempotency-Key, se a requisição tiver uma."""
+    success = False
+
+    cliente_id = entrada_dados.get('cliente_id')
+    carrinho_id = entrada_dados.get('carrinho_id')
+    data_hora = entrada_dados.get('data_hora') or datetime.now()
+    status = entrada_dados.get('status') or 'pendente'
+
+    # Fora do ENUM de tbl_pedidos.status o banco recusaria o INSERT
+    if status not in filtros.STATUS_PEDIDO:
+        return STATUS_INVALIDO
+
+    conn = connect_db()
+    pedido_id = None
+    status_erro = 500
+    if conn:
+        try:
+            cursor = conn.cursor()  # Cursor para as reservas de estoque e a outbox
+
+            # Itens do carrinho, lidos sem bloqueio antes de abrir as escritas
+            itens = estoque.itens_do_carrinho(cursor, carrinho_id)
+
+            values = (cliente_id, carrinho_id, data_hora, status)  # Dados a serem inseridos, na ordem de repositorios.pedidos.gravaveis
+
+            # Registra o comando no log estruturado (assíncrono, com a senha redigida)
+            logs.sql(repositorios.pedidos.sql_insere, values, repositorios.pedidos.gravaveis)
+            # Executa o INSERT (prepared statement da conexão) e obtém o ID do registro recém-inserido
+            pedido_id = repositorios.pedidos.insere(conn, values)
+
+            # Notificação gravada na outbox na mesma transação; o e-mail sai em segundo plano.
+            # Antes da baixa de estoque, para não prolongar o bloqueio das linhas dos produtos
+            fila.enfileirar(cursor, notificacoes.PEDIDO_CRIADO, {
+                'pedido_id': pedido_id, 'cliente_id': cliente_id, 'status': status,
+            })
+
+            # Reserva o estoque na mesma transação, no fim dela (ver estoque.py)
+            if status != 'cancelado':
+                estoque.reservar(cursor, pedido_id, itens)
+            # Pedido já aprovado ou entregue entra nas vendas consolidadas (depois da baixa, com os
+            # produtos já bloqueados por esta transação)
+            vendas.ajusta(cursor, pedido_id, None, status)
+
+            resp = {"id": pedido_id, "cliente_id": cliente_id, "data_hora": data_hora, "carrinho_id": carrinho_id, "status": status}
+            # Resposta da Idempotency-Key gravada na mesma transação: uma retentativa nunca
+            # executa de novo um pedido já confirmado (ver idempotencia.py)
+            if reserva is not None:
+                reserva.conclui(conn, resp, 201)
+
+            # Confirma a transação no banco de dados
+            conn.commit()
+            # Invalida as ETags de tbl_pedidos e o cache de produtos (o estoque mudou)
+            geracoes.incrementa('tbl_pedidos')
+            cache_produtos.produtos.invalidar()
+            fila.avisar()
+            success = True
+
+        except estoque.CarrinhoNaoEncontrado as err:
+            conn.rollback()
+            error = str(err)
+            status_erro = 400
+        except estoque.EstoqueInsuficiente as err:
+            # Nada foi gravado: o pedido e as reservas anteriores são desfeitos juntos
+            conn.rollback()
+            error = str(err)
+            status_erro = 409
+        except idempotencia.ReservaPerdida:
+            # Uma retentativa assumiu a chave (esta passou de IDEMPOTENCIA_TRAVA) e grava o pedido
+            conn.rollback()
+            return idempotencia.EM_EXECUCAO_RESP
+        except Error as err:
+            # Em caso de erro na inserção, desfaz a transação e guarda a mensagem de erro
+            conn.rollback()
+            error = str(err)
+        finally:
+            # Fecha o cursor e a conexão para liberar recursos
+            cursor.close()
+            conn.close()
+    else:
+        error = 'Falha na conexão com o banco de dados.'
+
+    if success:
+        return resp, 201
+    else:
+        resp = {"erro": "Erro ao inserir pedido", "message": error}
+        return resp, status_erro
+
+
+def atualiza(connect_db, pedido_id, entrada_dados):
+    """PUT /pedidos/<id>: troca de carrinho e cancelamento ajustam as reservas."""
+    cliente_id = entrada_dados.get('cliente_id')
+    carrinho_id = entrada_dados.get('carrinho_id')
+    data_hora = entrada_dados.get('data_hora')
+    status = entrada_dados.get('status')
+
+    # Validação básica dos dados
+    if not all([cliente_id, carrinho_id]):
+        return {'erro': 'ID do cliente e do carrinho sao obrigatorios'}, 400
+    if status is not None and status not in filtros.STATUS_PEDIDO:
+        return STATUS_INVALIDO
+
+    conn = connect_db()  # Conecta ao banco de dados
+    if conn:
+        cursor = conn.cursor()  # Cursor para as reservas de estoque e a outbox
+
+        try:
+            # Bloqueia o pedido para que cancelamentos concorrentes não liberem o estoque duas vezes
+            atual = repositorios.pedidos.bloqueia(conn, pedido_id)
+            if not atual:
+                conn.rollback()
+                return {'erro': 'pedido não encontrado.'}, 404
+            status_atual, carrinho_atual, data_hora_atual = atual
+            if status_atual == 'cancelado' and status not in (None, 'cancelado'):
+                conn.rollback()
+                return {'erro': 'Pedido cancelado não pode ser reativado.'}, 409
+
+            # status e data_hora omitidos mantêm os valores atuais (as colunas são NOT NULL)
+            status_novo = status if status is not None else status_atual
+            data_hora = data_hora if data_hora is not None else data_hora_atual
+            values = (cliente_id, carrinho_id, data_hora, status_novo)  # Na ordem de repositorios.pedidos.gravaveis
+            repositorios.pedidos.atualiza(conn, pedido_id, values)
+
+            # Outbox antes das escritas de estoque, para não prolongar o bloqueio dos produtos
+            if status is not None and status != status_atual:
+                fila.enfileirar(cursor, notificacoes.PEDIDO_STATUS, {
+                    'pedido_id': pedido_id, 'cliente_id': cliente_id,
+                    'status_anterior': status_atual, 'status': status,
+                })
+
+            if status == 'cancelado':
+                # Cancelamento: as reservas expiram e o estoque volta para os produtos
+                estoque.liberar(cursor, pedido_id)
+            elif carrinho_id != carrinho_atual and status_atual != 'cancelado':
+                # Troca de carrinho: devolve a reserva antiga e reserva os itens do novo carrinho
+                estoque.liberar(cursor, pedido_id)
+                estoque.reservar(cursor, pedido_id, estoque.itens_do_carrinho(cursor, carrinho_id))
+
+            # Vendas consolidadas: entra ou sai conforme o novo status; recontado se o carrinho ou o dia mudou
+            vendas.ajusta(
+                cursor, pedido_id, status_atual, status_novo,
+                recontar=carrinho_id != carrinho_atual or _dia(data_hora) != _dia(data_hora_atual),
+            )
+
+            conn.commit()
+            # Invalida as ETags de tbl_pedidos e o cache de produtos (o estoque pode ter mudado)
+            geracoes.incrementa('tbl_pedidos')
+            cache_produtos.produtos.invalidar()
+            fila.avisar()
+            # Retorna uma resposta de sucesso
+            return {'mensagem': 'pedido atualizado com sucesso!'}, 200
+        except estoque.CarrinhoNaoEncontrado as err:
+            conn.rollback()
+            return {'erro': str(err)}, 400
+        except estoque.EstoqueInsuficiente as err:
+            conn.rollback()
+            return {'erro': str(err)}, 409
+        except Error as err:
+            # Em caso de erro na atualização, retorna uma mensagem de erro
+            conn.rollback()
+            return {'erro': f'Erro ao atualizar pedido: {err}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+    else:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+
+
+def remove(connect_db, pedido_id):
+    """DELETE /pedidos/<id>: devolve as reservas ativas antes de apagar o pedido."""
+    conn = connect_db()  # Conecta ao banco de dados
+    if conn:
+        cursor = conn.cursor()  # Cursor para a liberação das reservas de estoque
+
+        try:
+            # Bloqueia o pedido: um cancelamento concorrente não estorna as vendas junto com este DELETE
+            atual = repositorios.pedidos.bloqueia(conn, pedido_id)
+            if atual:
+                vendas.ajusta(cursor, pedido_id, atual[0], None)
+            # Devolve ao estoque o que o pedido ainda tinha reservado antes de apagá-lo
+            liberadas = estoque.liberar(cursor, pedido_id)
+            # Remove o pedido pelo ID
+            removidos = repositorios.pedidos.remove(conn, pedido_id)
+            # Confirma a transação no banco de dados
+            conn.commit()
+            # Invalida as ETags de tbl_pedidos
+            geracoes.incrementa('tbl_pedidos')
+            if liberadas:
+                cache_produtos.produtos.invalidar()
+            # Verifica se alguma linha foi afetada (deletada)
+            if removidos:
+                return {'mensagem': 'pedido deletado com sucesso!'}, 200
+            else:
+                return {'error': 'pedido não encontrado.'}, 404
+
+        except Error as err:
+            # Em caso de erro na deleção, desfaz a transação e retorna a mensagem de erro
+            conn.rollback()
+            error = str(err)
+            return {'error': f'Erro ao deletar pedido: {error}'}, 500
+
+        finally:
+            # Fecha o cursor e a conexão para liberar recursos
+            cursor.close()
+            conn.close()
+
+
+def _dia(data_hora):
+    """Dia de uma data_hora do banco (datetime) ou da requisição (texto ISO); None se não der para ler."""
+    if isinstance(data_hora, datetime):
+        return data_hora.date()
+    try:
+        return datetime.fromisoformat(str(data_hora)).date()
+    except ValueError:
+        return None
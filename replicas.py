@@ -0,0 +1,246 @@
+"""Réplicas de leitura: as rotas GET leem de réplicas, as escritas vão para o primário.
+
+Um cliente que acabou de escrever recebe o cookie `primario` e, enquanto ele
+valer (DB_PRIMARIO_APOS_ESCRITA segundos), as suas leituras também vão para o
+primário: quem escreve sempre lê o que escreveu, mesmo com atraso de replicação.
+
+As rotas com ETag e cache (etag.condicional) também leem do primário enquanto uma
+das suas tabelas tiver mudado neste host há menos que o atraso aceito das réplicas
+(DB_REPLICA_ATRASO_MAX, ou DB_PRIMARIO_APOS_ESCRITA se não for verificado): a ETag
+e as entradas de cache levam a geração nova da tabela, e um corpo lido de uma
+réplica atrasada ficaria marcado como atual até a próxima escrita.
+
+Configuração:
+    DB_REPLICAS                 réplicas "host[:porta]" separadas por vírgula (vazio: só o primário)
+    DB_REPLICAS_ESTRATEGIA      round_robin (padrão) ou menos_carregada (menos conexões emprestadas)
+    DB_REPLICA_FALHAS           falhas seguidas que tiram a réplica de rotação (3)
+    DB_REPLICA_QUARENTENA       segundos fora de rotação antes de uma nova tentativa (30)
+    DB_REPLICA_ATRASO_MAX       atraso de replicação aceito, em segundos (vazio: não verifica)
+    DB_REPLICA_VERIFICACAO      intervalo da verificação de saúde em segundo plano (10)
+    DB_PRIMARIO_APOS_ESCRITA    segundos de leitura no primário depois de uma escrita (5)
+
+Usuário, senha, banco e SSL são os do primário. Cada réplica tem o seu PoolConexoes
+por processo, com as mesmas variáveis DB_POOL_*.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+import db_pool
+import geracoes
+
+
+ROUND_ROBIN = 'round_robin'
+MENOS_CARREGADA = 'menos_carregada'
+
+COOKIE = 'primario'
+JANELA_PRIMARIO = int(os.getenv('DB_PRIMARIO_APOS_ESCRITA', 5))
+_ATRASO_MAX = os.getenv('DB_REPLICA_ATRASO_MAX')
+# Segundos depois de uma escrita em que as rotas com ETag leem a tabela do primário
+# (o atraso das réplicas é medido em segundos inteiros)
+JANELA_ALTERACAO = max(float(_ATRASO_MAX), 1.0) if _ATRASO_MAX else float(JANELA_PRIMARIO)
+
+logger = logging.getLogger('api.replicas')
+
+
+class Replica:
+    """Pool de uma réplica e o seu estado de saúde."""
+
+    def __init__(self, config):
+        self.nome = f"{config['host']}:{config['port']}"
+        self.pool = db_pool.criar_pool(config)
+        self.falhas = 0  # falhas seguidas
+        self.fora_ate = 0.0  # time.monotonic() até quando fica fora de rotação
+        self.motivo = None
+        self.atraso = None
+
+
+class Roteador:
+    """Escolhe a réplica de cada leitura e tira de rotação as que falham ou atrasam."""
+
+    def __init__(self, config, hosts, estrategia=ROUND_ROBIN, max_falhas=3, quarentena=30.0,
+                 atraso_max=None, intervalo=10.0):
+        if estrategia not in (ROUND_ROBIN, MENOS_CARREGADA):
+            raise ValueError(f'Estratégia de réplicas desconhecida: {estrategia}')
+        self.replicas = [Replica(_config_replica(config, host)) for host in hosts]
+        self.estrategia = estrategia
+        self.max_falhas = max_falhas
+        self.quarentena = quarentena
+        self.atraso_max = atraso_max
+        self.intervalo = intervalo
+        self._proxima = itertools.count()
+        self._lock = threading.Lock()
+        self._verificador_pid = None
+        self._leituras_primario = 0
+
+    def obter(self):
+        """Conexão de uma réplica em rotação, ou None se nenhuma estiver disponível."""
+        self._inicia_verificacao()
+        for replica in self._candidatas():
+            try:
+                conn = replica.pool.obter()
+            except PoolError:
+                # Pool da réplica esgotado: não é falha do servidor, tenta a próxima
+                continue
+            except Error as err:
+                self._falhou(replica, str(err))
+                continue
+            replica.falhas = 0
+            return conn
+        with self._lock:
+            self._leituras_primario += 1
+        return None
+
+    def estatisticas(self):
+        agora = time.monotonic()
+        return {
+            'estrategia': self.estrategia,
+            'leituras_no_primario': self._leituras_primario,
+            'replicas': [{
+                'replica': replica.nome,
+                'em_rotacao': replica.fora_ate <= agora,
+                'falhas': replica.falhas,
+                'motivo': replica.motivo if replica.fora_ate > agora else None,
+                'atraso': replica.atraso,
+                'pool': replica.pool.estatisticas(),
+            } for replica in self.replicas],
+        }
+
+    def _candidatas(self):
+        agora = time.monotonic()
+        disponiveis = [replica for replica in self.replicas if replica.fora_ate <= agora]
+        if self.estrategia == MENOS_CARREGADA:
+            return sorted(disponiveis, key=lambda replica: replica.pool.emprestadas)
+        if not disponiveis:
+            return disponiveis
+        inicio = next(self._proxima) % len(disponiveis)
+        return disponiveis[inicio:] + disponiveis[:inicio]
+
+    def _falhou(self, replica, motivo):
+        with self._lock:
+            replica.falhas += 1
+            # Depois da quarentena basta uma falha para a réplica sair de novo
+            if replica.falhas >= self.max_falhas:
+                self._remove(replica, motivo)
+
+    def _remove(self, replica, motivo):
+        if replica.fora_ate <= time.monotonic():
+            logger.warning('Réplica %s fora de rotação: %s', replica.nome, motivo)
+        replica.fora_ate = time.monotonic() + self.quarentena
+        replica.motivo = motivo
+
+    def _inicia_verificacao(self):
+        # Uma thread por processo (os workers do gunicorn nascem por fork)
+        if not self.intervalo or self._verificador_pid == os.getpid():
+            return
+        with self._lock:
+            if self._verificador_pid == os.getpid():
+                return
+            self._verificador_pid = os.getpid()
+            threading.Thread(target=self._verifica_sempre, name='replicas', daemon=True).start()
+
+    def _verifica_sempre(self):
+        while True:
+            time.sleep(self.intervalo)
+            for replica in self.replicas:
+                self.verifica(replica)
+
+    def verifica(self, replica):
+        """Ping (validação do pool) e, com DB_REPLICA_ATRASO_MAX, o atraso de replicação."""
+        try:
+            conn = replica.pool.obter()
+        except PoolError:
+            return
+        except Error as err:
+            self._falhou(replica, str(err))
+            return
+        try:
+            if self.atraso_max is not None:
+                replica.atraso = _atraso(conn)
+                if replica.atraso is None or replica.atraso > self.atraso_max:
+                    with self._lock:
+                        self._remove(replica, f'atraso de replicação {replica.atraso}')
+                    return
+        except Error as err:
+            self._falhou(replica, str(err))
+            return
+        finally:
+            conn.close()
+        with self._lock:
+            # Saudável: volta para a rotação antes do fim da quarentena
+            if replica.fora_ate > time.monotonic():
+                logger.info('Réplica %s de volta à rotação', replica.nome)
+            replica.falhas = 0
+            replica.fora_ate = 0.0
+
+
+def _atraso(conn):
+    """Seconds_Behind_Source da réplica (None se a replicação estiver parada)."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute('SHOW REPLICA STATUS')
+        status = cursor.fetchone()
+    finally:
+        cursor.close()
+    return status.get('Seconds_Behind_Source') if status else None
+
+
+def _config_replica(config, host):
+    host, _, porta = host.strip().partition(':')
+    return dict(config, host=host, port=int(porta) if porta else config['port'])
+
+
+def fixado_no_primario():
+    """Indica se a requisição atual deve ler do primário (escrita, escrita recente do cliente ou da tabela)."""
+    if not has_request_context():
+        return True
+    return request.method not in ('GET', 'HEAD') or COOKIE in request.cookies or g.get('_ler_do_primario', False)
+
+
+def fixa_se_alterada(tabelas):
+    """Leva as leituras da requisição ao primário se uma das tabelas mudou há menos de JANELA_ALTERACAO."""
+    limite = time.time() - JANELA_ALTERACAO
+    if any(geracoes.alterado_em(tabela) > limite for tabela in tabelas):
+        g._ler_do_primario = True
+
+
+def configurar(app):
+    """Marca com o cookie `primario` os clientes que acabaram de escrever."""
+    @app.after_request
+    def fixa_primario(resp):
+        if JANELA_PRIMARIO > 0 and request.method not in ('GET', 'HEAD', 'OPTIONS') and resp.status_code < 400:
+            resp.set_cookie(COOKIE, '1', max_age=JANELA_PRIMARIO, httponly=True, samesite='Lax')
+        return resp
+
+
+_roteador = None
+_roteador_pid = None
+_roteador_lock = threading.Lock()
+
+
+def obter_roteador(config):
+    """Roteador de réplicas do processo atual, ou None se DB_REPLICAS estiver vazio."""
+    global _roteador, _roteador_pid
+    hosts = [host for host in os.getenv('DB_REPLICAS', '').split(',') if host.strip()]
+    if not hosts:
+        return None
+    pid = os.getpid()
+    if _roteador is None or _roteador_pid != pid:
+        with _roteador_lock:
+            if _roteador is None or _roteador_pid != pid:
+                _roteador = Roteador(
+                    config, hosts,
+                    estrategia=os.getenv('DB_REPLICAS_ESTRATEGIA', ROUND_ROBIN),
+                    max_falhas=int(os.getenv('DB_REPLICA_FALHAS', 3)),
+                    quarentena=float(os.getenv('DB_REPLICA_QUARENTENA', 30)),
+                    atraso_max=float(_ATRASO_MAX) if _ATRASO_MAX else None,
+                    intervalo=float(os.getenv('DB_REPLICA_VERIFICACAO', 10)),
+                )
+                _roteador_pid = pid
+    return _roteador
@@ -0,0 +1,288 @@
+"""Camada de acesso a dados: um repositório por tabela.
+
+Os comandos rodam como prepared statements do servidor, preparados uma vez por
+conexão do pool e reaproveitados nas requisições seguintes (ConexaoPooled.preparado).
+As linhas chegam como tuplas, na ordem das colunas pedidas, e viram dicionários de
+resposta por mapeadores compilados uma única vez por formato (mapeador(), formato()).
+"""
+import operator
+
+
+def compila_mapeador(campos):
+    """Gera uma função linha -> dict a partir de pares (chave da resposta, posição na tupla).
+
+    Chaves e posições são separadas uma vez; a cada linha, um itemgetter lê todas as
+    posições de uma vez e o dict é montado com zip, sem busca por nome.
+    """
+    campos = tuple(campos)
+    chaves = tuple(chave for chave, _ in campos)
+    posicoes = [posicao for _, posicao in campos]
+    if len(posicoes) == 1:
+        # itemgetter de uma posição devolve o valor, não uma tupla
+        chave, posicao = campos[0]
+        return lambda linha: {chave: linha[posicao]}
+    pega = operator.itemgetter(*posicoes) if posicoes else (lambda linha: ())
+    return lambda linha: dict(zip(chaves, pega(linha)))
+
+
+def _executa(conn, sql, valores=()):
+    """Executa no prepared statement da conexão; retorna (linhas, linhas afetadas, id inserido)."""
+    cursor = conn.preparado(sql, valores)
+    try:
+        linhas = cursor.fetchall() if cursor.description else None
+        return linhas, cursor.rowcount, cursor.lastrowid
+    finally:
+        cursor.libera()
+
+
+class Repositorio:
+    """Comandos de uma tabela com chave `id` e as colunas gravaveis dadas."""
+
+    def __init__(self, tabela, gravaveis):
+        self.tabela = tabela
+        self.gravaveis = tuple(gravaveis)
+        self.colunas = ('id',) + self.gravaveis
+        self._posicoes = {coluna: posicao for posicao, coluna in enumerate(self.colunas)}
+
+        # SELECTs com a lista de colunas em aberto ({lista}; {lista_tabela} qualificada pela tabela)
+        self._modelos = {
+            'busca': f"SELECT {{lista}} FROM {tabela} WHERE id = %s",
+            'pagina': f"SELECT {{lista}} FROM {tabela} WHERE id > %s ORDER BY id LIMIT %s",
+            'todos': f"SELECT {{lista}} FROM {tabela} WHERE id > %s ORDER BY id",
+        }
+        self._selects = {}
+        self.sql_busca = self.sql('busca')
+        self.sql_pagina = self.sql('pagina')
+        self.sql_todos = self.sql('todos')
+        self.sql_insere = (
+            f"INSERT INTO {tabela} ({', '.join(self.gravaveis)}) "
+            f"VALUES ({', '.join(['%s'] * len(self.gravaveis))})"
+        )
+        self.sql_atualiza = (
+            f"UPDATE {tabela} SET {', '.join(f'{coluna} = %s' for coluna in self.gravaveis)} WHERE id = %s"
+        )
+        self.sql_remove = f"DELETE FROM {tabela} WHERE id = %s"
+
+    def sql(self, nome, colunas=None):
+        """SELECT `nome` listando `colunas` (padrão: todas), montado uma vez por combinação."""
+        colunas = self.colunas if colunas is None else colunas
+        sql = self._selects.get((nome, colunas))
+        if sql is None:
+            sql = self._selects[nome, colunas] = self._modelos[nome].format(
+                lista=', '.join(colunas),
+                lista_tabela=', '.join(f'{self.tabela}.{coluna}' for coluna in colunas),
+            )
+        return sql
+
+    def mapeador(self, **campos):
+        """Mapeador de linhas deste repositório: mapeador(ID='id', Nome='nome', ...)."""
+        return compila_mapeador((chave, self._posicoes[coluna]) for chave, coluna in campos.items())
+
+    def formato(self, restritos=(), **campos):
+        """Formato de resposta com projeção de campos (ver Formato)."""
+        return Formato(self, campos, restritos)
+
+    def busca(self, conn, id_, colunas=None):
+        """Linha com o id dado, ou None."""
+        linhas, _, _ = _executa(conn, self.sql('busca', colunas), (id_,))
+        return linhas[0] if linhas else None
+
+    def pagina(self, conn, apos_id, limite, colunas=None):
+        """Até limite + 1 linhas depois de `apos_id` (a linha extra indica a próxima página)."""
+        linhas, _, _ = _executa(conn, self.sql('pagina', colunas), (apos_id, limite + 1))
+        return linhas
+
+    def consulta(self, conn, sql, valores=()):
+        """Linhas de um SELECT próprio da rota (ex.: montado por filtros.monta_consulta)."""
+        linhas, _, _ = _executa(conn, sql, tuple(valores))
+        return linhas
+
+    def insere(self, conn, valores):
+        """Insere uma linha com `valores` na ordem de `gravaveis`; retorna o id gerado."""
+        _, _, id_ = _executa(conn, self.sql_insere, tuple(valores))
+        return id_
+
+    def atualiza(self, conn, id_, valores):
+        """Atualiza todas as colunas gravaveis; retorna o número de linhas alteradas."""
+        _, alteradas, _ = _executa(conn, self.sql_atualiza, tuple(valores) + (id_,))
+        return alteradas
+
+    def remove(self, conn, id_):
+        _, removidas, _ = _executa(conn, self.sql_remove, (id_,))
+        return removidas
+
+
+class Formato:
+    """Formato JSON das linhas de um repositório (chave da resposta -> coluna).
+
+    Chamado com uma linha de todas as colunas, devolve o dicionário completo. Para
+    respostas com só alguns campos (?fields=, ver campos.py), projecao() dá as colunas
+    a selecionar e o mapeador dessas linhas, compilados uma vez por combinação.
+    """
+
+    def __init__(self, repositorio, campos, restritos=()):
+        self.repositorio = repositorio
+        self.campos = dict(campos)
+        # Campos que não podem ser pedidos em ?fields= (ex.: senha)
+        self.permitidos = tuple(chave for chave, coluna in self.campos.items() if coluna not in restritos)
+        self.nomes = {chave.lower(): chave for chave in self.permitidos}
+        self._completo = repositorio.mapeador(**self.campos)
+        self._projecoes = {}
+
+    def __call__(self, linha):
+        return self._completo(linha)
+
+    def projecao(self, chaves=None):
+        """Projecao com as chaves dadas (na ordem do formato), ou com todas se `chaves` for None."""
+        if chaves is None:
+            return Projecao(self.repositorio.colunas, self._completo, tuple(self.campos))
+        chaves = tuple(chave for chave in self.campos if chave in chaves)
+        projecao = self._projecoes.get(chaves)
+        if projecao is None:
+            # O id sempre vem primeiro: é a chave do cursor de paginação
+            colunas = ('id',) + tuple(dict.fromkeys(
+                self.campos[chave] for chave in chaves if self.campos[chave] != 'id'
+            ))
+            mapeia = compila_mapeador((chave, colunas.index(self.campos[chave])) for chave in chaves)
+            projecao = self._projecoes[chaves] = Projecao(colunas, mapeia, chaves)
+        return projecao
+
+
+class Projecao:
+    """Colunas do SELECT, mapeador das linhas com essas colunas e chaves da resposta."""
+
+    __slots__ = ('colunas', 'mapeia', 'chaves')
+
+    def __init__(self, colunas, mapeia, chaves):
+        self.colunas = colunas
+        self.mapeia = mapeia
+        self.chaves = chaves
+
+    def filtra(self, registro):
+        """Só as chaves da projeção de um dicionário já mapeado (ex.: vindo do cache)."""
+        return {chave: registro[chave] for chave in self.chaves}
+
+
+class RepositorioClientes(Repositorio):
+
+    def __init__(self):
+        super().__init__('tbl_clientes', ('nome', 'cpf', 'email', 'senha'))
+        self.sql_por_email = "SELECT id, senha FROM tbl_clientes WHERE email = %s"
+        self.sql_troca_senha = "UPDATE tbl_clientes SET senha = %s WHERE id = %s"
+
+    def por_email(self, conn, email):
+        """(id, senha) do cliente com o e-mail dado, ou None (login)."""
+        linhas = self.consulta(conn, self.sql_por_email, (email,))
+        return linhas[0] if linhas else None
+
+    def troca_senha(self, conn, id_, senha):
+        _, alteradas, _ = _executa(conn, self.sql_troca_senha, (senha, id_))
+        return alteradas
+
+
+class RepositorioSessoes(Repositorio):
+    """Sessões de login; o id (CHAR(32)) é gerado pela aplicação."""
+
+    def __init__(self):
+        super().__init__('tbl_sessoes', ('cliente_id', 'expira_em', 'revogada_em'))
+        self.sql_cria = "INSERT INTO tbl_sessoes (id, cliente_id, expira_em) VALUES (%s, %s, %s)"
+        self.sql_revoga = "UPDATE tbl_sessoes SET revogada_em = NOW() WHERE id = %s AND revogada_em IS NULL"
+
+    def cria(self, conn, id_, cliente_id, expira_em):
+        _executa(conn, self.sql_cria, (id_, cliente_id, expira_em))
+
+    def revoga(self, conn, id_):
+        _, alteradas, _ = _executa(conn, self.sql_revoga, (id_,))
+        return alteradas
+
+
+class RepositorioCarrinhos(Repositorio):
+
+    def __init__(self):
+        super().__init__('tbl_carrinho', ('produto_id', 'quantidade'))
+        self._modelos['por_cliente'] = (
+            "SELECT {lista_tabela} "
+            "FROM tbl_carrinho "
+            "INNER JOIN tbl_pedidos ON tbl_carrinho.id = tbl_pedidos.carrinho_id "
+            "WHERE tbl_pedidos.cliente_id = %s"
+        )
+        self.sql_por_cliente = self.sql('por_cliente')
+
+        # Cabeçalho e itens com nome e preço em uma consulta: a chave primária de tbl_carrinho_itens
+        # (carrinho_id, produto_id) entrega os itens já em ordem e cada produto sai pela chave primária
+        self.sql_detalhe = (
+            "SELECT tbl_carrinho.id, tbl_carrinho.produto_id, tbl_carrinho.quantidade, "
+            "i.produto_id, i.quantidade, p.nome, p.preco "
+            "FROM tbl_carrinho "
+            "LEFT JOIN tbl_carrinho_itens i ON i.carrinho_id = tbl_carrinho.id "
+            "LEFT JOIN tbl_produtos p ON p.id = i.produto_id "
+            "WHERE tbl_carrinho.id = %s ORDER BY i.produto_id"
+        )
+        self.sql_bloqueia = "SELECT id FROM tbl_carrinho WHERE id = %s FOR UPDATE"
+        self.sql_esvazia = "DELETE FROM tbl_carrinho_itens WHERE carrinho_id = %s"
+
+    def por_cliente(self, conn, cliente_id, colunas=None):
+        """Carrinhos usados nos pedidos do cliente."""
+        return self.consulta(conn, self.sql('por_cliente', colunas), (cliente_id,))
+
+    def detalhe(self, conn, id_):
+        """Linhas (cabeçalho + item) do carrinho; uma linha com item NULL se estiver vazio, [] se não existir."""
+        return self.consulta(conn, self.sql_detalhe, (id_,))
+
+    def bloqueia(self, conn, id_):
+        """Indica se o carrinho existe, bloqueando-o até o fim da transação (escritas de itens em série)."""
+        return bool(self.consulta(conn, self.sql_bloqueia, (id_,)))
+
+    def esvazia(self, conn, id_):
+        _executa(conn, self.sql_esvazia, (id_,))
+
+    def grava_itens(self, cursor, id_, itens):
+        """Upsert de [(produto_id, quantidade)] no carrinho; quantidade 0 remove o item (não faz commit).
+
+        Um comando para todos os itens gravados e outro para os removidos, qualquer que
+        seja o tamanho do lote. Usa o cursor comum: cada tamanho de lote seria um
+        prepared statement diferente no cache da conexão.
+        """
+        gravar = [(produto_id, quantidade) for produto_id, quantidade in itens if quantidade > 0]
+        remover = [produto_id for produto_id, quantidade in itens if quantidade == 0]
+        if gravar:
+            cursor.execute(
+                "INSERT INTO tbl_carrinho_itens (carrinho_id, produto_id, quantidade) VALUES "
+                + ', '.join(['(%s, %s, %s)'] * len(gravar))
+                + " ON DUPLICATE KEY UPDATE quantidade = VALUES(quantidade)",
+                [valor for produto_id, quantidade in gravar for valor in (id_, produto_id, quantidade)],
+            )
+        if remover:
+            cursor.execute(
+                f"DELETE FROM tbl_carrinho_itens WHERE carrinho_id = %s "
+                f"AND produto_id IN ({', '.join(['%s'] * len(remover))})",
+                [id_] + remover,
+            )
+
+
+class RepositorioPedidos(Repositorio):
+
+    def __init__(self):
+        super().__init__('tbl_pedidos', ('cliente_id', 'carrinho_id', 'data_hora', 'status'))
+        # Atendida pelo índice idx_pedidos_cliente_data (cliente_id, data_hora)
+        self._modelos['por_cliente'] = "SELECT {lista} FROM tbl_pedidos WHERE cliente_id = %s ORDER BY data_hora, id"
+        self.sql_por_cliente = self.sql('por_cliente')
+        self.sql_bloqueia = "SELECT status, carrinho_id, data_hora FROM tbl_pedidos WHERE id = %s FOR UPDATE"
+
+    def por_cliente(self, conn, cliente_id, colunas=None):
+        return self.consulta(conn, self.sql('por_cliente', colunas), (cliente_id,))
+
+    def bloqueia(self, conn, id_):
+        """(status, carrinho_id, data_hora) do pedido, com a linha bloqueada até o fim da transação."""
+        linhas = self.consulta(conn, self.sql_bloqueia, (id_,))
+        return linhas[0] if linhas else None
+
+
+clientes = RepositorioClientes()
+fornecedores = Repositorio('tbl_fornecedores', ('nome', 'cnpj', 'email'))
+produtos = Repositorio(
+    'tbl_produtos', ('nome', 'qtd_em_estoque', 'descricao', 'preco', 'fornecedor_id', 'custo_no_fornecedor'),
+)
+carrinhos = RepositorioCarrinhos()
+pedidos = RepositorioPedidos()
+sessoes = RepositorioSessoes()
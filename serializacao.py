@@ -0,0 +1,103 @@
+"""Codificação JSON das respostas, com formato fixo para os tipos que vêm do MySQL.
+
+    Decimal   string ("19.90", padrão) ou número, conforme JSON_DECIMAL=string|numero
+    datetime  ISO-8601 ("2024-05-01T13:45:00"); date e time também em ISO-8601
+
+O codificador é o orjson quando instalado (ou JSON_CODIFICADOR=orjson) e o json da
+biblioteca padrão com JSON_CODIFICADOR=padrao. Os dois ordenam as chaves e escrevem
+UTF-8 sem escapes, então a mesma resposta produz os mesmos bytes com qualquer um.
+"""
+import datetime
+import decimal
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # sem orjson: json da biblioteca padrão
+    orjson = None
+
+
+DECIMAL_STRING = 'string'
+DECIMAL_NUMERO = 'numero'
+
+CODIFICADOR = os.getenv('JSON_CODIFICADOR', 'orjson' if orjson is not None else 'padrao')
+DECIMAL = os.getenv('JSON_DECIMAL', DECIMAL_STRING)
+
+if DECIMAL not in (DECIMAL_STRING, DECIMAL_NUMERO):
+    raise ValueError(f'JSON_DECIMAL deve ser {DECIMAL_STRING} ou {DECIMAL_NUMERO}, não {DECIMAL!r}')
+if CODIFICADOR == 'orjson' and orjson is None:
+    raise ValueError('JSON_CODIFICADOR=orjson, mas o orjson não está instalado')
+
+
+def _converte_decimal(valor):
+    return str(valor) if DECIMAL == DECIMAL_STRING else float(valor)
+
+
+def _padrao(valor):
+    """Tipos que o json da biblioteca padrão não conhece."""
+    if isinstance(valor, decimal.Decimal):
+        return _converte_decimal(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável em JSON')
+
+
+def _padrao_orjson(valor):
+    # datetime, date e time o orjson já escreve em ISO-8601
+    if isinstance(valor, decimal.Decimal):
+        return _converte_decimal(valor)
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável em JSON')
+
+
+_OPCOES_ORJSON = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def codifica_padrao(obj, **kwargs):
+    """JSON em bytes pelo json da biblioteca padrão (também aceita os argumentos de json.dumps)."""
+    if 'indent' not in kwargs:
+        kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(obj, default=_padrao, sort_keys=True, ensure_ascii=False, **kwargs).encode()
+
+
+def codifica_orjson(obj):
+    """JSON em bytes pelo orjson."""
+    return orjson.dumps(obj, default=_padrao_orjson, option=_OPCOES_ORJSON)
+
+
+codifica = codifica_orjson if CODIFICADOR == 'orjson' else codifica_padrao
+
+
+class CodificacaoRapida:
+    """dumps/loads/response de um provedor JSON do Flask (ou do Quart) sobre codifica().
+
+    response() monta o corpo em bytes direto, sem passar por str.
+    """
+
+    def codifica(self, obj):
+        return codifica(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Argumentos do json.dumps (ex.: indent no modo debug): caminho da biblioteca padrão
+            return codifica_padrao(obj, **kwargs).decode()
+        return self.codifica(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            corpo = f'{self.dumps(obj, indent=2)}\n'.encode()
+        else:
+            corpo = self.codifica(obj) + b'\n'
+        return self._app.response_class(corpo, mimetype=self.mimetype)
+
+
+class ProvedorJSON(CodificacaoRapida, DefaultJSONProvider):
+    """Provedor JSON do Flask com o codificador configurado."""
@@ -0,0 +1,102 @@
+import csv
+import io
+import os
+
+from flask import Response, current_app, request, stream_with_context
+from mysql.connector import Error
+
+
+MIMETYPE_NDJSON = 'application/x-ndjson'
+MIMETYPE_CSV = 'text/csv'
+
+# Quantidade de linhas lidas do socket e codificadas por vez
+TAMANHO_LOTE = int(os.getenv('STREAM_TAMANHO_LOTE', 500))
+
+
+def solicitado(requisicao=None):
+    """Indica se o cliente pediu a listagem em modo streaming (?stream=1 ou Accept NDJSON)."""
+    requisicao = request if requisicao is None else requisicao
+    if requisicao.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    melhor = requisicao.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON])
+    return melhor == MIMETYPE_NDJSON
+
+
+def resposta_ndjson(connect_db, sql, valores, mapeia):
+    """Executa a consulta com cursor não bufferizado e envia uma linha JSON por registro.
+
+    As linhas são lidas do servidor em lotes à medida que a resposta é enviada, então
+    a memória usada não depende do tamanho da tabela. A conexão fica com o gerador e
+    volta para o pool quando a resposta termina (ou o cliente desconecta).
+    """
+    # Bytes direto do codificador do app (serializacao), sem passar por str
+    codifica = current_app.json.codifica
+    return _resposta(
+        connect_db, sql, valores,
+        lambda linhas: b''.join([codifica(mapeia(linha)) + b'\n' for linha in linhas]),
+        mimetype=MIMETYPE_NDJSON,
+    )
+
+
+def resposta_csv(connect_db, sql, valores, mapeia, chaves, nome_arquivo):
+    """resposta_ndjson() em CSV: cabeçalho com `chaves` e uma linha por registro, para download."""
+    inicio, codifica = codificador_csv(chaves, mapeia)
+    return _resposta(
+        connect_db, sql, valores, codifica, mimetype=MIMETYPE_CSV, inicio=inicio,
+        cabecalhos={'Content-Disposition': f'attachment; filename="{nome_arquivo}"'},
+    )
+
+
+def codificador_csv(chaves, mapeia):
+    """(início, codifica): bytes do cabeçalho e função que codifica um lote de linhas em CSV UTF-8.
+
+    O início traz o BOM do UTF-8, para que planilhas abram os acentos corretamente.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def codifica(linhas):
+        buffer.seek(0)
+        buffer.truncate()
+        for linha in linhas:
+            registro = mapeia(linha)
+            escritor.writerow([registro[chave] for chave in chaves])
+        return buffer.getvalue().encode()
+
+    escritor.writerow(chaves)
+    inicio = '\ufeff'.encode() + buffer.getvalue().encode()
+    return inicio, codifica
+
+
+def _resposta(connect_db, sql, valores, codifica, mimetype, inicio=b'', cabecalhos=None):
+    conn = connect_db()
+    if not conn:
+        return {'erro': 'Falha na conexão com o banco de dados.'}, 500
+
+    # Linhas em tupla: `mapeia` é um mapeador compilado de repositorios
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(sql, valores)
+    except Error as err:
+        cursor.close()
+        conn.close()
+        return {'erro': 'Erro ao exportar registros', 'message': str(err)}, 500
+
+    def gera():
+        try:
+            if inicio:
+                yield inicio
+            while True:
+                linhas = cursor.fetchmany(TAMANHO_LOTE)
+                if not linhas:
+                    break
+                yield codifica(linhas)
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                # Cliente desconectou com linhas pendentes; o pool descarta a conexão
+                pass
+            conn.close()
+
+    return Response(stream_with_context(gera()), mimetype=mimetype, headers=cabecalhos)
@@ -0,0 +1,47 @@
+"""Fixtures dos testes de integração: um banco MySQL de testes com as migrações aplicadas.
+
+Os testes usam o servidor configurado no .cred (DB_HOST, DB_USER, DB_PASSWORD, ...)
+e o banco TESTES_DB_NAME (db_desafio_testes), criado se não existir. Sem um
+servidor acessível, os testes são pulados.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Contadores de geração próprios: os testes não invalidam os caches de um app rodando no host
+os.environ.setdefault('GERACOES_ARQUIVO', os.path.join(tempfile.gettempdir(), 'api-geracoes-testes'))
+
+import mysql.connector  # noqa: E402
+from mysql.connector import Error  # noqa: E402
+
+import db_pool  # noqa: E402
+import migracoes  # noqa: E402
+from configuracao import config  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def config_testes():
+    """Configuração de conexão do banco de testes, já migrado."""
+    nome = os.getenv('TESTES_DB_NAME', 'db_desafio_testes')
+    try:
+        conn = mysql.connector.connect(**dict(config, database=None))
+    except Error as err:
+        pytest.skip(f'MySQL indisponível para os testes de integração: {err}')
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{nome}`")
+        cursor.execute(f"USE `{nome}`")
+        cursor.close()
+        migracoes.aplicar(conn)
+    finally:
+        conn.close()
+    return dict(config, database=nome)
+
+
+@pytest.fixture
+def pool(config_testes):
+    """Pool de conexões (o mesmo do app) apontando para o banco de testes."""
+    return db_pool.criar_pool(config_testes)
@@ -0,0 +1,132 @@
+"""Reserva de estoque sob concorrência: pedidos simultâneos nunca deixam o estoque negativo.
+
+Os pedidos passam por regras_pedidos.cria, o mesmo código de POST /pedidos nos dois
+modos da API, cada um em uma thread com a sua conexão do pool.
+"""
+import secrets
+import threading
+
+import pytest
+
+import regras_pedidos
+
+
+def _executa(conn, sql, valores=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, valores)
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+
+
+def _valor(conn, sql, valores=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, valores)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+@pytest.fixture
+def loja(pool):
+    """Cria produtos e carrinhos com ids novos a cada teste; retorna (conn, cliente_id, cria_produto, cria_carrinho)."""
+    conn = pool.obter()
+    sufixo = secrets.token_hex(4)
+    fornecedor_id = _executa(
+        conn, "INSERT INTO tbl_fornecedores (nome, email, cnpj) VALUES (%s, %s, %s)",
+        ('Fornecedor teste', f'fornecedor-{sufixo}@teste.com', sufixo),
+    )
+    cliente_id = _executa(
+        conn, "INSERT INTO tbl_clientes (nome, email, cpf, senha) VALUES (%s, %s, %s, %s)",
+        ('Cliente teste', f'cliente-{sufixo}@teste.com', sufixo, 'x'),
+    )
+    conn.commit()
+
+    def cria_produto(estoque):
+        produto_id = _executa(
+            conn,
+            "INSERT INTO tbl_produtos (nome, qtd_em_estoque, descricao, preco, fornecedor_id, custo_no_fornecedor) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            ('Produto teste', estoque, None, 10, fornecedor_id, 5),
+        )
+        conn.commit()
+        return produto_id
+
+    def cria_carrinho(itens):
+        carrinho_id = _executa(conn, "INSERT INTO tbl_carrinho (produto_id, quantidade) VALUES (NULL, NULL)")
+        for produto_id, quantidade in itens:
+            _executa(
+                conn, "INSERT INTO tbl_carrinho_itens (carrinho_id, produto_id, quantidade) VALUES (%s, %s, %s)",
+                (carrinho_id, produto_id, quantidade),
+            )
+        conn.commit()
+        return carrinho_id
+
+    yield conn, cliente_id, cria_produto, cria_carrinho
+    conn.close()
+
+
+def _pedidos_simultaneos(pool, cliente_id, carrinhos):
+    """Status de um POST /pedidos por carrinho, todos liberados ao mesmo tempo."""
+    barreira = threading.Barrier(len(carrinhos))
+    status = [None] * len(carrinhos)
+
+    def pede(indice, carrinho_id):
+        barreira.wait()
+        _, status[indice] = regras_pedidos.cria(pool.obter, {'cliente_id': cliente_id, 'carrinho_id': carrinho_id})
+
+    threads = [threading.Thread(target=pede, args=item) for item in enumerate(carrinhos)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return status
+
+
+def _confere_estoque(conn, produto_id, inicial):
+    conn.commit()  # nova leitura consistente
+    estoque = _valor(conn, "SELECT qtd_em_estoque FROM tbl_produtos WHERE id = %s", (produto_id,))
+    reservado = _valor(
+        conn,
+        "SELECT COALESCE(SUM(quantidade), 0) FROM tbl_reservas_estoque WHERE produto_id = %s AND liberada_em IS NULL",
+        (produto_id,),
+    )
+    assert estoque >= 0
+    # Cada unidade que saiu do estoque está em exatamente uma reserva ativa
+    assert estoque + reservado == inicial
+    return estoque
+
+
+def test_pedidos_concorrentes_nao_vendem_alem_do_estoque(pool, loja):
+    conn, cliente_id, cria_produto, cria_carrinho = loja
+    produto_id = cria_produto(5)
+    carrinhos = [cria_carrinho([(produto_id, 1)]) for _ in range(20)]
+
+    status = _pedidos_simultaneos(pool, cliente_id, carrinhos)
+
+    assert status.count(201) == 5
+    assert status.count(409) == 15
+    assert _confere_estoque(conn, produto_id, 5) == 0
+    marcadores = ', '.join(['%s'] * len(carrinhos))
+    assert _valor(conn, f"SELECT COUNT(*) FROM tbl_pedidos WHERE carrinho_id IN ({marcadores})", carrinhos) == 5
+
+
+def test_pedidos_com_varios_itens_sem_deadlock(pool, loja):
+    # Carrinhos com os mesmos dois produtos, gravados em ordens diferentes: as baixas em
+    # ordem de id não entram em deadlock (nenhum 500) e o produto mais escasso limita as vendas
+    conn, cliente_id, cria_produto, cria_carrinho = loja
+    produto_a = cria_produto(10)
+    produto_b = cria_produto(9)
+    carrinhos = [
+        cria_carrinho([(produto_a, 1), (produto_b, 2)] if indice % 2 else [(produto_b, 2), (produto_a, 1)])
+        for indice in range(12)
+    ]
+
+    status = _pedidos_simultaneos(pool, cliente_id, carrinhos)
+
+    assert 500 not in status
+    assert status.count(201) == 4
+    assert _confere_estoque(conn, produto_a, 10) == 6
+    assert _confere_estoque(conn, produto_b, 9) == 1
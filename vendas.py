@@ -0,0 +1,205 @@
+"""Vendas e margem consolidadas por dia, por produto e por fornecedor.
+
+Um pedido conta como venda enquanto está aprovado ou entregue. Ao entrar nesses
+status, contabiliza() grava em tbl_vendas_pedidos os itens do carrinho com o preço e
+o custo daquele momento e soma os valores nas tabelas diárias (tbl_vendas_produto_dia
+e tbl_vendas_fornecedor_dia) com upserts; ao sair (cancelamento, volta a pendente,
+DELETE), estorna() subtrai exatamente o que foi somado. Tudo roda na transação do
+pedido, então um relatório nunca vê uma venda pela metade, e lê no máximo uma linha
+por fornecedor (ou produto) e dia do período em vez de agregar tbl_pedidos.
+
+Os upserts percorrem as linhas em ordem de chave, para que pedidos concorrentes
+bloqueiem as linhas diárias sempre na mesma ordem.
+"""
+from datetime import date
+from decimal import Decimal
+
+from flask import request
+
+import paginacao
+
+
+VENDIDOS = ('aprovado', 'entregue')
+
+# Itens do carrinho do pedido, com preço, custo e fornecedor atuais do produto
+_SQL_REGISTRA = """
+INSERT INTO tbl_vendas_pedidos (pedido_id, produto_id, fornecedor_id, dia, quantidade, receita, custo)
+SELECT pe.id, i.produto_id, p.fornecedor_id, DATE(pe.data_hora), i.quantidade,
+       i.quantidade * p.preco, i.quantidade * p.custo_no_fornecedor
+FROM tbl_pedidos pe
+JOIN tbl_carrinho_itens i ON i.carrinho_id = pe.carrinho_id
+JOIN tbl_produtos p ON p.id = i.produto_id
+WHERE pe.id = %s
+"""
+
+_SQL_SOMA_PRODUTO = """
+INSERT INTO tbl_vendas_produto_dia (produto_id, dia, fornecedor_id, quantidade, receita, custo)
+SELECT produto_id, dia, fornecedor_id, {sinal}quantidade, {sinal}receita, {sinal}custo
+FROM tbl_vendas_pedidos WHERE pedido_id = %s ORDER BY produto_id
+ON DUPLICATE KEY UPDATE
+    quantidade = quantidade + VALUES(quantidade), receita = receita + VALUES(receita), custo = custo + VALUES(custo)
+"""
+
+_SQL_SOMA_FORNECEDOR = """
+INSERT INTO tbl_vendas_fornecedor_dia (fornecedor_id, dia, quantidade, receita, custo)
+SELECT fornecedor_id, dia, {sinal}SUM(quantidade), {sinal}SUM(receita), {sinal}SUM(custo)
+FROM tbl_vendas_pedidos WHERE pedido_id = %s GROUP BY fornecedor_id, dia ORDER BY fornecedor_id
+ON DUPLICATE KEY UPDATE
+    quantidade = quantidade + VALUES(quantidade), receita = receita + VALUES(receita), custo = custo + VALUES(custo)
+"""
+
+_SQL_REMOVE = "DELETE FROM tbl_vendas_pedidos WHERE pedido_id = %s"
+
+
+def contabiliza(cursor, pedido_id):
+    """Soma o pedido às vendas diárias (não faz commit); retorna quantos itens foram contados."""
+    cursor.execute(_SQL_REGISTRA, (pedido_id,))
+    itens = cursor.rowcount
+    if itens > 0:
+        cursor.execute(_SQL_SOMA_PRODUTO.format(sinal=''), (pedido_id,))
+        cursor.execute(_SQL_SOMA_FORNECEDOR.format(sinal=''), (pedido_id,))
+    return itens
+
+
+def estorna(cursor, pedido_id):
+    """Subtrai das vendas diárias o que contabiliza() somou para o pedido (não faz commit)."""
+    cursor.execute(_SQL_SOMA_PRODUTO.format(sinal='-'), (pedido_id,))
+    cursor.execute(_SQL_SOMA_FORNECEDOR.format(sinal='-'), (pedido_id,))
+    cursor.execute(_SQL_REMOVE, (pedido_id,))
+
+
+def ajusta(cursor, pedido_id, status_anterior, status, recontar=False):
+    """Contabiliza ou estorna o pedido conforme a mudança de status (status_anterior None: pedido novo).
+
+    Um pedido que continua vendido só é recontado com `recontar` (carrinho ou dia
+    alterados); passar de aprovado para entregue não muda os valores já somados.
+    """
+    antes = status_anterior in VENDIDOS
+    depois = status in VENDIDOS
+    if antes and (not depois or recontar):
+        estorna(cursor, pedido_id)
+    if depois and (not antes or recontar):
+        contabiliza(cursor, pedido_id)
+
+
+def reconstroi(cursor):
+    """Refaz as vendas consolidadas a partir dos pedidos aprovados e entregues (cargas em massa)."""
+    for tabela in ('tbl_vendas_fornecedor_dia', 'tbl_vendas_produto_dia', 'tbl_vendas_pedidos'):
+        cursor.execute(f"DELETE FROM {tabela}")
+    cursor.execute(
+        _SQL_REGISTRA.replace('WHERE pe.id = %s', "WHERE pe.status IN ('aprovado', 'entregue')")
+    )
+    cursor.execute(
+        "INSERT INTO tbl_vendas_produto_dia (produto_id, dia, fornecedor_id, quantidade, receita, custo) "
+        "SELECT produto_id, dia, MAX(fornecedor_id), SUM(quantidade), SUM(receita), SUM(custo) "
+        "FROM tbl_vendas_pedidos GROUP BY produto_id, dia"
+    )
+    cursor.execute(
+        "INSERT INTO tbl_vendas_fornecedor_dia (fornecedor_id, dia, quantidade, receita, custo) "
+        "SELECT fornecedor_id, dia, SUM(quantidade), SUM(receita), SUM(custo) "
+        "FROM tbl_vendas_pedidos GROUP BY fornecedor_id, dia"
+    )
+
+
+# Relatórios
+
+# agrupar -> (tabela diária, coluna do grupo, tabela com o nome do grupo)
+AGRUPAMENTOS = {
+    'fornecedor': ('tbl_vendas_fornecedor_dia', 'fornecedor_id', 'tbl_fornecedores'),
+    'produto': ('tbl_vendas_produto_dia', 'produto_id', 'tbl_produtos'),
+    'dia': ('tbl_vendas_fornecedor_dia', 'dia', None),
+}
+
+
+def parametros(args=None):
+    """Lê ?agrupar=, ?de=, ?ate= (datas ISO; padrão: o mês atual até hoje), ?fornecedor_id= e ?limit=."""
+    args = request.args if args is None else args
+    agrupar = args.get('agrupar', 'fornecedor')
+    if agrupar not in AGRUPAMENTOS:
+        raise paginacao.ParametroInvalido(f"agrupar deve ser um de: {', '.join(AGRUPAMENTOS)}.")
+    hoje = date.today()
+    try:
+        de = date.fromisoformat(args['de']) if args.get('de') else hoje.replace(day=1)
+        ate = date.fromisoformat(args['ate']) if args.get('ate') else hoje
+    except ValueError:
+        raise paginacao.ParametroInvalido('de e ate devem ser datas no formato AAAA-MM-DD.')
+    if de > ate:
+        raise paginacao.ParametroInvalido('de deve ser anterior ou igual a ate.')
+    fornecedor_id = args.get('fornecedor_id')
+    if fornecedor_id is not None:
+        try:
+            fornecedor_id = int(fornecedor_id)
+        except ValueError:
+            raise paginacao.ParametroInvalido('fornecedor_id deve ser um número inteiro.')
+    return {
+        'agrupar': agrupar, 'de': de, 'ate': ate, 'fornecedor_id': fornecedor_id,
+        'limite': paginacao.limite(args),
+    }
+
+
+def consultas(params):
+    """(sql, valores) das linhas do relatório e do total do período."""
+    tabela, coluna, tabela_nome = AGRUPAMENTOS[params['agrupar']]
+    filtro = "dia BETWEEN %s AND %s"
+    valores = [params['de'], params['ate']]
+    if params['fornecedor_id'] is not None:
+        filtro += " AND fornecedor_id = %s"
+        valores.append(params['fornecedor_id'])
+
+    grupos = (
+        f"SELECT {coluna} AS chave, SUM(quantidade) AS quantidade, SUM(receita) AS receita, SUM(custo) AS custo "
+        f"FROM {tabela} WHERE {filtro} GROUP BY {coluna} HAVING SUM(quantidade) <> 0"
+    )
+    if tabela_nome is None:
+        # Por dia: em ordem cronológica
+        linhas = f"SELECT chave, NULL, quantidade, receita, custo FROM ({grupos}) v ORDER BY chave LIMIT %s"
+    else:
+        # Os maiores faturamentos primeiro; o nome só para as linhas devolvidas
+        linhas = (
+            f"SELECT v.chave, t.nome, v.quantidade, v.receita, v.custo "
+            f"FROM ({grupos} ORDER BY receita DESC, chave LIMIT %s) v "
+            f"LEFT JOIN {tabela_nome} t ON t.id = v.chave ORDER BY v.receita DESC, v.chave"
+        )
+    total = f"SELECT SUM(quantidade), SUM(receita), SUM(custo) FROM tbl_vendas_fornecedor_dia WHERE {filtro}"
+    return (linhas, valores + [params['limite']]), (total, valores)
+
+
+def relatorio(conn, params):
+    """GET /relatorios/vendas: linhas agrupadas e o total do período, com margem."""
+    (sql_linhas, valores_linhas), (sql_total, valores_total) = consultas(params)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql_linhas, valores_linhas)
+        linhas = cursor.fetchall()
+        cursor.execute(sql_total, valores_total)
+        total = cursor.fetchone()
+    finally:
+        cursor.close()
+    return monta(params, linhas, total)
+
+
+def monta(params, linhas, total):
+    """Resposta do relatório a partir das linhas e do total de consultas()."""
+    chave = 'dia' if params['agrupar'] == 'dia' else f"{params['agrupar']}_id"
+    resultado = []
+    for grupo, nome, quantidade, receita, custo in linhas:
+        item = {chave: grupo}
+        if params['agrupar'] != 'dia':
+            item['nome'] = nome
+        item.update(_valores(quantidade, receita, custo))
+        resultado.append(item)
+    return {
+        'agrupar': params['agrupar'], 'de': params['de'], 'ate': params['ate'],
+        'linhas': resultado, 'total': _valores(*total) if total else _valores(0, 0, 0),
+    }
+
+
+def _valores(quantidade, receita, custo):
+    quantidade = int(quantidade or 0)
+    receita = Decimal(receita or 0)
+    custo = Decimal(custo or 0)
+    margem = receita - custo
+    return {
+        'quantidade': quantidade, 'receita': receita, 'custo': custo, 'margem': margem,
+        'margem_percentual': (margem * 100 / receita).quantize(Decimal('0.01')) if receita else None,
+    }